@@ -1,18 +1,2386 @@
 import sys
 import os
-import keyboard
+import bisect
+import heapq
+import json
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from string import Template
+
+
+def parse_args(argv):
+    """命令行：python StickyTasks.py [show|hide|toggle|pin|add 文本|ingest [文件]|import 目录]"""
+    import argparse
+    parser = argparse.ArgumentParser(description='便签')
+    parser.add_argument('action', nargs='?', default='show',
+                        choices=('show', 'hide', 'toggle', 'pin', 'add', 'ingest', 'import'),
+                        help='已有实例在运行时把命令转发给它')
+    parser.add_argument('text', nargs='*',
+                        help='add命令要添加的任务文本；ingest命令读取的JSON Lines文件，省略或为-时读取标准输入；'
+                             'import命令读取的Markdown导出目录')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='import命令解析文件的进程数，默认为CPU核数')
+    args = parser.parse_args(argv)
+    command = {'action': args.action}
+    if args.action == 'add':
+        command['text'] = ' '.join(args.text)
+    elif args.action == 'ingest':
+        path = args.text[0] if args.text else '-'
+        try:
+            command['tasks'] = read_task_lines(sys.stdin if path == '-' else open(path, encoding='utf-8'))
+        except (OSError, UnicodeDecodeError) as e:
+            parser.error(f'无法读取任务文件 {path}: {e}')
+    elif args.action == 'import':
+        if not args.text:
+            parser.error('import命令需要导出目录')
+        tasks, files, stats = read_markdown_exports(args.text[0], args.jobs)
+        command.update(tasks=tasks, files=files)
+        print(f"读取 {stats['files']} 个文件（{stats['bytes'] / 1024 / 1024:.1f} MB），"
+              f"用时 {stats['seconds']:.2f} 秒，{stats['files'] / max(stats['seconds'], 1e-6):.0f} 个文件/秒，"
+              f"{stats['bytes'] / 1024 / 1024 / max(stats['seconds'], 1e-6):.1f} MB/秒；"
+              f"未修改跳过 {stats['unchanged']} 个，已导入过的内容跳过 {stats['imported']} 个；"
+              f"{len(tasks)} 个任务，目录内重复 {stats['duplicates']} 个")
+    return command
+
+
+def read_task_lines(file):
+    """读取JSON Lines格式的任务：每行一个对象（text、completed、font_size）或一个字符串"""
+    tasks = []
+    with file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                tasks.append(json.loads(line))
+            except ValueError:
+                print(f"第 {number} 行不是有效的JSON，已跳过", file=sys.stderr)
+    return tasks
+
+
+IMPORT_MANIFEST = '.stickynotes.imports.json'  # 已导入的Markdown文件：路径 -> [修改时间(ns), 内容哈希]
+PARALLEL_IMPORT_FILES = 32  # 待读取的文件达到这个数量时用多个进程解析
+EXPORT_TASK_HEADER = re.compile(r'## 任务 \d+$')  # MarkdownExporter写出的任务标题
+
+
+def normalized_hash(text):
+    """任务内容的哈希：NFKC规范化并把连续空白合并为一个空格，只有首尾空白、空白长度或全角半角不同的任务视为重复"""
+    import hashlib
+    import unicodedata
+    text = ' '.join(unicodedata.normalize('NFKC', text).split())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def parse_markdown_export(path):
+    """逐行解析一个MarkdownExporter导出的文件，同时计算文件的哈希；在工作进程中运行
+
+    返回(文件哈希, [(内容哈希, 任务文本), ...], 字节数)，无法读取时文件哈希为None。
+    内容哈希也在工作进程中计算，主进程只需查集合去重。
+    """
+    import hashlib
+    digest = hashlib.sha1()
+    size = 0
+    tasks = []
+    lines = None  # 当前任务的各行，第一个任务标题之前（文件标题）为None
+    try:
+        with open(path, 'rb') as f:
+            for raw in f:
+                digest.update(raw)
+                size += len(raw)
+                line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+                if line.startswith('## 任务 ') and EXPORT_TASK_HEADER.match(line):
+                    if lines is not None:
+                        tasks.append('\n'.join(lines).strip())
+                    lines = []
+                elif lines is not None:
+                    lines.append(line)
+    except OSError as e:
+        print(f"无法读取 {path}: {e}", file=sys.stderr)
+        return None, [], size
+    if lines is not None:
+        tasks.append('\n'.join(lines).strip())
+    return digest.hexdigest(), [(normalized_hash(task), task) for task in tasks if task], size
+
+
+def read_import_manifest():
+    try:
+        with open(os.path.join(os.path.expanduser('~'), IMPORT_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_import_manifest(files):
+    """任务合并之后再记录这些文件，合并失败时下次仍会读取"""
+    manifest = read_import_manifest()
+    manifest.update(files)
+    path = os.path.join(os.path.expanduser('~'), IMPORT_MANIFEST)
+    try:
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"无法保存导入记录: {e}")
+
+
+def read_markdown_exports(folder, jobs=None):
+    """读取目录（含子目录）中的Markdown导出文件，返回(任务文本列表, 文件清单, 统计)
+
+    修改时间与上次导入时相同的文件不再打开；修改时间变了但内容哈希已导入过的文件（复制或touch过）
+    解析后跳过。待读取的文件较多时用多个进程解析，结果逐个文件合并，内容相同的任务只保留第一次出现的。
+    """
+    started = time.perf_counter()
+    manifest = read_import_manifest()
+    imported = {entry[1] for entry in manifest.values()}
+    paths = []
+    unchanged = 0
+    for root, dirs, names in os.walk(folder):
+        dirs.sort()
+        for name in sorted(names):
+            if not name.endswith('.md'):
+                continue
+            path = os.path.abspath(os.path.join(root, name))
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            if manifest.get(path, [None])[0] == mtime:
+                unchanged += 1
+            else:
+                paths.append((path, mtime))
+    jobs = jobs or os.cpu_count() or 1
+    executor = None
+    if len(paths) >= PARALLEL_IMPORT_FILES and jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(jobs)
+        results = executor.map(parse_markdown_export, [path for path, _ in paths], chunksize=16)
+    else:
+        results = map(parse_markdown_export, [path for path, _ in paths])
+    tasks = []
+    files = {}
+    seen = set()
+    stats = {'files': 0, 'bytes': 0, 'unchanged': unchanged, 'imported': 0, 'duplicates': 0}
+    try:
+        for (path, mtime), (digest, parsed, size) in zip(paths, results):
+            if digest is None:
+                continue
+            stats['files'] += 1
+            stats['bytes'] += size
+            files[path] = [mtime, digest]
+            if digest in imported:
+                stats['imported'] += 1
+                continue
+            imported.add(digest)
+            for content, text in parsed:
+                if content in seen:
+                    stats['duplicates'] += 1
+                else:
+                    seen.add(content)
+                    tasks.append(text)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    stats['seconds'] = time.perf_counter() - started
+    return tasks, files, stats
+
+
+def instance_address():
+    """单实例服务的地址：Windows上是命名管道，其他系统是用户目录中的套接字文件"""
+    home = os.path.expanduser('~')
+    if sys.platform == 'win32':
+        return 'StickyTasks-' + re.sub(r'[\\/:]', '_', home)
+    return os.path.join(home, '.stickynotes.sock')
+
+
+def send_command(command, timeout=2.0):
+    """把命令发给正在运行的实例并返回它的回复；没有实例在运行时返回None
+
+    只使用标准库，转发命令的进程不需要加载Qt。
+    """
+    address = instance_address()
+    line = (json.dumps(command, ensure_ascii=False) + '\n').encode('utf-8')
+    try:
+        if sys.platform == 'win32':
+            with open('\\\\.\\pipe\\' + address, 'r+b', buffering=0) as pipe:
+                pipe.write(line)
+                reply = pipe.readline()
+        else:
+            import socket
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(address)
+                sock.sendall(line)
+                reply = sock.makefile('rb').readline()
+    except OSError:
+        return None
+    try:
+        return json.loads(reply)
+    except ValueError:
+        return {'ok': False, 'error': '正在运行的实例没有回复'}
+
+
+def report_reply(reply):
+    """显示正在运行的实例对转发命令的回复，返回进程退出码"""
+    if not reply.get('ok'):
+        print(f"命令失败: {reply.get('error')}", file=sys.stderr)
+        return 1
+    if 'added' in reply:
+        print(f"已添加 {reply['added']} 个任务" +
+              (f"，跳过 {reply['skipped']} 条无效记录" if reply.get('skipped') else '') +
+              (f"，跳过 {reply['duplicates']} 个与现有任务重复的任务" if reply.get('duplicates') else ''))
+    return 0
+
+
+# 已有实例在运行时只转发命令然后退出，不再启动第二个进程（这时还没有导入Qt）
+if __name__ == '__main__':
+    if getattr(sys, 'frozen', False):
+        # 打包后的程序中，import命令的解析进程也从这里启动，要在解析命令行之前交给multiprocessing处理；
+        # freeze_support只在打包后的程序中起作用，未打包时不导入multiprocessing，以免拖慢启动
+        import multiprocessing
+        multiprocessing.freeze_support()
+    COMMAND = parse_args(sys.argv[1:])
+    REPLY = send_command(COMMAND, timeout=60.0 if COMMAND['action'] in ('ingest', 'import') else 2.0)
+    if REPLY is not None:
+        sys.exit(report_reply(REPLY))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTextEdit, 
                            QVBoxLayout, QWidget, QPushButton, QHBoxLayout,
                            QSystemTrayIcon, QMenu, QAction, QSizeGrip, QScrollArea,
-                           QLabel, QMessageBox)
-from PyQt5.QtCore import Qt, QSize, QPoint, QDate
-from PyQt5.QtGui import QIcon, QFont, QColor
-import yaml
+                           QLabel, QMessageBox, QListView, QStyledItemDelegate,
+                           QAbstractItemView, QLineEdit, QStyle, QListWidget,
+                           QListWidgetItem, QDialog, QDateTimeEdit, QDialogButtonBox, QComboBox,
+                           QTableWidget, QTableWidgetItem)
+from PyQt5.QtCore import (Qt, QSize, QPoint, QDate, QDateTime, QRect, QEvent, QModelIndex,
+                          QAbstractListModel, QSortFilterProxyModel, QTimer, QObject, QSettings,
+                          QMimeData, pyqtSignal)
+from PyQt5.QtNetwork import QLocalServer
+from PyQt5.QtGui import QIcon, QFont, QColor, QWheelEvent, QPainter, QPen, QDrag
+# yaml、keyboard和XML模块只在用到时导入，缩短启动时间
+
+CELL_HEIGHT = 100  # 单元格固定高度
+CELL_SPACING = 10  # 单元格之间的间距
+BUTTON_SIZE = 25  # 单元格左侧删除、完成按钮的大小
+MIN_FONT_SIZE = 6
+MAX_FONT_SIZE = 30
+LOAD_BATCH_SIZE = 200  # 后台分批加载时每批插入的任务数
+AUTOSAVE_DELAY_MS = 1000  # 停止修改多久后自动保存
+AUTOSAVE_MAX_DELAY_MS = 2000  # 持续修改时，距第一次修改最多多久必须保存一次
+HEARTBEAT_MS = 50  # 界面线程心跳间隔，用于检测卡顿
+STALL_THRESHOLD_MS = 200  # 界面线程超过此时间没有响应记为一次卡顿
+TRACE_MAX_BYTES = 1024 * 1024  # 跟踪文件超过此大小后轮换
+ARCHIVE_AFTER_DAYS = 30  # 完成超过此天数的任务自动归档
+ARCHIVE_CHECK_MS = 60 * 60 * 1000  # 运行期间每小时检查一次需要归档的任务
+SNAPSHOT_CHECK_MS = 60 * 60 * 1000  # 运行期间每小时检查一次是否需要更新当天的快照
+STATS_DAYS = 30  # 统计窗口显示最近多少天
+REMINDER_MAX_WAIT_MS = 60 * 60 * 1000  # 提醒定时器最长等待时间，系统时间被调整后最迟这么久重新对齐
+SNOOZE_MINUTES = 10  # 默认推迟提醒的分钟数
+RESIZE_SETTLE_MS = 150  # 调整大小时鼠标停止移动多久后重新排列单元格
+SYNC_INTERVAL_MS = 5000  # 启用同步时多久读取一次其他设备的修改
+HOTKEYS = {'toggle': 'ctrl+alt+q', 'pin': 'ctrl+alt+w'}  # 默认全局快捷键：动作 -> 组合键
+HOTKEY_ACTIONS = ('show', 'hide', 'toggle', 'pin', 'add')  # 可以绑定快捷键的动作
+VIEWS = {'未完成': 'open', '本周完成': 'completed this week'}  # 默认的保存视图：名称 -> 查询
+
+
+# 主题配色，整个应用共用一份样式表，由这些颜色生成
+THEMES = {
+    'warm': {
+        'bg_0': '#ffd8a8', 'bg_1': '#ffe8cc', 'bg_2': '#fff3e0', 'bg_3': '#fff9db',
+        'label_text': '#495057', 'label_bg': 'rgba(255, 255, 255, 0.7)',
+        'muted_text': '#868e96', 'muted_bg': 'rgba(255, 255, 255, 0.5)',
+        'blue': '#4dabf7', 'blue_hover': '#339af0',
+        'orange': '#ff922b', 'orange_hover': '#fd7e14',
+        'yellow': '#ffd43b', 'yellow_hover': '#fcc419',
+        'red': '#ff6b6b', 'red_hover': '#ff5252',
+        'green': '#51cf66', 'green_hover': '#40c057',
+        'editor_bg': 'white', 'editor_text': 'black', 'editor_border': '#ddd',
+        'completed_bg': '#aaaaaa',
+        'scrollbar_bg': 'rgba(241, 243, 245, 0.6)',
+        'handle': 'rgba(173, 181, 189, 0.8)', 'handle_hover': 'rgba(134, 142, 150, 0.9)',
+    },
+    'dark': {
+        'bg_0': '#2b2d31', 'bg_1': '#303238', 'bg_2': '#34373d', 'bg_3': '#393c43',
+        'label_text': '#dee2e6', 'label_bg': 'rgba(255, 255, 255, 0.08)',
+        'muted_text': '#adb5bd', 'muted_bg': 'rgba(255, 255, 255, 0.05)',
+        'blue': '#1c7ed6', 'blue_hover': '#1971c2',
+        'orange': '#f76707', 'orange_hover': '#e8590c',
+        'yellow': '#f59f00', 'yellow_hover': '#f08c00',
+        'red': '#e03131', 'red_hover': '#c92a2a',
+        'green': '#2f9e44', 'green_hover': '#2b8a3e',
+        'editor_bg': '#25262b', 'editor_text': '#e9ecef', 'editor_border': '#495057',
+        'completed_bg': '#495057',
+        'scrollbar_bg': 'rgba(255, 255, 255, 0.06)',
+        'handle': 'rgba(173, 181, 189, 0.5)', 'handle_hover': 'rgba(173, 181, 189, 0.8)',
+    },
+}
+
+# 状态通过动态属性（completed、pinned）表达，切换状态时只需重新polish对应控件
+STYLESHEET = Template("""
+    QWidget#central {
+        background: qlineargradient(
+            x1: 0, y1: 0,
+            x2: 1, y2: 1,
+            stop: 0 $bg_0,
+            stop: 0.3 $bg_1,
+            stop: 0.6 $bg_2,
+            stop: 1 $bg_3
+        );
+        border-radius: 10px;
+    }
+    QLabel#dateLabel {
+        color: $label_text;
+        font-family: 'Segoe UI', 'Microsoft YaHei';
+        font-size: 14px;
+        font-weight: 500;
+        padding: 5px 10px;
+        background-color: $label_bg;
+        border-radius: 8px;
+    }
+    QLabel#loadingLabel {
+        color: $muted_text;
+        font-family: 'Segoe UI', 'Microsoft YaHei';
+        font-size: 12px;
+        padding: 5px 6px;
+        background-color: $muted_bg;
+        border-radius: 8px;
+    }
+    QLineEdit#searchEdit, QComboBox#viewCombo {
+        color: $label_text;
+        font-family: 'Segoe UI', 'Microsoft YaHei';
+        font-size: 13px;
+        padding: 4px 8px;
+        border: none;
+        background-color: $label_bg;
+        border-radius: 8px;
+    }
+    QPushButton#exportButton, QPushButton#pinButton, QPushButton#bulkButton {
+        background-color: $blue;
+        border: none;
+        color: white;
+        border-radius: 12px;
+        font-size: 14px;
+    }
+    QPushButton#exportButton:hover, QPushButton#pinButton:hover, QPushButton#bulkButton:hover {
+        background-color: $blue_hover;
+    }
+    QPushButton#bulkButton::menu-indicator {
+        width: 0;
+    }
+    QPushButton#pinButton[pinned="true"] {
+        background-color: $orange;
+    }
+    QPushButton#pinButton[pinned="true"]:hover {
+        background-color: $orange_hover;
+    }
+    QPushButton#addButton {
+        background-color: $yellow;
+        border: none;
+        color: white;
+        border-radius: 12px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton#addButton:hover {
+        background-color: $yellow_hover;
+    }
+    QPushButton#closeButton, QPushButton#deleteButton {
+        background-color: $red;
+        border: none;
+        color: white;
+        border-radius: 12px;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton#closeButton:hover, QPushButton#deleteButton:hover {
+        background-color: $red_hover;
+    }
+    QPushButton#completeButton {
+        background-color: $green;
+        border: none;
+        border-radius: 12px;
+        color: white;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QPushButton#completeButton:hover {
+        background-color: $green_hover;
+    }
+    QTextEdit#cellEditor {
+        background-color: $editor_bg;
+        color: $editor_text;
+        border: 1px solid $editor_border;
+        border-radius: 8px;
+        padding: 5px;
+    }
+    QTextEdit#cellEditor[completed="true"] {
+        background-color: $completed_bg;
+    }
+    QTextEdit#cellEditor[selected="true"] {
+        border: 2px solid $blue;
+        padding: 4px;
+    }
+    QScrollArea#cellsScroll, QListView#taskList {
+        border: none;
+        background-color: transparent;
+        border-radius: 10px;
+    }
+    QScrollArea#cellsScroll > QWidget, QWidget#cellsContainer {
+        background: transparent;
+    }
+    QWidget#dropIndicator {
+        background-color: $blue;
+    }
+    QScrollBar:vertical {
+        border: none;
+        background: $scrollbar_bg;
+        width: 10px;
+        margin: 0px;
+        border-radius: 5px;
+    }
+    QScrollBar::handle:vertical {
+        background: $handle;
+        border-radius: 5px;
+        min-height: 20px;
+    }
+    QScrollBar::handle:vertical:hover {
+        background: $handle_hover;
+    }
+    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+        height: 0px;
+    }
+""")
+
+
+def build_stylesheet(theme):
+    return STYLESHEET.substitute(THEMES[theme])
+
+
+def set_state_property(widget, name, value):
+    """修改控件的状态属性，只重新polish这一个控件"""
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
+
+
+class Profiler:
+    """性能统计：记录各操作的耗时，检测界面线程卡顿，可选写入JSONL跟踪文件
+
+    耗时样本只保存在内存中；跟踪文件由检测线程批量写入，不占用界面线程。
+    """
+    SAMPLES = 1000  # 每个操作保留最近的样本数
+
+    def __init__(self):
+        self.samples = {}  # 操作名 -> 最近的耗时 (ms)
+        self.stalls = deque(maxlen=100)
+        self.stack = []  # 界面线程上正在执行的操作
+        self.gui_thread = threading.get_ident()
+        self.trace_path = None
+        self.pending = []  # 尚未写入跟踪文件的记录
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # 退出时界面线程也会写跟踪文件
+        self.started = False
+
+    @contextmanager
+    def span(self, name):
+        """测量一段代码的耗时；在界面线程中执行时，卡顿记录会包含正在执行的操作名"""
+        on_gui_thread = threading.get_ident() == self.gui_thread
+        if on_gui_thread:
+            self.stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if on_gui_thread:
+                self.stack.pop()
+            self.record(name, duration)
+
+    def timed(self, name):
+        """装饰器形式的span，测量整个方法"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, duration):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, deque(maxlen=self.SAMPLES))
+        samples.append(duration)
+        if self.trace_path is not None:
+            with self.lock:
+                self.pending.append({'time': time.time(), 'span': name, 'ms': round(duration, 3)})
+
+    def start(self, trace_path=None, stall_threshold_ms=STALL_THRESHOLD_MS):
+        """在界面线程中调用：启动心跳定时器和卡顿检测线程"""
+        if self.started:
+            return
+        self.started = True
+        self.gui_thread = threading.get_ident()
+        self.trace_path = trace_path
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.last_beat = time.monotonic()
+        self.heartbeat = QTimer()
+        self.heartbeat.timeout.connect(self.beat)
+        self.heartbeat.start(HEARTBEAT_MS)
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def beat(self):
+        self.last_beat = time.monotonic()
+
+    def watch(self):
+        """检测线程：心跳长时间未更新时，记下界面线程正在执行的操作和调用栈"""
+        import traceback
+        stall = None
+        while True:
+            time.sleep(HEARTBEAT_MS / 1000)
+            last_beat = self.last_beat
+            if stall is None:
+                if time.monotonic() - last_beat > self.stall_threshold:
+                    frame = sys._current_frames().get(self.gui_thread)
+                    stack = traceback.extract_stack(frame, limit=12) if frame is not None else []
+                    stall = {
+                        'time': time.time(),
+                        'beat': last_beat,
+                        'spans': list(self.stack),
+                        'stack': [f'{os.path.basename(f.filename)}:{f.lineno} {f.name}' for f in stack],
+                    }
+            elif last_beat != stall['beat']:
+                # 心跳恢复：两次心跳的间隔减去正常的心跳间隔就是卡顿时长
+                stall['ms'] = round((last_beat - stall.pop('beat')) * 1000 - HEARTBEAT_MS, 1)
+                self.stalls.append(stall)
+                if self.trace_path is not None:
+                    with self.lock:
+                        self.pending.append(dict(stall, span='stall'))
+                stall = None
+            self.flush_trace()
+
+    def flush_trace(self):
+        """把积累的记录追加到跟踪文件，文件过大时轮换为.1"""
+        if self.trace_path is None:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        with self.write_lock:
+            try:
+                if os.path.exists(self.trace_path) and os.path.getsize(self.trace_path) > TRACE_MAX_BYTES:
+                    os.replace(self.trace_path, self.trace_path + '.1')
+                with open(self.trace_path, 'a', encoding='utf-8') as f:
+                    for entry in pending:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"写入跟踪文件时出错: {e}")
+
+    def summary(self):
+        """各操作耗时的p50/p99和最近的卡顿，供性能统计窗口显示"""
+        lines = [f'{"操作":<16}{"次数":>8}{"p50":>10}{"p99":>10}{"最大":>10}  (ms)']
+        for name in sorted(self.samples):
+            values = sorted(self.samples[name])
+            if not values:
+                continue
+            p50 = values[len(values) // 2]
+            p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+            lines.append(f'{name:<16}{len(values):>8}{p50:>10.1f}{p99:>10.1f}{values[-1]:>10.1f}')
+        stalls = list(self.stalls)
+        lines.append('')
+        lines.append(f'卡顿 (>{self.stall_threshold * 1000:.0f} ms): {len(stalls)} 次' if self.started
+                     else '卡顿检测未启动')
+        for stall in reversed(stalls[-5:]):
+            when = time.strftime('%H:%M:%S', time.localtime(stall['time']))
+            spans = ' > '.join(stall['spans']) or '-'
+            location = stall['stack'][-1] if stall['stack'] else '-'
+            lines.append(f'  {when} {stall["ms"]:>8.0f} ms  {spans}  {location}')
+        return '\n'.join(lines)
+
+
+profiler = Profiler()
+
+
+ORDER_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'  # 按ASCII顺序排列
+FIRST_ORDER_KEY = 'V001'
+
+
+def order_key_after(key):
+    """比key大的下一个顺序键：按62进制加一，长度不变；全部是z时在末尾追加一位"""
+    digits = [ORDER_DIGITS.index(c) for c in key]
+    i = len(digits) - 1
+    while i >= 0 and digits[i] == len(ORDER_DIGITS) - 1:
+        digits[i] = 0
+        i -= 1
+    if i < 0:
+        return key + ORDER_DIGITS[len(ORDER_DIGITS) // 2]
+    digits[i] += 1
+    if digits[-1] == 0:
+        digits[-1] = 1  # 顺序键不以0结尾，否则无法在它前面插入
+    return ''.join(ORDER_DIGITS[d] for d in digits)
+
+
+def order_key_before(key):
+    """比key小的上一个顺序键：按62进制减一，长度不变；已经是这个长度最小的键时，在全部是0的前缀后接FIRST_ORDER_KEY"""
+    digits = [ORDER_DIGITS.index(c) for c in key]
+    while True:
+        i = len(digits) - 1
+        while i >= 0 and digits[i] == 0:
+            digits[i] = len(ORDER_DIGITS) - 1
+            i -= 1
+        if i < 0:
+            return '0' * len(key) + FIRST_ORDER_KEY
+        digits[i] -= 1
+        if digits[-1] != 0:  # 顺序键不以0结尾，以0结尾时再减一
+            return ''.join(ORDER_DIGITS[d] for d in digits)
+
+
+def order_key_midpoint(low, high):
+    """low和high之间的顺序键，low可以为空字符串，high为None表示没有上界"""
+    if high is not None:
+        n = 0
+        while n < len(high) and (low[n] if n < len(low) else '0') == high[n]:
+            n += 1
+        if n > 0:
+            return high[:n] + order_key_midpoint(low[n:], high[n:])
+    digit_low = ORDER_DIGITS.index(low[0]) if low else 0
+    digit_high = ORDER_DIGITS.index(high[0]) if high is not None else len(ORDER_DIGITS)
+    if digit_high - digit_low > 1:
+        return ORDER_DIGITS[(digit_low + digit_high + 1) // 2]
+    if high is not None and len(high) > 1:
+        return high[0]
+    return ORDER_DIGITS[digit_low] + order_key_midpoint(low[1:], None)
+
+
+def order_key_between(before, after):
+    """插入到两个相邻任务之间的顺序键；before或after为None表示插入到开头或末尾"""
+    if after is None:
+        return order_key_after(before) if before else FIRST_ORDER_KEY
+    if before is None:
+        # 反复移到开头时按固定长度减一，不取和空字符串的中间值，否则顺序键会越来越长
+        return order_key_before(after)
+    return order_key_midpoint(before, after)
+
+
+def order_of(record):
+    """排序依据：顺序键相同时（不同设备同时追加的任务）按任务ID排列"""
+    return record.get('order_key') or '', record['id']
+
+
+class TaskItem:
+    """单条任务的数据"""
+    __slots__ = ('id', 'text', 'completed', 'font_size', 'created_at', 'completed_at',
+                 'due_at', 'remind_at', 'order_key')
+
+    def __init__(self, text='', completed=False, font_size=12, id=None,
+                 created_at=None, completed_at=None, due_at=None, remind_at=None, order_key=None):
+        self.id = id or uuid.uuid4().hex
+        self.text = text
+        self.completed = completed
+        self.font_size = font_size
+        self.created_at = created_at or time.time()
+        self.completed_at = completed_at
+        self.due_at = due_at  # 截止时间，None表示没有
+        self.remind_at = remind_at  # 下一次提醒的时间，提醒后清除
+        self.order_key = order_key  # 顺序键，按字符串顺序排列；移动任务时只修改这一个任务的键
+
+    def set_completed(self, completed):
+        self.completed = completed
+        self.completed_at = time.time() if completed else None
+
+    def to_record(self):
+        """转换为可写入存储的字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(**{name: record[name] for name in cls.__slots__ if name in record})
+
+
+def iter_notes(path):
+    """流式解析便签文件，逐条产出TaskItem，不在内存中保留整棵XML树"""
+    import xml.etree.ElementTree as ET
+
+    context = ET.iterparse(path, events=('start', 'end'))
+    root = None
+    for event, elem in context:
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
+        if elem.tag == 'note':
+            text_elem = elem.find('text')
+            completed_elem = elem.find('completed')
+            text = (text_elem.text if text_elem is not None else None) or ""
+            completed = completed_elem is not None and (completed_elem.text or '').lower() == 'true'
+            times = {}
+            for name in ('due_at', 'remind_at'):
+                try:
+                    times[name] = float(elem.findtext(name))
+                except (TypeError, ValueError):
+                    pass
+            yield TaskItem(text, completed, id=elem.get('id'), order_key=elem.get('order_key'), **times)
+            # 已处理的节点及时释放
+            elem.clear()
+            root.clear()
+
+
+class XmlStore:
+    """旧版XML存储：整个列表保存在一个文件中，每次保存都重写整个文件"""
+    incremental = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if os.path.exists(self.path):
+            return iter_notes(self.path)
+        return iter(())
+
+    def save(self, records):
+        """把全部任务记录写入文件，先写临时文件再原子替换"""
+        import xml.etree.ElementTree as ET
+        from xml.dom import minidom
+        
+        root = ET.Element("stickynotes")
+        
+        for record in records:
+            # 获取任务文本内容并去除首尾空白
+            text_content = record['text'].strip()
+            # 只保存非空任务
+            if text_content:
+                note = ET.SubElement(root, "note", id=record['id'])
+                if record.get('order_key'):
+                    note.set('order_key', record['order_key'])
+                text = ET.SubElement(note, "text")
+                # 保存原始文本（包括中间的换行和空格），只去除首尾空白
+                text.text = text_content
+                completed = ET.SubElement(note, "completed")
+                completed.text = str(record['completed'])
+                for name in ('due_at', 'remind_at'):
+                    if record.get(name) is not None:
+                        ET.SubElement(note, name).text = repr(record[name])
+        
+        # 创建格式化的XML字符串
+        xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="    ")
+        
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(xml_str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
+
+
+def read_jsonl(path):
+    """逐行读取JSON Lines文件，跳过崩溃时写了一半的行"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class JournalStore:
+    """追加式日志存储
+
+    增删改每次只向日志追加一条记录；日志超过一定长度后，
+    在后台线程中把日志合并进快照文件。崩溃时最多丢失最后一条记录。
+    """
+    incremental = True
+    COMPACT_THRESHOLD = 1000  # 日志达到多少条记录时触发合并
+
+    def __init__(self, base_path, legacy_xml=None):
+        self.snapshot_path = base_path + '.snapshot.jsonl'
+        self.journal_path = base_path + '.journal.jsonl'
+        # 合并过程中被轮换出来的日志，合并完成后删除
+        self.compacting_path = self.journal_path + '.old'
+        self.legacy_xml = legacy_xml
+        self.lock = threading.Lock()
+        self.journal = None
+        self.record_count = 0
+        self.compact_thread = None
+
+    def read_changes(self, paths):
+        """读取日志，返回 任务ID -> 最新记录（删除为None），按第一次出现的顺序排列"""
+        changes = {}
+        for path in paths:
+            for record in read_jsonl(path):
+                changes[record['id']] = record if record.get('op') == 'put' else None
+                if path == self.journal_path:
+                    self.record_count += 1
+        return changes
+
+    def merged_records(self, changes):
+        """把日志中的修改应用到快照上，按顺序键产出任务记录，空任务不保留
+
+        快照按顺序键排列；日志中带顺序键的记录排序后与快照归并，快照仍然流式读取。
+        没有顺序键的旧版记录保持原来的位置。
+        """
+        moved = sorted((record for record in changes.values()
+                        if record is not None and record.get('order_key')), key=order_of)
+        moved_ids = {record['id'] for record in moved}
+
+        def snapshot_records():
+            for record in read_jsonl(self.snapshot_path):
+                if record['id'] in changes:
+                    replacement = changes.pop(record['id'])
+                    if replacement is None or record['id'] in moved_ids:
+                        continue
+                    record = replacement
+                yield record
+            for record in changes.values():
+                if record is not None and record['id'] not in moved_ids:
+                    yield record
+
+        for record in heapq.merge(snapshot_records(), moved, key=order_of):
+            if record.get('text', '').strip():
+                record.pop('op', None)
+                yield record
+
+    def load(self):
+        """按顺序产出快照和日志合并后的任务
+
+        日志不会超过合并阈值，先整体读入；快照可能很大，逐行流式读取。
+        """
+        if (self.legacy_xml and os.path.exists(self.legacy_xml)
+                and not os.path.exists(self.snapshot_path)
+                and not os.path.exists(self.journal_path)):
+            self.import_legacy()
+        
+        self.record_count = 0
+        changes = self.read_changes((self.compacting_path, self.journal_path))
+        for record in self.merged_records(changes):
+            yield TaskItem.from_record(record)
+        
+        if os.path.exists(self.compacting_path):
+            # 上次合并没有完成，重新合并
+            self.compact()
+
+    def import_legacy(self):
+        """首次运行时把旧版XML便签文件导入为快照"""
+        try:
+            self.write_snapshot(task.to_record() for task in iter_notes(self.legacy_xml))
+        except Exception as e:
+            print(f"导入旧版便签文件时出错: {e}")
+
+    def write_snapshot(self, records):
+        """写入临时文件后原子替换快照"""
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def open_journal(self):
+        # 上次崩溃可能留下不完整的最后一行，先补上换行，避免新记录接在它后面
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0:
+            with open(self.journal_path, 'rb+') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def append(self, changes):
+        """追加修改记录，changes为(任务ID, 记录或None表示删除)列表"""
+        if not changes:
+            return
+        with self.lock:
+            if self.journal is None:
+                self.open_journal()
+            for task_id, record in changes:
+                if record is None:
+                    record = {'op': 'del', 'id': task_id}
+                else:
+                    record = dict(record, op='put')
+                self.journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.record_count += len(changes)
+        if self.record_count >= self.COMPACT_THRESHOLD:
+            self.compact()
+
+    def compact(self):
+        """轮换当前日志，并在后台线程中把它合并进快照"""
+        if self.compact_thread is not None and self.compact_thread.is_alive():
+            return
+        with self.lock:
+            # 上次合并未完成时先处理遗留的旧日志，当前日志留到下次
+            if not os.path.exists(self.compacting_path):
+                if self.journal is not None:
+                    self.journal.close()
+                    self.journal = None
+                if not os.path.exists(self.journal_path):
+                    return
+                os.replace(self.journal_path, self.compacting_path)
+                self.record_count = 0
+        self.compact_thread = threading.Thread(target=self.run_compaction, daemon=True)
+        self.compact_thread.start()
+
+    def run_compaction(self):
+        try:
+            self.write_snapshot(self.merged_records(self.read_changes((self.compacting_path,))))
+            # 快照替换完成后才删除旧日志；中途崩溃时重放旧日志结果不变
+            os.remove(self.compacting_path)
+        except Exception as e:
+            print(f"合并便签日志时出错: {e}")
+
+    def close(self):
+        if self.compact_thread is not None:
+            self.compact_thread.join()
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+
+class StoreWriter:
+    """后台写入线程：所有存储写操作都在这个线程中串行执行，界面线程不会等待磁盘
+
+    写入期间提交的修改会合并，同一任务的多次修改只写最后一次。
+    要归档的任务先写入归档，再从存储中删除。每天的统计计数也由这个线程写入。
+    写入失败的修改保留下来，下次提交（下一次自动保存）或关闭时重新写入，不覆盖之后提交的更新的修改。
+    """
+
+    def __init__(self, store, archive=None, stats=None):
+        self.store = store
+        self.archive = archive
+        self.stats = stats
+        self.condition = threading.Condition()
+        self.changes = {}  # 任务ID -> 记录（删除为None），保持第一次提交的顺序
+        self.snapshot = None  # 非增量存储的全量记录，只保留最新一份
+        self.archive_records = []  # 等待写入归档的任务记录
+        self.stats_rows = {}  # 日期 -> 统计计数，同一天只写最后一次
+        self.failed = None  # 写入失败的(修改, 全量记录, 统计计数)，等待重新写入
+        self.busy = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, changes=None, snapshot=None, archive=None, stats=None):
+        with self.condition:
+            self.retry_failed()
+            for task_id, record in changes or ():
+                self.changes[task_id] = record
+            if snapshot is not None:
+                self.snapshot = snapshot
+            self.archive_records.extend(archive or ())
+            for row in stats or ():
+                self.stats_rows[row[0]] = row
+            self.condition.notify_all()
+
+    def retry_failed(self):
+        """把写入失败的修改放回待写入的队列；同一任务或同一天已经有更新的修改时保留更新的"""
+        if self.failed is None:
+            return
+        changes, snapshot, stats_rows = self.failed
+        self.failed = None
+        for task_id, record in changes:
+            self.changes.setdefault(task_id, record)
+        if self.snapshot is None:
+            self.snapshot = snapshot
+        for row in stats_rows:
+            self.stats_rows.setdefault(row[0], row)
+
+    def has_work(self):
+        return bool(self.changes or self.archive_records or self.stats_rows) or self.snapshot is not None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.has_work() and not self.closed:
+                    self.condition.wait()
+                if not self.has_work():
+                    return
+                changes, self.changes = list(self.changes.items()), {}
+                snapshot, self.snapshot = self.snapshot, None
+                archive_records, self.archive_records = self.archive_records, []
+                stats_rows, self.stats_rows = list(self.stats_rows.values()), {}
+                self.busy = True
+            if archive_records:
+                try:
+                    self.archive.add(archive_records)
+                except Exception as e:
+                    print(f"归档任务时出错: {e}")
+                    # 归档失败时这些任务仍保留在存储中，下次启动时重新出现
+                    kept = {record['id']: record for record in archive_records}
+                    changes = [(task_id, kept.get(task_id) if record is None else record)
+                               for task_id, record in changes]
+                    if snapshot is not None:
+                        snapshot = snapshot + list(kept.values())
+            failed_changes, failed_snapshot, failed_stats = [], None, []
+            try:
+                with profiler.span('store_write'):
+                    if snapshot is not None:
+                        self.store.save(snapshot)
+                    if changes:
+                        self.store.append(changes)
+            except Exception as e:
+                print(f"保存笔记时出错: {e}")
+                # 写入一遍相同的记录结果不变，整批留到下次重新写入
+                failed_changes, failed_snapshot = changes, snapshot
+            if stats_rows:
+                try:
+                    self.stats.write(stats_rows)
+                except Exception as e:
+                    print(f"保存统计时出错: {e}")
+                    failed_stats = stats_rows
+            with self.condition:
+                if failed_changes or failed_snapshot is not None or failed_stats:
+                    self.failed = (failed_changes, failed_snapshot, failed_stats)
+                self.busy = False
+                self.condition.notify_all()
+
+    def flush(self):
+        """等待已提交的修改全部写入磁盘"""
+        with self.condition:
+            while self.has_work() or self.busy:
+                self.condition.wait()
+
+    def close(self):
+        """写完剩余的修改后结束线程并关闭存储；之前写入失败的修改在这里再写入一次"""
+        with self.condition:
+            self.retry_failed()
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.store.close()
+
+
+class SyncFolder:
+    """通过共享目录在多台设备间同步：每台设备只追加写自己的修改文件，读取其他设备文件中新增的部分
+
+    每条修改带有Lamport时钟和设备ID，同一任务以(时钟, 设备ID)较大的修改为准，所有设备得到相同的结果。
+    本机的时钟、各设备文件的读取位置和每个任务的版本保存在本地SQLite数据库中，
+    一次同步的开销与新增的修改数量成正比，与任务总数无关。文件读写都在后台线程中进行。
+    """
+
+    def __init__(self, folder, device, state_path, on_received):
+        self.folder = folder
+        self.device = device
+        self.path = os.path.join(folder, device + '.jsonl')
+        self.state_path = state_path
+        self.on_received = on_received  # 在后台线程中调用，参数为[(任务ID, 记录或None, 版本)]
+        self.conn = None
+        self.clock = 0
+        self.cursors = {}  # 设备ID -> 已读取到的字节位置
+        self.latest = {}  # 本次运行中各任务的最新版本，界面线程应用修改前用来检查
+        self.latest_lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.outbox = {}  # 任务ID -> 记录（删除为None）
+        self.bootstrap_records = None
+        self.pull_requested = False
+        self.busy = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, changes):
+        """提交本机的修改"""
+        with self.condition:
+            for task_id, record in changes:
+                self.outbox[task_id] = record
+            self.condition.notify_all()
+
+    def request_pull(self):
+        with self.condition:
+            self.pull_requested = True
+            self.condition.notify_all()
+
+    def bootstrap(self, records):
+        """第一次同步时发布本机已有的任务；其他设备已经有的任务以其他设备为准"""
+        with self.condition:
+            self.bootstrap_records = records
+            self.pull_requested = True
+            self.condition.notify_all()
+
+    def has_work(self):
+        return bool(self.outbox) or self.pull_requested or self.bootstrap_records is not None
+
+    def is_current(self, task_id, version):
+        """version仍是任务的最新版本时返回True；界面线程应用修改之前本机又修改过这个任务时为False"""
+        with self.latest_lock:
+            return self.latest.get(task_id) == version
+
+    def run(self):
+        try:
+            self.open_state()
+        except Exception as e:
+            print(f"打开同步状态时出错: {e}")
+            self.conn = None  # 之后提交的修改直接丢弃，本机存储不受影响
+        while True:
+            with self.condition:
+                while not self.has_work() and not self.closed:
+                    self.condition.wait()
+                if not self.has_work():
+                    break
+                outbox, self.outbox = list(self.outbox.items()), {}
+                bootstrap_records, self.bootstrap_records = self.bootstrap_records, None
+                pull, self.pull_requested = self.pull_requested, False
+                self.busy = True
+            try:
+                if self.conn is not None:
+                    self.sync(outbox, pull, bootstrap_records)
+            except Exception as e:
+                print(f"同步便签时出错: {e}")
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+        if self.conn is not None:
+            self.conn.close()
+
+    @profiler.timed('sync')
+    def sync(self, outbox, pull, bootstrap_records):
+        """先发布本机的修改，再读取其他设备的修改"""
+        self.publish(outbox)
+        received = self.pull() if pull else []
+        if bootstrap_records is not None and not os.path.exists(self.path):
+            self.publish([(record['id'], record) for record in bootstrap_records
+                          if self.version_of(record['id']) is None])
+        if received:
+            self.on_received(received)
+
+    def open_state(self):
+        import sqlite3
+        os.makedirs(self.folder, exist_ok=True)
+        self.conn = sqlite3.connect(self.state_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS clock (value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS cursors (device TEXT PRIMARY KEY, offset INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS versions (
+                id TEXT PRIMARY KEY, clock INTEGER NOT NULL, device TEXT NOT NULL);
+        """)
+        row = self.conn.execute('SELECT value FROM clock').fetchone()
+        self.clock = row[0] if row else 0
+        self.cursors = dict(self.conn.execute('SELECT device, offset FROM cursors'))
+
+    def version_of(self, task_id):
+        row = self.conn.execute('SELECT clock, device FROM versions WHERE id = ?', (task_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def save_state(self, versions):
+        with self.conn:
+            self.conn.execute('DELETE FROM clock')
+            self.conn.execute('INSERT INTO clock VALUES (?)', (self.clock,))
+            self.conn.executemany('INSERT OR REPLACE INTO cursors VALUES (?, ?)', self.cursors.items())
+            self.conn.executemany('INSERT OR REPLACE INTO versions VALUES (?, ?, ?)',
+                                  [(task_id,) + version for task_id, version in versions.items()])
+        with self.latest_lock:
+            self.latest.update(versions)
+
+    def publish(self, changes):
+        """把本机的修改追加到自己的文件，每条修改使用新的时钟值"""
+        if not changes:
+            return
+        versions = {}
+        lines = []
+        for task_id, record in changes:
+            self.clock += 1
+            versions[task_id] = (self.clock, self.device)
+            lines.append(json.dumps({'id': task_id, 'clock': self.clock, 'device': self.device,
+                                     'record': record}, ensure_ascii=False) + '\n')
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.save_state(versions)
+
+    def pull(self):
+        """读取其他设备文件中新增的完整行，返回版本比本机新的修改"""
+        received = {}
+        versions = {}
+        read = False
+        for entry in os.scandir(self.folder):
+            device, ext = os.path.splitext(entry.name)
+            if ext != '.jsonl' or device == self.device:
+                continue
+            offset = self.cursors.get(device, 0)
+            if entry.stat().st_size <= offset:
+                continue
+            with open(entry.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # 另一台设备可能正在写入，最后不完整的一行留到下次读取
+            end = data.rfind(b'\n') + 1
+            self.cursors[device] = offset + end
+            read = True
+            for line in data[:end].splitlines():
+                try:
+                    delta = json.loads(line)
+                    version = (int(delta['clock']), str(delta['device']))
+                    task_id = delta['id']
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.clock = max(self.clock, version[0])
+                current = versions.get(task_id) or self.version_of(task_id)
+                if current is None or version > current:
+                    versions[task_id] = version
+                    received[task_id] = (task_id, delta.get('record'), version)
+        if read:
+            self.save_state(versions)
+        return list(received.values())
+
+    def flush(self):
+        with self.condition:
+            while self.has_work() or self.busy:
+                self.condition.wait()
+
+    def close(self):
+        """写完剩余的修改后结束线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class SqliteStore:
+    """SQLite存储：每个任务一行，按行事务写入，按页读取
+
+    打开、完成、删除的开销与任务总数基本无关。首次使用时自动迁移已有的日志或XML数据。
+    """
+    incremental = True
+    PAGE_SIZE = 500  # 加载时每页读取的行数
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            font_size INTEGER NOT NULL DEFAULT 12,
+            created_at REAL NOT NULL,
+            completed_at REAL,
+            due_at REAL,
+            remind_at REAL,
+            order_key TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_position ON tasks(position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed, position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks(completed_at);
+    """
+    COLUMNS = ('id', 'text', 'completed', 'font_size', 'created_at', 'completed_at', 'due_at', 'remind_at',
+               'order_key')
+    # 旧版数据库中没有的列
+    ADDED_COLUMNS = (('due_at', 'REAL'), ('remind_at', 'REAL'), ('order_key', "TEXT NOT NULL DEFAULT ''"))
+
+    def __init__(self, path, migrate_from=None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(tasks)')}
+        for name, column_type in self.ADDED_COLUMNS:
+            if name not in existing:
+                conn.execute(f'ALTER TABLE tasks ADD COLUMN {name} {column_type}')
+        # 按(顺序键, 任务ID)分页读取；旧版数据的顺序键为空，按原来的position排列
+        conn.execute('DROP INDEX IF EXISTS idx_tasks_order')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_order_id ON tasks(order_key, id)')
+        if is_new and migrate_from is not None:
+            self.migrate(migrate_from)
+
+    def connection(self):
+        """每个线程使用自己的连接：界面线程读取，写入线程写入"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')  # 写入时不阻塞读取
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def migrate(self, source):
+        """把旧存储中的全部任务在一个事务中写入数据库"""
+        try:
+            conn = self.connection()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO tasks (position, id, text, completed, font_size, '
+                    'created_at, completed_at, due_at, remind_at, order_key) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    ((position,) + self.row_values(task.to_record())
+                     for position, task in enumerate(source.load(), 1)))
+            source.close()
+        except Exception as e:
+            print(f"迁移便签数据时出错: {e}")
+
+    def row_values(self, record):
+        return (record['id'], record['text'], int(record['completed']), record['font_size'],
+                record['created_at'], record['completed_at'], record.get('due_at'), record.get('remind_at'),
+                record.get('order_key') or '')
+
+    def load(self):
+        """分页读取，每页按索引定位，不使用OFFSET
+
+        先按position读取没有顺序键的旧版数据，再按(order_key, id)读取其余任务。
+        """
+        conn = self.connection()
+        pages = (
+            ("order_key = '' AND position > ? ORDER BY position", (0,), lambda row: (row[0],)),
+            ("order_key != '' AND (order_key, id) > (?, ?) ORDER BY order_key, id", ('', ''),
+             lambda row: (row[-1], row[1])),
+        )
+        for condition, last, next_last in pages:
+            while True:
+                rows = conn.execute(
+                    'SELECT position, ' + ', '.join(self.COLUMNS) + ' FROM tasks WHERE ' + condition + ' LIMIT ?',
+                    last + (self.PAGE_SIZE,)).fetchall()
+                for row in rows:
+                    record = dict(zip(self.COLUMNS, row[1:]))
+                    record['completed'] = bool(record['completed'])
+                    if record['text'].strip():
+                        yield TaskItem.from_record(record)
+                if len(rows) < self.PAGE_SIZE:
+                    break
+                last = next_last(rows[-1])
+
+    def append(self, changes):
+        """在一个事务中逐行写入修改；显示顺序由顺序键决定，移动任务只更新这一行"""
+        conn = self.connection()
+        with conn:
+            for task_id, record in changes:
+                if record is None:
+                    conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+                    continue
+                conn.execute(
+                    'INSERT INTO tasks (position, id, text, completed, font_size, '
+                    'created_at, completed_at, due_at, remind_at, order_key) '
+                    'VALUES ((SELECT COALESCE(MAX(position), 0) + 1 FROM tasks), ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(id) DO UPDATE SET text = excluded.text, '
+                    'completed = excluded.completed, font_size = excluded.font_size, '
+                    'completed_at = excluded.completed_at, due_at = excluded.due_at, '
+                    'remind_at = excluded.remind_at, order_key = excluded.order_key',
+                    self.row_values(record))
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+
+def open_store(storage):
+    """根据配置创建存储后端"""
+    xml_path = os.path.expanduser('~/.stickynotes.xml')
+    journal_base = os.path.expanduser('~/.stickynotes')
+    if storage == 'xml':
+        return XmlStore(xml_path)
+    journal = JournalStore(journal_base, legacy_xml=xml_path)
+    if storage == 'sqlite':
+        # 优先迁移日志存储中的数据，没有时再导入旧版XML文件
+        if os.path.exists(journal.snapshot_path) or os.path.exists(journal.journal_path):
+            source = journal
+        else:
+            source = XmlStore(xml_path)
+        return SqliteStore(journal_base + '.db', migrate_from=source)
+    return journal
+
+
+class TaskArchive:
+    """已完成任务的归档：按完成月份保存为gzip压缩的JSON Lines文件，index.json记录各月任务数
+
+    每次归档向对应月份的文件追加一个gzip成员；查看时只解压选中的月份。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.join(path, 'index.json')
+        self.lock = threading.Lock()  # 写入线程追加归档时，界面线程可能正在读取或恢复
+        self.index = self.read_index()
+
+    def read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def month_path(self, month):
+        return os.path.join(self.path, f'{month}.jsonl.gz')
+
+    @staticmethod
+    def month_of(record):
+        return time.strftime('%Y-%m', time.localtime(record.get('completed_at') or record['created_at']))
+
+    def months(self):
+        """有归档任务的月份，最近的在前"""
+        return sorted(self.index, reverse=True)
+
+    def add(self, records):
+        """把记录按月份追加到归档文件，写入磁盘后再更新索引"""
+        import gzip
+        by_month = {}
+        for record in records:
+            by_month.setdefault(self.month_of(record), []).append(record)
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            for month, month_records in by_month.items():
+                data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in month_records)
+                with open(self.month_path(month), 'ab') as f:
+                    f.write(gzip.compress(data.encode('utf-8')))
+                    f.flush()
+                    os.fsync(f.fileno())
+                entry = self.index.setdefault(month, {'count': 0})
+                entry['count'] += len(month_records)
+            self.write_index()
+
+    def load_month(self, month):
+        """读取一个月的归档任务；同一任务归档过多次时以最后一次为准"""
+        with self.lock:
+            return [TaskItem.from_record(record) for record in self.read_month(month).values()]
+
+    def read_month(self, month):
+        import gzip
+        import zlib
+        records = {}
+        try:
+            with gzip.open(self.month_path(month), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    records[record['id']] = record
+        except FileNotFoundError:
+            pass
+        except (EOFError, OSError, zlib.error) as e:
+            # 追加时崩溃会留下不完整的最后一个gzip成员，之前的内容仍然可用
+            print(f"读取归档 {month} 时出错: {e}")
+        return records
+
+    def remove(self, month, ids):
+        """从归档中移除任务（恢复到任务列表时），重写该月的文件"""
+        import gzip
+        with self.lock:
+            records = [record for task_id, record in self.read_month(month).items()
+                       if task_id not in ids]
+            path = self.month_path(month)
+            if records:
+                data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(gzip.compress(data.encode('utf-8')))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+                self.index[month] = {'count': len(records)}
+            else:
+                if os.path.exists(path):
+                    os.remove(path)
+                self.index.pop(month, None)
+            self.write_index()
+
+    def search(self, text, limit=500):
+        """逐月解压搜索归档，最多返回limit个同时包含所有搜索词的任务"""
+        tokens = tokenize_query(text)
+        results = []
+        for month in self.months():
+            for task in self.load_month(month):
+                if tokens <= tokenize(task.text):
+                    results.append(task)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+class TaskHistory:
+    """每日快照：任务记录按内容分块存储，各天共用没有变化的块
+
+    一天的快照是若干块的哈希，每块是一段连续任务记录的JSON，压缩后按哈希存储。分块边界由
+    任务记录的哈希决定，增删或修改任务只改变所在的块，其余的块与前一天共用。存储随变化的
+    任务数量增长，而不是天数乘以任务数；按日期读取只需查询days表和当天的几百个块。
+    """
+    CHUNK_MASK = 0x0f  # 任务哈希末尾两位与此相与为0时结束一块，平均每块16个任务
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (hash TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS days (day TEXT PRIMARY KEY, chunks TEXT NOT NULL, count INTEGER NOT NULL);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()  # 快照在后台线程中写入，界面线程读取
+        self.known = set()  # 本次运行中已写入的块，不再重复压缩和插入
+
+    def connection(self):
+        if self.conn is None:
+            import sqlite3
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.executescript(self.SCHEMA)
+        return self.conn
+
+    @staticmethod
+    def digest(data):
+        import hashlib
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def record_day(self, day, records):
+        """保存一天的快照；同一天再次保存时替换当天的快照"""
+        import zlib
+        chunks = [[]]
+        for record in records:
+            data = json.dumps(record, ensure_ascii=False, sort_keys=True)
+            chunks[-1].append(data)
+            if int(self.digest(data)[-2:], 16) & self.CHUNK_MASK == 0:
+                chunks.append([])
+        new_chunks = {}
+        chunk_hashes = []
+        for chunk in chunks:
+            if chunk:
+                data = ','.join(chunk)
+                digest = self.digest(data)
+                chunk_hashes.append(digest)
+                if digest not in self.known:
+                    new_chunks[digest] = zlib.compress(data.encode('utf-8'))
+        with self.lock:
+            conn = self.connection()
+            with conn:
+                conn.executemany('INSERT OR IGNORE INTO chunks VALUES (?, ?)', new_chunks.items())
+                conn.execute('INSERT OR REPLACE INTO days VALUES (?, ?, ?)',
+                             (day, ','.join(chunk_hashes), len(records)))
+            self.known.update(chunk_hashes)
+
+    def days(self):
+        """有快照的日期和当天的任务数，最近的在前"""
+        with self.lock:
+            return self.connection().execute('SELECT day, count FROM days ORDER BY day DESC').fetchall()
+
+    def load_day(self, day):
+        """读取某一天快照中的任务，没有快照时返回空列表"""
+        import zlib
+        with self.lock:
+            conn = self.connection()
+            row = conn.execute('SELECT chunks FROM days WHERE day = ?', (day,)).fetchone()
+            if row is None or not row[0]:
+                return []
+            chunk_hashes = row[0].split(',')
+            chunks = {}
+            for i in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[i:i + 500]
+                chunks.update(conn.execute('SELECT hash, data FROM chunks WHERE hash IN (%s)'
+                                           % ','.join('?' * len(batch)), batch))
+        # 拼成一个JSON数组一次解析，比逐条解析快得多
+        text = b','.join(zlib.decompress(chunks[digest]) for digest in chunk_hashes)
+        records = json.loads(b'[' + text + b']')
+        return [TaskItem.from_record(record) for record in records]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+class TaskStats:
+    """按天累计的任务统计：新建、完成、重新打开、删除的数量，完成用时之和，以及当天最后记录的未完成任务数
+
+    每个操作只给当天的计数加一，合计另存一行随之累加，不扫描任务或历史。第一次用到时只读取最近
+    STATS_DAYS + 1 个有记录的天和合计，统计窗口的开销与任务数和天数无关。有变化的天由写入线程写入SQLite。
+    """
+    FIELDS = ('created', 'completed', 'reopened', 'deleted', 'latency', 'open')
+    TOTAL = 'total'  # 合计行；合计行的open是最近一次记录的未完成任务数
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS days (
+            day TEXT PRIMARY KEY,
+            created INTEGER NOT NULL,
+            completed INTEGER NOT NULL,
+            reopened INTEGER NOT NULL,
+            deleted INTEGER NOT NULL,
+            latency REAL NOT NULL,
+            open INTEGER
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()  # 写入线程写入，导出线程读取
+        self.days = None  # 日期 -> 计数，只有最近几天和本次运行中修改过的天
+        self.total = None
+        self.dirty = set()
+
+    def connection(self):
+        if self.conn is None:
+            import sqlite3
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.executescript(self.SCHEMA)
+        return self.conn
+
+    @staticmethod
+    def empty_row():
+        return [0, 0, 0, 0, 0.0, None]
+
+    def ensure_loaded(self):
+        if self.days is not None:
+            return
+        self.days = {}
+        self.total = self.empty_row()
+        try:
+            with self.lock:
+                conn = self.connection()
+                rows = conn.execute('SELECT * FROM days WHERE day != ? ORDER BY day DESC LIMIT ?',
+                                    (self.TOTAL, STATS_DAYS + 1)).fetchall()
+                total = conn.execute('SELECT * FROM days WHERE day = ?', (self.TOTAL,)).fetchone()
+        except Exception as e:
+            print(f"读取统计时出错: {e}")
+            return
+        self.days = {row[0]: list(row[1:]) for row in rows}
+        if total is not None:
+            self.total = list(total[1:])
+
+    def add(self, **counts):
+        """给今天和合计加上各项计数，例如add(completed=1, latency=秒数)"""
+        self.ensure_loaded()
+        day = time.strftime('%Y-%m-%d')
+        row = self.days.setdefault(day, self.empty_row())
+        for name, value in counts.items():
+            index = self.FIELDS.index(name)
+            row[index] += value
+            self.total[index] += value
+        self.dirty.add(day)
+
+    def set_open(self, count):
+        """记录当前的未完成任务数，作为今天的积压"""
+        self.ensure_loaded()
+        day = time.strftime('%Y-%m-%d')
+        row = self.days.setdefault(day, self.empty_row())
+        if row[-1] != count or self.total[-1] != count:
+            row[-1] = self.total[-1] = count
+            self.dirty.add(day)
+
+    def take_changes(self):
+        """取出有变化的天和合计，交给写入线程"""
+        if not self.dirty:
+            return []
+        rows = [(day, *self.days[day]) for day in sorted(self.dirty)]
+        self.dirty.clear()
+        return rows + [(self.TOTAL, *self.total)]
+
+    def write(self, rows):
+        """写入线程：保存有变化的天"""
+        with self.lock:
+            conn = self.connection()
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def recent(self, count=STATS_DAYS):
+        """最近count天（含今天）的计数，最早的在前；没有记录的天计数为0，积压沿用之前最后一次记录的值"""
+        self.ensure_loaded()
+        today = time.time()
+        days = [time.strftime('%Y-%m-%d', time.localtime(today - i * 86400)) for i in range(count - 1, -1, -1)]
+        earlier = [day for day in self.days if day < days[0]]
+        backlog = self.days[max(earlier)][-1] if earlier else None
+        result = []
+        for day in days:
+            row = list(self.days.get(day) or self.empty_row())
+            if row[-1] is None:
+                row[-1] = backlog
+            backlog = row[-1]
+            result.append((day, row))
+        return result
+
+    def export_csv(self, path):
+        """把所有天的计数写入CSV文件，平均完成用时以小时为单位"""
+        import csv
+        with self.lock:
+            rows = self.connection().execute('SELECT * FROM days WHERE day != ? ORDER BY day',
+                                             (self.TOTAL,)).fetchall()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding=CsvExporter.encoding, newline=CsvExporter.newline) as f:
+            writer = csv.writer(f)
+            writer.writerow(('day', 'created', 'completed', 'reopened', 'deleted', 'avg_latency_hours', 'open'))
+            for day, created, completed, reopened, deleted, latency, open_count in rows:
+                average = round(latency / completed / 3600, 2) if completed else ''
+                writer.writerow((day, created, completed, reopened, deleted, average,
+                                 '' if open_count is None else open_count))
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+class MarkdownExporter:
+    """Markdown：每个非空任务一个二级标题"""
+    extension = 'md'
+    encoding = 'utf-8'
+    newline = None
+
+    def __init__(self, file, title):
+        self.file = file
+        file.write(f"# {title}\n\n")
+
+    def write(self, number, record):
+        text = record['text'].strip()
+        if text:
+            self.file.write(f"## 任务 {number}\n\n{text}\n\n")
+
+    def close(self):
+        pass
+
+
+class JsonLinesExporter:
+    """JSON Lines：每行一个完整的任务记录"""
+    extension = 'jsonl'
+    encoding = 'utf-8'
+    newline = None
+
+    def __init__(self, file, title):
+        self.file = file
+
+    def write(self, number, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        pass
+
+
+class CsvExporter:
+    """CSV：带BOM的UTF-8，Excel可以直接打开"""
+    extension = 'csv'
+    encoding = 'utf-8-sig'
+    newline = ''  # 由csv模块处理换行
+
+    def __init__(self, file, title):
+        import csv
+        self.writer = csv.writer(file)
+        self.writer.writerow(('number',) + TaskItem.__slots__)
+
+    def write(self, number, record):
+        self.writer.writerow([number] + [record[key] for key in TaskItem.__slots__])
+
+    def close(self):
+        pass
+
+
+class HtmlExporter:
+    """HTML：已完成的任务加删除线"""
+    extension = 'html'
+    encoding = 'utf-8'
+    newline = None
+
+    def __init__(self, file, title):
+        from html import escape
+        self.escape = escape
+        self.file = file
+        file.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                   f'<title>{escape(title)}</title>\n'
+                   '<style>li { white-space: pre-wrap; } .completed { text-decoration: line-through; color: #868e96; }</style>\n'
+                   f'</head>\n<body>\n<h1>{escape(title)}</h1>\n<ol>\n')
+
+    def write(self, number, record):
+        text = record['text'].strip()
+        if text:
+            css_class = ' class="completed"' if record['completed'] else ''
+            self.file.write(f'<li value="{number}"{css_class}>{self.escape(text)}</li>\n')
+
+    def close(self):
+        self.file.write('</ol>\n</body>\n</html>\n')
+
+
+# 导出格式，由配置项export_format选择
+EXPORTERS = {exporter.extension: exporter
+             for exporter in (MarkdownExporter, JsonLinesExporter, CsvExporter, HtmlExporter)}
+
+
+def export_records(records, path, exporter_class, title):
+    """把任务记录逐条写入文件，写完后原子替换，避免留下只写了一半的导出文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding=exporter_class.encoding, newline=exporter_class.newline) as f:
+        exporter = exporter_class(f, title)
+        for number, record in enumerate(records, 1):
+            exporter.write(number, record)
+        exporter.close()
+    os.replace(tmp_path, path)
+
+
+def contiguous_ranges(rows):
+    """把升序的行号列表拆成连续的区间[(first, last), ...]"""
+    ranges = []
+    for row in rows:
+        if ranges and row == ranges[-1][1] + 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return [tuple(r) for r in ranges]
+
+
+class TaskModel(QAbstractListModel):
+    """任务列表模型，单元格模式和虚拟列表模式共用同一份数据"""
+    CompletedRole = Qt.UserRole + 1
+    FontSizeRole = Qt.UserRole + 2
+    ReminderRole = Qt.UserRole + 3  # 截止时间和提醒时间
+    OrderRole = Qt.UserRole + 4  # 顺序键
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tasks = []
+        self.by_id = {}  # 任务ID -> 任务，同步时按ID查找
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self.tasks[index.row()]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return task.text
+        if role == self.CompletedRole:
+            return task.completed
+        if role == self.FontSizeRole:
+            return task.font_size
+        if role == Qt.ToolTipRole:
+            return task_tooltip(task) or None
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+        task = self.tasks[index.row()]
+        if role == Qt.EditRole:
+            task.text = value
+        elif role == self.CompletedRole:
+            task.set_completed(bool(value))
+        elif role == self.FontSizeRole:
+            task.font_size = value
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled  # 只能放到两行之间，不能放到某一行上
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        # 已完成的任务只读
+        if not self.tasks[index.row()].completed:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or row < 0 or count <= 0 or row + count > len(self.tasks):
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        for task in self.tasks[row:row + count]:
+            self.by_id.pop(task.id, None)
+        del self.tasks[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [TASK_MIME]
+
+    def mimeData(self, indexes):
+        """拖动的内容是任务ID，每行一个"""
+        mime = QMimeData()
+        rows = sorted({index.row() for index in indexes})
+        mime.setData(TASK_MIME, '\n'.join(self.tasks[row].id for row in rows).encode())
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        """虚拟列表中拖放：把拖动的任务移动到row之前"""
+        if action != Qt.MoveAction or not data.hasFormat(TASK_MIME):
+            return False
+        ids = set(bytes(data.data(TASK_MIME)).decode().split('\n'))
+        rows = [r for r, task in enumerate(self.tasks) if task.id in ids]
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.tasks)
+        self.move_rows(rows, row)
+        return True
+
+    def append_tasks(self, tasks):
+        """批量追加任务，整批只发出一次插入信号；没有顺序键的任务排在最后一个任务之后"""
+        if not tasks:
+            return
+        last = self.tasks[-1].order_key if self.tasks else None
+        for task in tasks:
+            if not task.order_key:
+                task.order_key = order_key_between(last, None)
+            last = task.order_key
+        first = len(self.tasks)
+        self.beginInsertRows(QModelIndex(), first, first + len(tasks) - 1)
+        self.tasks.extend(tasks)
+        self.by_id.update((task.id, task) for task in tasks)
+        self.endInsertRows()
+
+    def set_tasks(self, tasks):
+        """整体替换任务列表（归档窗口切换月份时使用）"""
+        self.beginResetModel()
+        self.tasks = list(tasks)
+        self.by_id = {task.id: task for task in self.tasks}
+        self.endResetModel()
+
+    def set_completed_rows(self, rows, completed):
+        """批量设置完成状态，每段连续的行只发出一次dataChanged，返回实际修改的行数"""
+        changed = [row for row in sorted(rows) if self.tasks[row].completed != completed]
+        for row in changed:
+            self.tasks[row].set_completed(completed)
+        for first, last in contiguous_ranges(changed):
+            self.dataChanged.emit(self.index(first), self.index(last), [self.CompletedRole])
+        return len(changed)
+
+    def update_rows(self, rows, role, **values):
+        """批量修改任务的属性，每段连续的行只发出一次dataChanged"""
+        rows = sorted(rows)
+        for row in rows:
+            for name, value in values.items():
+                setattr(self.tasks[row], name, value)
+        for first, last in contiguous_ranges(rows):
+            self.dataChanged.emit(self.index(first), self.index(last), [role])
+
+    def move_rows(self, rows, target):
+        """把rows中的任务按原来的相对顺序移动到target行之前（移动前的行号，可以等于行数）
+
+        只给被移动的任务重新分配顺序键，其他任务不变，每个被移动的任务发出一次dataChanged。
+        """
+        moving_rows = set(rows)
+        if not moving_rows:
+            return
+        moving = [self.tasks[row] for row in sorted(moving_rows)]
+        before = next((self.tasks[row] for row in range(min(target, len(self.tasks)) - 1, -1, -1)
+                       if row not in moving_rows), None)
+        previous = before.order_key if before is not None else None
+        # 不同设备同时追加的任务可能有相同的顺序键，新键取在下一个更大的顺序键之前
+        after_key = None
+        for row in range(target, len(self.tasks)):
+            key = self.tasks[row].order_key
+            if row not in moving_rows and (previous is None or key > previous):
+                after_key = key
+                break
+        position = self.tasks.index(before) + 1 if before is not None else 0
+        for task in moving:
+            previous = task.order_key = order_key_between(previous, after_key)
+            source = self.tasks.index(task)
+            if position not in (source, source + 1):
+                self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), position)
+                del self.tasks[source]
+                self.tasks.insert(position - 1 if source < position else position, task)
+                self.endMoveRows()
+            position = self.tasks.index(task) + 1
+        for task in moving:
+            index = self.index(self.tasks.index(task))
+            self.dataChanged.emit(index, index, [self.OrderRole])
+
+    def row_for_key(self, order_key, task_id, skip=None):
+        """按(顺序键, 任务ID)二分查找插入位置；skip行不参与比较（移动时是被移动的任务本身）"""
+        low, high = 0, len(self.tasks) - (skip is not None)
+        while low < high:
+            middle = (low + high) // 2
+            row = middle + 1 if skip is not None and middle >= skip else middle
+            if (self.tasks[row].order_key or '', self.tasks[row].id) <= (order_key, task_id):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def put_record(self, record):
+        """按记录插入或更新任务（同步时使用），新任务和顺序键变化的任务放到顺序键对应的位置"""
+        task = self.by_id.get(record['id'])
+        if task is None:
+            task = TaskItem.from_record(record)
+            row = self.row_for_key(task.order_key or '', task.id)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.tasks.insert(row, task)
+            self.by_id[task.id] = task
+            self.endInsertRows()
+            return
+        row = self.tasks.index(task)
+        if (record.get('order_key') or '') != (task.order_key or ''):
+            target = self.row_for_key(record.get('order_key') or '', task.id, skip=row)
+            destination = target if target <= row else target + 1
+            if destination not in (row, row + 1):
+                self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+                del self.tasks[row]
+                self.tasks.insert(target, task)
+                self.endMoveRows()
+                row = target
+        for name in TaskItem.__slots__:
+            if name != 'id' and name in record:
+                setattr(task, name, record[name])
+        self.dataChanged.emit(self.index(row), self.index(row), [])
+
+    def remove_task(self, task_id):
+        task = self.by_id.get(task_id)
+        if task is not None:
+            self.removeRows(self.tasks.index(task), 1)
+
+    def remove_task_rows(self, rows):
+        """批量删除，从后往前每段连续的行只发出一次删除信号"""
+        for first, last in reversed(contiguous_ranges(sorted(set(rows)))):
+            self.removeRows(first, last - first + 1)
+
+    def task_updated(self, task, roles):
+        """视图直接修改了任务数据后调用，通知其他监听者"""
+        index = self.index(self.tasks.index(task))
+        self.dataChanged.emit(index, index, roles)
+
+
+class TaskFilterModel(QSortFilterProxyModel):
+    """虚拟列表模式下按任务ID隐藏行，过滤条件由外部计算好的隐藏集合给出"""
 
-class CellWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.current_font_size = 12  # 初始字体大小
+        self.hidden_ids = set()
+        self.tasks = []
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        self.tasks = model.tasks  # 每行都会调用filterAcceptsRow，直接引用任务列表
+
+    def set_hidden_ids(self, hidden_ids):
+        self.hidden_ids = hidden_ids
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.tasks[source_row].id not in self.hidden_ids
+
+
+# 中日韩文字没有空格分词，按单字和相邻两字建立索引；其余文字按单词的各级前缀建立索引
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_RE = re.compile(f'([{CJK_CHARS}]+)|([^\\W_{CJK_CHARS}]+)')
+MAX_PREFIX_LENGTH = 16
+
+
+def tokenize(text):
+    """把任务文本切分为索引词：中文单字、相邻双字，以及英文单词的前缀"""
+    tokens = set()
+    for cjk, word in TOKEN_RE.findall(text.lower()):
+        if cjk:
+            tokens.update(cjk)
+            tokens.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            word = word[:MAX_PREFIX_LENGTH]
+            tokens.update(word[:i] for i in range(1, len(word) + 1))
+    return tokens
+
+
+def tokenize_query(text):
+    """把搜索词切分为必须全部命中的索引词"""
+    tokens = set()
+    for cjk, word in TOKEN_RE.findall(text.lower()):
+        if len(cjk) == 1:
+            tokens.add(cjk)
+        elif cjk:
+            tokens.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+        else:
+            # 英文单词按前缀匹配，边输入边过滤
+            tokens.add(word[:MAX_PREFIX_LENGTH])
+    return tokens
+
+
+class SearchIndex:
+    """任务文本的倒排索引，任务文本变化时只更新增删的索引词"""
+
+    def __init__(self):
+        self.postings = {}  # 索引词 -> 任务ID集合
+        self.doc_tokens = {}  # 任务ID -> 该任务的索引词
+
+    def update(self, task_id, text):
+        tokens = frozenset(sys.intern(token) for token in tokenize(text))
+        old_tokens = self.doc_tokens.get(task_id, frozenset())
+        for token in old_tokens - tokens:
+            ids = self.postings[token]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[token]
+        for token in tokens - old_tokens:
+            self.postings.setdefault(token, set()).add(task_id)
+        self.doc_tokens[task_id] = tokens
+
+    def remove(self, task_id):
+        for token in self.doc_tokens.pop(task_id, ()):
+            ids = self.postings[token]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[token]
+
+    def all_ids(self):
+        return self.doc_tokens.keys()
+
+    def query(self, text):
+        """返回同时包含所有搜索词的任务ID集合；搜索词为空时返回None表示不过滤"""
+        tokens = tokenize_query(text)
+        if not tokens:
+            return None
+        postings = sorted((self.postings.get(token, set()) for token in tokens), key=len)
+        # 从最短的倒排表开始求交集
+        result = set(postings[0])
+        for ids in postings[1:]:
+            if not result:
+                break
+            result &= ids
+        return result
+
+
+TAG_RE = re.compile(r'(?<![\w#])#(\w[\w\-/]*)')  # 任务文本中的#标签，不区分大小写
+VIEW_WORDS = {
+    'open': 'open', '未完成': 'open', 'completed': 'completed', 'done': 'completed', '已完成': 'completed',
+    'today': 'today', '今天': 'today', 'this week': 'week', '本周': 'week', 'this month': 'month', '本月': 'month',
+}
+# 英文条件词要求前后不是字母或数字，避免匹配到opening这样的单词
+VIEW_WORD_RE = re.compile('|'.join(
+    (r'(?<![a-z0-9])%s(?![a-z0-9])' if word.isascii() else '%s') % re.escape(word)
+    for word in sorted(VIEW_WORDS, key=len, reverse=True)))
+
+
+def parse_tags(text):
+    return frozenset(sys.intern(tag.lower()) for tag in TAG_RE.findall(text))
+
+
+def period_start(period):
+    """今天、本周（从周一开始）或本月开始时的时间戳"""
+    now = time.localtime()
+    day = {'today': now.tm_mday, 'week': now.tm_mday - now.tm_wday, 'month': 1}[period]
+    return time.mktime((now.tm_year, now.tm_mon, day, 0, 0, 0, 0, 0, -1))
+
+
+class TagIndex:
+    """标签和完成状态的索引，任务文本或完成状态变化时只更新变化的部分
+
+    每个标签、未完成、已完成各有一个任务ID集合，数量就是集合的大小；已完成的任务另按完成时间排序，
+    按时间段筛选时二分查找。标签的任务数变化时调用on_count(标签, 数量)。
+    """
+
+    def __init__(self, on_count=None):
+        self.tags = {}  # 标签 -> 任务ID集合
+        self.doc_tags = {}  # 任务ID -> 该任务的标签
+        self.open_ids = set()
+        self.blank_ids = set()  # 未完成的空白任务，不保存，不计入未完成任务数
+        self.completed_ids = set()
+        self.completed_times = []  # 已完成任务的(完成时间, 任务ID)，按时间排序
+        self.completed_keys = {}  # 任务ID -> 在completed_times中的项
+        self.on_count = on_count
+
+    def count(self, tag):
+        return len(self.tags.get(tag, ()))
+
+    def update(self, task):
+        tags = parse_tags(task.text)
+        old_tags = self.doc_tags.get(task.id, frozenset())
+        if tags != old_tags:
+            for tag in old_tags - tags:
+                ids = self.tags[tag]
+                ids.discard(task.id)
+                if not ids:
+                    del self.tags[tag]
+                self.notify(tag)
+            for tag in tags - old_tags:
+                self.tags.setdefault(tag, set()).add(task.id)
+                self.notify(tag)
+            self.doc_tags[task.id] = tags
+        if task.completed:
+            key = (task.completed_at or 0, task.id)
+            if self.completed_keys.get(task.id) != key:
+                self.remove_time(task.id)
+                bisect.insort(self.completed_times, key)
+                self.completed_keys[task.id] = key
+            self.open_ids.discard(task.id)
+            self.blank_ids.discard(task.id)
+            self.completed_ids.add(task.id)
+        else:
+            self.remove_time(task.id)
+            self.completed_ids.discard(task.id)
+            self.open_ids.add(task.id)
+            if task.text.strip():
+                self.blank_ids.discard(task.id)
+            else:
+                self.blank_ids.add(task.id)
+
+    def remove(self, task_id):
+        for tag in self.doc_tags.pop(task_id, ()):
+            ids = self.tags[tag]
+            ids.discard(task_id)
+            if not ids:
+                del self.tags[tag]
+            self.notify(tag)
+        self.remove_time(task_id)
+        self.open_ids.discard(task_id)
+        self.blank_ids.discard(task_id)
+        self.completed_ids.discard(task_id)
+
+    def open_count(self):
+        return len(self.open_ids) - len(self.blank_ids)
+
+    def remove_time(self, task_id):
+        key = self.completed_keys.pop(task_id, None)
+        if key is not None:
+            del self.completed_times[bisect.bisect_left(self.completed_times, key)]
+
+    def notify(self, tag):
+        if self.on_count is not None:
+            self.on_count(tag, self.count(tag))
+
+    def completed_since(self, start):
+        first = bisect.bisect_left(self.completed_times, (start, ''))
+        return {task_id for _, task_id in self.completed_times[first:]}
+
+    def query(self, text):
+        """解析保存视图的查询，返回(满足状态和标签条件的任务ID集合, 其余的文字)
+
+        open/未完成、completed/已完成、today/今天、this week/本周、this month/本月（按完成时间）和#标签
+        同时满足；没有这些条件时集合为None，表示不过滤。其余的文字由调用方按搜索框的方式匹配。
+        """
+        sets = []
+        for word in VIEW_WORD_RE.findall(text.lower()):
+            word = VIEW_WORDS[word]
+            if word == 'open':
+                sets.append(self.open_ids)
+            elif word == 'completed':
+                sets.append(self.completed_ids)
+            else:
+                sets.append(self.completed_since(period_start(word)))
+        for tag in TAG_RE.findall(text):
+            sets.append(self.tags.get(tag.lower(), set()))
+        rest = TAG_RE.sub(' ', VIEW_WORD_RE.sub(' ', text.lower()))
+        if not sets:
+            return None, rest
+        # 从最小的集合开始求交集
+        sets.sort(key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            if not result:
+                break
+            result &= ids
+        return result, rest
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def format_duration(seconds):
+    """把秒数格式化为分钟、小时或天"""
+    if seconds < 3600:
+        return f'{seconds / 60:.0f} 分钟'
+    if seconds < 86400:
+        return f'{seconds / 3600:.1f} 小时'
+    return f'{seconds / 86400:.1f} 天'
+
+
+def task_tooltip(task):
+    """任务的截止时间和提醒时间，都没有时返回空字符串"""
+    lines = []
+    if task.due_at is not None:
+        lines.append(f'截止: {format_time(task.due_at)}')
+    if task.remind_at is not None:
+        lines.append(f'提醒: {format_time(task.remind_at)}')
+    return '\n'.join(lines)
+
+
+TASK_MIME = 'application/x-stickytasks-task'
+
+
+def start_task_drag(cell, pos):
+    """拖动单元格对应的任务，放下的位置由StickyNote计算"""
+    mime = QMimeData()
+    mime.setData(TASK_MIME, cell.task.id.encode())
+    drag = QDrag(cell)
+    drag.setMimeData(mime)
+    drag.setPixmap(cell.grab())
+    drag.setHotSpot(pos)
+    drag.exec_(Qt.MoveAction)
+
+
+def task_button_rects(rect):
+    """单元格中删除按钮和完成按钮的区域"""
+    x = rect.left() + 2
+    center = rect.top() + rect.height() // 2
+    delete_rect = QRect(x, center - BUTTON_SIZE - 1, BUTTON_SIZE, BUTTON_SIZE)
+    complete_rect = QRect(x, center + 1, BUTTON_SIZE, BUTTON_SIZE)
+    return delete_rect, complete_rect
+
+
+def task_text_rect(rect):
+    """单元格中文本区域，位置与CellWidget的文本编辑区一致"""
+    return rect.adjusted(BUTTON_SIZE + 4 + 8, 1, -1, -1)
+
+
+def paint_task(painter, rect, font, colors, text, completed, font_size, selected):
+    """绘制一个任务：左侧两个圆形按钮和圆角文本区域，供虚拟列表和轻量单元格共用"""
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    delete_rect, complete_rect = task_button_rects(rect)
+
+    # 绘制左侧两个圆形按钮
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(QColor(colors['red']))
+    painter.drawEllipse(delete_rect)
+    painter.setBrush(QColor(colors['green']))
+    painter.drawEllipse(complete_rect)
+    button_font = QFont(font)
+    button_font.setBold(True)
+    button_font.setPixelSize(16)
+    painter.setFont(button_font)
+    painter.setPen(QColor('white'))
+    painter.drawText(delete_rect, Qt.AlignCenter, '×')
+    button_font.setPixelSize(14)
+    painter.setFont(button_font)
+    painter.drawText(complete_rect, Qt.AlignCenter, '✓')
+
+    # 绘制文本区域
+    text_rect = task_text_rect(rect)
+    if selected:
+        painter.setPen(QPen(QColor(colors['blue']), 2))
+    else:
+        painter.setPen(QPen(QColor(colors['editor_border']), 1))
+    painter.setBrush(QColor(colors['completed_bg'] if completed else colors['editor_bg']))
+    painter.drawRoundedRect(text_rect, 8, 8)
+    if text:
+        text_font = QFont(font)
+        text_font.setPointSize(font_size)
+        painter.setFont(text_font)
+        painter.setPen(QColor(colors['editor_text']))
+        inner = text_rect.adjusted(7, 6, -7, -6)
+        painter.setClipRect(inner)
+        painter.drawText(inner, Qt.AlignLeft | Qt.AlignTop | Qt.TextWordWrap, text)
+    painter.restore()
+
+
+class CellWidget(QWidget):
+    editingFinished = pyqtSignal()  # 文本编辑区失去焦点
+    selectRequested = pyqtSignal(int)  # 在文本编辑区按下鼠标，参数为键盘修饰键
+    deleteRequested = pyqtSignal()  # 点击删除按钮
+
+    def __init__(self, task=None, model=None, parent=None):
+        super().__init__(parent)
+        self.task = task if task is not None else TaskItem()
+        self.model = model
+        self.current_font_size = self.task.font_size  # 初始字体大小
+        self.drag_start = None
         self.initUI()
         
     def initUI(self):
@@ -28,37 +2396,13 @@ class CellWidget(QWidget):
         
         # 创建红色删除按钮
         self.delete_btn = QPushButton('×')
-        self.delete_btn.setFixedSize(25, 25)
-        self.delete_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #ff6b6b;
-                border: none;
-                border-radius: 12px;
-                color: white;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #ff5252;
-            }
-        """)
+        self.delete_btn.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
+        self.delete_btn.setObjectName('deleteButton')
         
         # 创建绿色完成按钮
         self.complete_btn = QPushButton('✓')
-        self.complete_btn.setFixedSize(25, 25)
-        self.complete_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #51cf66;
-                border: none;
-                border-radius: 12px;
-                color: white;
-                font-size: 14px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #40c057;
-            }
-        """)
+        self.complete_btn.setFixedSize(BUTTON_SIZE, BUTTON_SIZE)
+        self.complete_btn.setObjectName('completeButton')
         
         button_layout.addWidget(self.delete_btn)
         button_layout.addWidget(self.complete_btn)
@@ -66,98 +2410,813 @@ class CellWidget(QWidget):
         
         # 创建文本编辑区
         self.text_edit = QTextEdit()
-        self.text_edit.setFixedHeight(100)  # 固定单元格高度
+        self.text_edit.setFixedHeight(CELL_HEIGHT)  # 固定单元格高度
         font = self.text_edit.font()
         font.setPointSize(self.current_font_size)
         self.text_edit.setFont(font)
-        self.text_edit.setStyleSheet("""
-            QTextEdit {
-                background-color: white;
-                border: 1px solid #ddd;
-                border-radius: 8px;
-                padding: 5px;
-            }
-        """)
+        self.text_edit.setObjectName('cellEditor')
         
-        # 为文本编辑区添加事件过滤器
+        # 为文本编辑区添加事件过滤器；鼠标按下事件由其viewport接收
         self.text_edit.installEventFilter(self)
+        self.text_edit.viewport().installEventFilter(self)
         
         layout.addWidget(button_container)
         layout.addWidget(self.text_edit)
         self.setLayout(layout)
         
         # 连接信号
+        self.delete_btn.clicked.connect(self.deleteRequested)
         self.complete_btn.clicked.connect(self.toggle_complete)
         self.is_completed = False
+        self.text_edit.setPlainText(self.task.text)
+        if self.task.due_at is not None or self.task.remind_at is not None:
+            self.text_edit.setToolTip(task_tooltip(self.task))
+        if self.task.completed:
+            self.toggle_complete()
+        self.text_edit.textChanged.connect(self.on_text_changed)
+
+    def on_text_changed(self):
+        self.task.text = self.text_edit.toPlainText()
+        if self.model is not None:
+            self.model.task_updated(self.task, [Qt.EditRole])
+
+    def sync_from_task(self):
+        """模型数据被其他地方修改后，刷新单元格显示"""
+        self.text_edit.setToolTip(task_tooltip(self.task))
+        if self.text_edit.toPlainText() != self.task.text:  # 同步时其他设备修改了文本
+            self.text_edit.setPlainText(self.task.text)
+        if self.task.completed != self.is_completed:
+            self.toggle_complete()
+        if self.task.font_size != self.current_font_size:
+            self.set_font_size(self.task.font_size)
+
+    def set_font_size(self, size):
+        self.current_font_size = size
+        self.task.font_size = size
+        font = self.text_edit.font()
+        font.setPointSize(size)
+        self.text_edit.setFont(font)
         
     def eventFilter(self, obj, event):
+        if obj == self.text_edit and event.type() == QEvent.FocusOut:
+            self.editingFinished.emit()
+        if obj == self.text_edit.viewport() and event.type() == QEvent.MouseButtonPress:
+            modifiers = event.modifiers() & (Qt.ControlModifier | Qt.ShiftModifier)
+            self.selectRequested.emit(int(modifiers))
+            if modifiers:
+                return True  # Ctrl/Shift+单击用于多选，不进入编辑
         if obj == self.text_edit and event.type() == event.Wheel:
             # 仅处理Ctrl+滚轮事件，用于调整字体大小
             if event.modifiers() == Qt.ControlModifier:
                 angle = event.angleDelta().y()
                 if angle > 0:
-                    self.current_font_size = min(self.current_font_size + 1, 30)
+                    self.set_font_size(min(self.current_font_size + 1, MAX_FONT_SIZE))
                 else:
-                    self.current_font_size = max(self.current_font_size - 1, 6)
-                
-                font = self.text_edit.font()
-                font.setPointSize(self.current_font_size)
-                self.text_edit.setFont(font)
+                    self.set_font_size(max(self.current_font_size - 1, MIN_FONT_SIZE))
+                if self.model is not None:
+                    self.model.task_updated(self.task, [TaskModel.FontSizeRole])
                 return True  # 事件已处理
         return super().eventFilter(obj, event)  # 其他事件交给父类处理
 
-    def toggle_complete(self):
-        self.is_completed = not self.is_completed
-        if self.is_completed:
-            self.text_edit.setStyleSheet(f"""
-                QTextEdit {{
-                    background-color: #aaaaaa;
-                    border: 1px solid #ddd;
-                    border-radius: 8px;
-                    padding: 5px;
-                }}
-            """)
-            self.text_edit.setReadOnly(True)
+    def toggle_complete(self):
+        self.is_completed = not self.is_completed
+        if self.task.completed != self.is_completed:
+            self.task.set_completed(self.is_completed)
+            if self.model is not None:
+                self.model.task_updated(self.task, [TaskModel.CompletedRole])
+        set_state_property(self.text_edit, 'completed', self.is_completed)
+        self.text_edit.setReadOnly(self.is_completed)
+
+    def set_selected(self, selected):
+        set_state_property(self.text_edit, 'selected', selected)
+
+    def mousePressEvent(self, event):
+        # 按住按钮旁边的空白处拖动，调整任务顺序
+        if event.button() == Qt.LeftButton:
+            self.drag_start = event.pos()
+        else:
+            super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if (self.drag_start is not None and
+                (event.pos() - self.drag_start).manhattanLength() >= QApplication.startDragDistance()):
+            start, self.drag_start = self.drag_start, None
+            start_task_drag(self, start)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+        super().mouseReleaseEvent(event)
+
+
+class LiteCell(QWidget):
+    """轻量单元格：按钮和文本由自己绘制，单击文本区域或用Tab键切换到单元格时才创建编辑器
+
+    信号和方法与CellWidget相同。每个任务只有一个控件，编辑器在失去焦点后销毁。
+    """
+    editingFinished = pyqtSignal()
+    selectRequested = pyqtSignal(int)
+    deleteRequested = pyqtSignal()
+    colors = THEMES['warm']  # 切换主题时由StickyNote更新
+
+    def __init__(self, task=None, model=None, parent=None):
+        super().__init__(parent)
+        self.task = task if task is not None else TaskItem()
+        self.model = model
+        self.selected = False
+        self.editor = None
+        self.pressed_button = None
+        self.drag_start = None
+        self.setFixedHeight(CELL_HEIGHT + 2)
+        if self.task.due_at is not None or self.task.remind_at is not None:
+            self.setToolTip(task_tooltip(self.task))
+        # 单击由mousePressEvent处理，只有Tab键切换焦点时才经过focusInEvent
+        self.setFocusPolicy(Qt.TabFocus)
+
+    @property
+    def current_font_size(self):
+        return self.task.font_size
+
+    @property
+    def is_completed(self):
+        return self.task.completed
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        # 编辑器打开时覆盖在文本区域上，不再绘制文本
+        text = self.task.text if self.editor is None else ''
+        paint_task(painter, self.rect(), self.font(), self.colors, text,
+                   self.task.completed, self.task.font_size, self.selected)
+
+    def resizeEvent(self, event):
+        if self.editor is not None:
+            self.editor.setGeometry(task_text_rect(self.rect()))
+        super().resizeEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            return super().mousePressEvent(event)
+        delete_rect, complete_rect = task_button_rects(self.rect())
+        if delete_rect.contains(event.pos()):
+            self.pressed_button = 'delete'
+        elif complete_rect.contains(event.pos()):
+            self.pressed_button = 'complete'
+        elif task_text_rect(self.rect()).contains(event.pos()):
+            modifiers = event.modifiers() & (Qt.ControlModifier | Qt.ShiftModifier)
+            self.selectRequested.emit(int(modifiers))
+            if not modifiers:  # Ctrl/Shift+单击用于多选，不进入编辑
+                self.open_editor(event.pos())
+        else:
+            self.drag_start = event.pos()  # 按钮旁边的空白处用于拖动任务
+
+    def mouseMoveEvent(self, event):
+        if (self.drag_start is not None and
+                (event.pos() - self.drag_start).manhattanLength() >= QApplication.startDragDistance()):
+            start, self.drag_start = self.drag_start, None
+            start_task_drag(self, start)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+        button, self.pressed_button = self.pressed_button, None
+        if event.button() != Qt.LeftButton or button is None:
+            return super().mouseReleaseEvent(event)
+        delete_rect, complete_rect = task_button_rects(self.rect())
+        if button == 'delete' and delete_rect.contains(event.pos()):
+            self.deleteRequested.emit()
+        elif button == 'complete' and complete_rect.contains(event.pos()):
+            self.toggle_complete()
+
+    def wheelEvent(self, event):
+        if event.modifiers() == Qt.ControlModifier:
+            self.change_font_size(event.angleDelta().y())
+        else:
+            event.ignore()  # 交给滚动区域
+
+    def focusInEvent(self, event):
+        super().focusInEvent(event)
+        # 窗口激活时焦点也会落到第一个单元格上，只有Tab键切换过来才打开编辑器
+        if event.reason() in (Qt.TabFocusReason, Qt.BacktabFocusReason):
+            self.open_editor()
+
+    def open_editor(self, pos=None):
+        """创建编辑器并把光标放到单击的位置"""
+        if self.editor is None:
+            editor = QTextEdit(self)
+            editor.setAcceptRichText(False)
+            editor.setObjectName('cellEditor')
+            # 显示之前设置属性，样式表只需应用一次
+            editor.setProperty('completed', self.task.completed)
+            editor.setProperty('selected', self.selected)
+            editor.setReadOnly(self.task.completed)
+            font = editor.font()
+            font.setPointSize(self.task.font_size)
+            editor.setFont(font)
+            editor.setPlainText(self.task.text)
+            editor.setGeometry(task_text_rect(self.rect()))
+            editor.installEventFilter(self)
+            editor.viewport().installEventFilter(self)
+            editor.textChanged.connect(self.on_text_changed)
+            self.editor = editor
+            editor.show()
+            self.update()
+        self.editor.setFocus()
+        if pos is not None:
+            viewport = self.editor.viewport()
+            self.editor.setTextCursor(self.editor.cursorForPosition(viewport.mapFrom(self, pos)))
+
+    def close_editor(self):
+        if self.editor is None:
+            return
+        editor, self.editor = self.editor, None
+        editor.hide()
+        editor.deleteLater()
+        self.update()
+
+    def on_text_changed(self):
+        self.task.text = self.editor.toPlainText()
+        if self.model is not None:
+            self.model.task_updated(self.task, [Qt.EditRole])
+
+    def eventFilter(self, obj, event):
+        if obj is self.editor and event.type() == QEvent.FocusOut:
+            self.editingFinished.emit()
+            # 右键菜单弹出时编辑器也会失去焦点，这时保留编辑器
+            if event.reason() != Qt.PopupFocusReason:
+                self.close_editor()
+            return False
+        if self.editor is not None and obj is self.editor.viewport() \
+                and event.type() == QEvent.MouseButtonPress:
+            modifiers = event.modifiers() & (Qt.ControlModifier | Qt.ShiftModifier)
+            self.selectRequested.emit(int(modifiers))
+            return bool(modifiers)
+        if obj is self.editor and event.type() == QEvent.Wheel \
+                and event.modifiers() == Qt.ControlModifier:
+            self.change_font_size(event.angleDelta().y())
+            return True
+        return super().eventFilter(obj, event)
+
+    def change_font_size(self, angle):
+        if angle > 0:
+            self.set_font_size(min(self.task.font_size + 1, MAX_FONT_SIZE))
+        else:
+            self.set_font_size(max(self.task.font_size - 1, MIN_FONT_SIZE))
+        if self.model is not None:
+            self.model.task_updated(self.task, [TaskModel.FontSizeRole])
+
+    def set_font_size(self, size):
+        self.task.font_size = size
+        if self.editor is not None:
+            font = self.editor.font()
+            font.setPointSize(size)
+            self.editor.setFont(font)
+        self.update()
+
+    def sync_from_task(self):
+        """模型数据被其他地方修改后，刷新单元格显示"""
+        self.setToolTip(task_tooltip(self.task))
+        if self.editor is not None:
+            if self.editor.toPlainText() != self.task.text:
+                self.editor.setPlainText(self.task.text)
+            if self.editor.isReadOnly() != self.task.completed:
+                self.editor.setReadOnly(self.task.completed)
+                set_state_property(self.editor, 'completed', self.task.completed)
+            if self.editor.font().pointSize() != self.task.font_size:
+                self.set_font_size(self.task.font_size)
+        self.update()
+
+    def toggle_complete(self):
+        self.task.set_completed(not self.task.completed)
+        if self.model is not None:
+            self.model.task_updated(self.task, [TaskModel.CompletedRole])
+        self.sync_from_task()
+
+    def set_selected(self, selected):
+        self.selected = selected
+        if self.editor is not None:
+            set_state_property(self.editor, 'selected', selected)
+        self.update()
+
+
+class TaskDelegate(QStyledItemDelegate):
+    """虚拟列表模式下绘制任务行，只为正在编辑的行创建编辑器"""
+    deleteRequested = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.colors = THEMES['warm']
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), CELL_HEIGHT + 2)
+
+    def paint(self, painter, option, index):
+        paint_task(painter, option.rect, option.font, self.colors, index.data(Qt.DisplayRole),
+                   index.data(TaskModel.CompletedRole), index.data(TaskModel.FontSizeRole),
+                   bool(option.state & QStyle.State_Selected))
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease,
+                            QEvent.MouseButtonDblClick) and event.button() == Qt.LeftButton:
+            delete_rect, complete_rect = task_button_rects(option.rect)
+            if delete_rect.contains(event.pos()):
+                if event.type() == QEvent.MouseButtonRelease:
+                    self.deleteRequested.emit(model.mapToSource(index).row())
+                return True
+            if complete_rect.contains(event.pos()):
+                if event.type() == QEvent.MouseButtonRelease:
+                    model.setData(index, not index.data(TaskModel.CompletedRole),
+                                  TaskModel.CompletedRole)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+    def createEditor(self, parent, option, index):
+        editor = QTextEdit(parent)
+        editor.setAcceptRichText(False)
+        editor.setObjectName('cellEditor')
+        # 和单元格模式一样每次输入都写入模型，由自动保存合并写入，不等编辑器关闭
+        editor.textChanged.connect(lambda: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        font = editor.font()
+        font.setPointSize(index.data(TaskModel.FontSizeRole))
+        editor.setFont(font)
+        if editor.toPlainText() != index.data(Qt.EditRole):
+            editor.setPlainText(index.data(Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        if editor.toPlainText() != index.data(Qt.EditRole):
+            model.setData(index, editor.toPlainText(), Qt.EditRole)
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(task_text_rect(option.rect))
+
+    def eventFilter(self, editor, event):
+        # 编辑器内的Ctrl+滚轮同样调整当前任务的字体大小
+        if event.type() == QEvent.Wheel and event.modifiers() == Qt.ControlModifier:
+            view = editor.parent().parent()
+            index = view.indexAt(editor.geometry().center())
+            view.change_font_size(index, event.angleDelta().y())
+            font = editor.font()
+            font.setPointSize(index.data(TaskModel.FontSizeRole))
+            editor.setFont(font)
+            return True
+        return super().eventFilter(editor, event)
+
+
+class TaskListView(QListView):
+    """虚拟列表视图，只绘制可见行，适合大量任务"""
+    deletePressed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)  # 所有行高度相同，避免逐行计算尺寸
+        self.setSpacing(CELL_SPACING // 2)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)  # Ctrl/Shift+单击、Ctrl+A多选
+        self.setEditTriggers(QAbstractItemView.CurrentChanged |
+                             QAbstractItemView.SelectedClicked |
+                             QAbstractItemView.DoubleClicked)
+        self.setItemDelegate(TaskDelegate(self))
+        # 拖动调整顺序：模型只接受任务ID格式的数据，放下时由模型移动行并修改顺序键
+        self.setDragDropMode(QAbstractItemView.DragDrop)
+        self.setDefaultDropAction(Qt.MoveAction)
+
+    def startDrag(self, supported_actions):
+        # 默认实现在移动完成后会删除源行，这里的移动已经由模型完成
+        indexes = self.selectedIndexes()
+        if not indexes:
+            return
+        drag = QDrag(self)
+        drag.setMimeData(self.model().mimeData(indexes))
+        drag.exec_(Qt.MoveAction)
+
+    def keyPressEvent(self, event):
+        # 不在编辑状态时，Delete删除所有选中的任务
+        if event.key() == Qt.Key_Delete and self.state() != QAbstractItemView.EditingState:
+            self.deletePressed.emit()
+            return
+        super().keyPressEvent(event)
+
+    def change_font_size(self, index, angle):
+        if not index.isValid():
+            return
+        size = index.data(TaskModel.FontSizeRole)
+        if angle > 0:
+            size = min(size + 1, MAX_FONT_SIZE)
         else:
-            self.text_edit.setStyleSheet(f"""
-                QTextEdit {{
-                    background-color: white;
-                    border: 1px solid #ddd;
-                    border-radius: 8px;
-                    padding: 5px;
-                }}
-            """)
-            self.text_edit.setReadOnly(False)
+            size = max(size - 1, MIN_FONT_SIZE)
+        self.model().setData(index, size, TaskModel.FontSizeRole)
+
+    def wheelEvent(self, event):
+        if event.modifiers() == Qt.ControlModifier:
+            # Ctrl+滚轮调整鼠标下方任务的字体大小
+            self.change_font_size(self.indexAt(event.pos()), event.angleDelta().y())
+            return
+        if event.modifiers() == Qt.ShiftModifier:
+            # Shift+滚轮上下滚动整个列表
+            bar = self.verticalScrollBar()
+            bar.setValue(bar.value() - event.angleDelta().y())
+            return
+        super().wheelEvent(event)
+
+
+class PerformanceWindow(QWidget):
+    """性能统计窗口：显示期间每秒刷新一次"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle('性能统计')
+        self.setObjectName('performanceWindow')
+        self.label = QLabel()
+        font = QFont('Consolas', 9)
+        font.setStyleHint(QFont.Monospace)
+        self.label.setFont(font)
+        self.label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.label)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        self.label.setText(profiler.summary())
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+
+class ArchiveWindow(QWidget):
+    """归档窗口：按月份浏览已归档的任务，选中月份时才解压读取该月的文件"""
+
+    def __init__(self, note, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.note = note
+        self.setWindowTitle('归档')
+        self.setObjectName('archiveWindow')
+        self.resize(420, 480)
+        self.current_month = None
+        self.month_list = QListWidget()
+        self.month_list.setMaximumWidth(130)
+        self.month_list.currentItemChanged.connect(self.on_month_changed)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('搜索归档，回车确认')
+        self.search_edit.returnPressed.connect(self.search)
+        self.model = TaskModel()
+        self.task_view = QListView()
+        self.task_view.setModel(self.model)
+        self.task_view.setWordWrap(True)
+        self.task_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.task_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        restore_btn = QPushButton('恢复所选')
+        restore_btn.clicked.connect(self.restore_selected)
+        export_btn = QPushButton('导出')
+        export_btn.clicked.connect(self.export_shown)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(restore_btn)
+        buttons.addWidget(export_btn)
+        tasks_layout = QVBoxLayout()
+        tasks_layout.addWidget(self.search_edit)
+        tasks_layout.addWidget(self.task_view)
+        tasks_layout.addLayout(buttons)
+        layout = QHBoxLayout(self)
+        layout.addWidget(self.month_list)
+        layout.addLayout(tasks_layout)
+
+    def showEvent(self, event):
+        self.refresh_months()
+        super().showEvent(event)
+
+    def refresh_months(self):
+        """只读取索引显示月份和任务数，不解压归档文件"""
+        self.note.writer.flush()
+        current = self.current_month
+        self.month_list.blockSignals(True)
+        self.month_list.clear()
+        for month in self.note.archive.months():
+            item = QListWidgetItem(f"{month} ({self.note.archive.index[month]['count']})")
+            item.setData(Qt.UserRole, month)
+            self.month_list.addItem(item)
+            if month == current:
+                self.month_list.setCurrentItem(item)
+        self.month_list.blockSignals(False)
+        if self.month_list.currentItem() is None:
+            self.current_month = None
+            self.model.set_tasks([])
+
+    def on_month_changed(self, item, previous=None):
+        if item is None:
+            return
+        self.search_edit.clear()
+        self.current_month = item.data(Qt.UserRole)
+        tasks = self.note.archive.load_month(self.current_month)
+        tasks.sort(key=lambda task: task.completed_at or task.created_at, reverse=True)
+        self.model.set_tasks(tasks)
+
+    def search(self):
+        """空搜索恢复显示当前月份；否则在所有月份中搜索"""
+        text = self.search_edit.text()
+        if not text.strip():
+            item = self.month_list.currentItem()
+            if item is not None:
+                self.on_month_changed(item)
+            return
+        self.current_month = None
+        self.month_list.blockSignals(True)
+        self.month_list.setCurrentItem(None)
+        self.month_list.blockSignals(False)
+        self.model.set_tasks(self.note.archive.search(text))
+
+    def restore_selected(self):
+        rows = sorted(index.row() for index in self.task_view.selectionModel().selectedRows())
+        if not rows:
+            return
+        tasks = [self.model.tasks[row] for row in rows]
+        by_month = {}
+        for task in tasks:
+            by_month.setdefault(TaskArchive.month_of(task.to_record()), set()).add(task.id)
+        # 先把恢复的任务写入存储，再从归档中移除
+        self.note.restore_archived(tasks)
+        self.note.writer.flush()
+        for month, ids in by_month.items():
+            self.note.archive.remove(month, ids)
+        self.model.remove_task_rows(rows)
+        self.refresh_months()
+
+    def export_shown(self):
+        if not self.model.tasks:
+            return
+        name = f'归档-{self.current_month}' if self.current_month else '归档-搜索结果'
+        self.note.export_tasks(list(self.model.tasks), name)
+
+
+class HistoryModel(TaskModel):
+    """历史窗口的只读模型：已完成的任务显示删除线"""
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.FontRole and index.isValid() and self.tasks[index.row()].completed:
+            font = QFont()
+            font.setStrikeOut(True)
+            return font
+        return super().data(index, role)
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable if index.isValid() else Qt.NoItemFlags
+
+
+class HistoryWindow(QWidget):
+    """历史窗口：按日期查看每日快照，选中日期时才读取当天的任务"""
+
+    def __init__(self, note, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.note = note
+        self.setWindowTitle('历史')
+        self.setObjectName('historyWindow')
+        self.resize(420, 480)
+        self.current_day = None
+        self.day_list = QListWidget()
+        self.day_list.setMaximumWidth(130)
+        self.day_list.currentItemChanged.connect(self.on_day_changed)
+        self.summary_label = QLabel()
+        self.model = HistoryModel()
+        self.task_view = QListView()
+        self.task_view.setModel(self.model)
+        self.task_view.setWordWrap(True)
+        self.task_view.setUniformItemSizes(True)
+        export_btn = QPushButton('导出')
+        export_btn.clicked.connect(self.export_shown)
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.summary_label)
+        buttons.addStretch()
+        buttons.addWidget(export_btn)
+        tasks_layout = QVBoxLayout()
+        tasks_layout.addWidget(self.task_view)
+        tasks_layout.addLayout(buttons)
+        layout = QHBoxLayout(self)
+        layout.addWidget(self.day_list)
+        layout.addLayout(tasks_layout)
+
+    def showEvent(self, event):
+        self.refresh_days()
+        super().showEvent(event)
+
+    def refresh_days(self):
+        """先保存今天的快照，再从日期索引列出所有日期"""
+        self.note.take_snapshot(wait=True)
+        current = self.current_day
+        self.day_list.blockSignals(True)
+        self.day_list.clear()
+        for day, count in self.note.history.days():
+            item = QListWidgetItem(f'{day} ({count})')
+            item.setData(Qt.UserRole, day)
+            self.day_list.addItem(item)
+            if day == current:
+                self.day_list.setCurrentItem(item)
+        self.day_list.blockSignals(False)
+        if self.day_list.currentItem() is None and self.day_list.count():
+            self.day_list.setCurrentRow(0)
+
+    @profiler.timed('history_load')
+    def on_day_changed(self, item, previous=None):
+        if item is None:
+            return
+        start = time.perf_counter()
+        self.current_day = item.data(Qt.UserRole)
+        tasks = self.note.history.load_day(self.current_day)
+        self.model.set_tasks(tasks)
+        completed = sum(task.completed for task in tasks)
+        self.summary_label.setText(f'{len(tasks)} 项，已完成 {completed} 项，'
+                                   f'读取 {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    def export_shown(self):
+        if self.model.tasks and self.current_day:
+            self.note.export_tasks(list(self.model.tasks), f'历史-{self.current_day}')
+
+
+class StatsWindow(QWidget):
+    """统计窗口：最近STATS_DAYS天每天新建和完成的任务数、平均完成用时和未完成任务数，只读取内存中的计数"""
+
+    def __init__(self, note, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.note = note
+        self.setWindowTitle('统计')
+        self.setObjectName('statsWindow')
+        self.resize(460, 520)
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(('日期', '新建', '完成', '平均用时', '未完成'))
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        export_btn = QPushButton('导出CSV')
+        export_btn.clicked.connect(lambda: self.note.export_stats())
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(export_btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+    def showEvent(self, event):
+        self.refresh()
+        super().showEvent(event)
+
+    @profiler.timed('stats')
+    def refresh(self):
+        created, completed, reopened, deleted, latency, open_count = self.note.stats_totals()
+        average = format_duration(latency / completed) if completed else '-'
+        self.summary_label.setText(f'合计：新建 {created}，完成 {completed}，重新打开 {reopened}，删除 {deleted}；'
+                                   f'平均完成用时 {average}；当前未完成 {open_count}')
+        days = self.note.stats.recent()
+        self.table.setRowCount(len(days))
+        # 最近的一天在最上面
+        for row, (day, (created, completed, _, _, latency, open_count)) in enumerate(reversed(days)):
+            values = (day, created, completed, format_duration(latency / completed) if completed else '',
+                      '' if open_count is None else open_count)
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(str(value)))
+
 
 class StickyNote(QMainWindow):
+    exportFinished = pyqtSignal(str, str)  # 导出文件路径，出错时的错误信息
+    reminderShown = pyqtSignal(str, str)  # 提醒的标题和内容，由托盘图标显示
+    syncReceived = pyqtSignal(list)  # 同步线程读到的其他设备的修改
+    historyRequested = pyqtSignal()  # 单击日期标签，打开历史窗口
+
     def __init__(self):
         super().__init__()
+        self.model = TaskModel(self)
+        # 单元格模式的多选状态；虚拟列表模式使用视图自带的选择模型
+        self.selected_ids = set()
+        self.selection_anchor = None
+        self.config_cache = None
+        config = self.read_config()
+        # 性能统计：performance_trace为true时把耗时和卡顿记录写入跟踪文件
+        trace_path = os.path.expanduser('~/.stickynotes.trace.jsonl')
+        profiler.start(trace_path if config.get('performance_trace') else None,
+                       config.get('stall_threshold_ms', STALL_THRESHOLD_MS))
+        self.theme = config.get('theme', 'warm')
+        # 单元格模式(widgets)为每个任务创建完整控件，lite为每个任务一个自绘控件；虚拟列表模式(virtual)只绘制可见行
+        self.list_mode = config.get('list_mode', 'widgets')
+        # 窗口位置、大小和置顶状态，在首次显示前恢复
+        self.settings = QSettings(os.path.expanduser('~/.stickynotes.ini'), QSettings.IniFormat)
+        self.always_on_top = self.settings.value('pinned', False, type=bool)
+        # 保存视图：名称 -> 查询，例如 "open #work"
+        self.saved_views = config.get('views') or VIEWS
+        if not isinstance(self.saved_views, dict):
+            print("views配置应为 名称: 查询 的映射，使用默认视图")
+            self.saved_views = VIEWS
         self.initUI()
-        self.always_on_top = False
         self.current_font_size = 12
         self.resize_margin = 5
         self.resizing = False
         self.resize_edge = None
-        self.resize_start_pos = None
-        self.resize_start_geometry = None
-        self.dragPos = None
+        self.cursor_edge = None  # 当前光标对应的边缘，只在变化时设置光标
+        self.press_pos = None  # 开始拖动或调整大小时的鼠标位置
+        self.press_geometry = None
+        self.pointer_pos = None  # 尚未应用到窗口的最新鼠标位置
+        # 拖动和调整大小：鼠标事件合并到显示器刷新率，每帧最多移动或调整一次窗口
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.on_pointer_frame)
+        # 调整大小期间单元格保持原来的宽度，停止调整后再重新排列
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(RESIZE_SETTLE_MS)
+        self.settle_timer.timeout.connect(self.resume_cell_layout)
+        self.setMouseTracking(True)
+        
+        # 存储后端：journal（默认，追加式日志）或 xml（旧版整文件格式）
+        self.store = open_store(config.get('storage', 'journal'))
+        self.archive = TaskArchive(os.path.expanduser('~/.stickynotes.archive'))
+        # 每天的统计计数随添加、完成、删除累加，和任务一起由写入线程保存
+        self.stats = TaskStats(os.path.expanduser('~/.stickynotes.stats.db'))
+        self.writer = StoreWriter(self.store, self.archive, self.stats)
+        # 尚未提交给写入线程的修改：任务ID -> 任务（删除为None）
+        self.pending_changes = {}
+        self.unsaved_ids = set()  # 本机新建、还没有以非空内容保存过的任务，保存时才计入新建数
+        self.restoring = False
+        self.ingesting = False  # 批量导入期间，单元格模式为新任务创建轻量单元格
+        
+        # 同步：配置了sync_dir时，通过共享目录与其他设备交换修改
+        self.sync = None
+        self.sync_applied = {}  # 从其他设备收到并已应用的记录，保存时不再发布回去
+        if config.get('sync_dir'):
+            self.sync = SyncFolder(os.path.expanduser(config['sync_dir']), self.device_id(config),
+                                   os.path.expanduser('~/.stickynotes.sync.db'), self.syncReceived.emit)
+            self.syncReceived.connect(self.apply_sync_changes)
+            self.sync_timer = QTimer(self)
+            self.sync_timer.timeout.connect(self.sync.request_pull)
+            self.sync_timer.start(SYNC_INTERVAL_MS)
+        # 自动保存：合并连续的修改，停止修改一段时间后在后台线程写入
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.timeout.connect(self.save_notes)
+        self.first_change_time = 0
+        self.model.rowsInserted.connect(self.track_inserted)
+        self.model.rowsAboutToBeRemoved.connect(self.track_removed)
+        self.model.dataChanged.connect(self.track_changed)
         
-        # 获取保存文件路径
-        self.notes_file = os.path.expanduser('~/.stickynotes.xml')
+        # 搜索：倒排索引随任务文本增量更新，过滤时只切换显示状态发生变化的行
+        self.search_index = SearchIndex()
+        # 标签和完成状态的索引，视图下拉框中的标签数量随之逐项更新
+        self.tag_index = TagIndex(self.update_tag_count)
+        self.hidden_ids = set()
+        self.model.rowsInserted.connect(self.index_inserted)
+        self.model.rowsAboutToBeRemoved.connect(self.unindex_removed)
+        self.model.dataChanged.connect(self.index_changed)
         
-        # 尝试读取之前保存的内容
+        # 提醒：一个调度器管理所有任务的提醒和截止时间，随模型变化增量更新
+        self.reminders = ReminderScheduler(self)
+        self.reminders.reminderDue.connect(self.on_reminder_due)
+        self.fired_reminders = []  # 最近提醒过的任务，可以一起推迟
+        self.model.rowsInserted.connect(self.schedule_inserted)
+        self.model.rowsAboutToBeRemoved.connect(self.unschedule_removed)
+        self.model.dataChanged.connect(self.schedule_changed)
+        
+        # 尝试读取之前保存的内容：首屏同步加载，其余在事件循环中分批插入
+        self.note_loader = None
+        self.loading_pending = False
+        self.export_thread = None
+        self.hotkey_pressed = None  # 快捷键按下的时间，窗口绘制后记录延迟
+        self.exportFinished.connect(self.on_export_finished)
         self.load_notes()
         
-        # 如果没有任何单元格，才创建第一个单元格
-        if self.cells_layout.count() == 1:  # 只有stretch项时
-            self.add_cell()
+        # 自动归档：加载完成后检查一次，之后每小时检查一次
+        self.archive_timer = QTimer(self)
+        self.archive_timer.timeout.connect(self.archive_completed)
+        self.archive_timer.start(ARCHIVE_CHECK_MS)
+        
+        # 每日快照：加载完成后保存一次，之后每小时检查一次，有修改或日期变化时才保存
+        self.history = TaskHistory(os.path.expanduser('~/.stickynotes.history.db'))
+        self.snapshot_thread = None
+        self.snapshot_day = None
+        self.snapshot_dirty = True
+        self.snapshot_timer = QTimer(self)
+        self.snapshot_timer.timeout.connect(self.take_snapshot)
+        self.snapshot_timer.start(SNAPSHOT_CHECK_MS)
         
     def initUI(self):
+        # 先设置应用级样式表，之后创建的控件只需polish一次
+        self.apply_theme(self.theme)
         self.setWindowTitle('便签')
-        self.setWindowFlags(Qt.FramelessWindowHint)  # 无边框窗口
+        # 无边框窗口；置顶状态在首次显示前设置，显示后再修改窗口标志会隐藏窗口并重建原生窗口
+        flags = Qt.FramelessWindowHint
+        if self.always_on_top:
+            flags |= Qt.WindowStaysOnTopHint
+        self.setWindowFlags(flags)
         self.setAttribute(Qt.WA_TranslucentBackground)  # 设置透明背景，这样圆角才能显示
-        self.setGeometry(100, 100, 400, 500)
         self.setMinimumSize(300, 200)
+        geometry = self.settings.value('geometry')
+        if geometry is None or not self.restoreGeometry(geometry):
+            self.setGeometry(100, 100, 400, 500)
         
         # 设置应用图标
         icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
@@ -167,19 +3226,7 @@ class StickyNote(QMainWindow):
         # 创建中心部件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
-        central_widget.setStyleSheet("""
-            QWidget {
-                background: qlineargradient(
-                    x1: 0, y1: 0,
-                    x2: 1, y2: 1,
-                    stop: 0 #ffd8a8,
-                    stop: 0.3 #ffe8cc,
-                    stop: 0.6 #fff3e0,
-                    stop: 1 #fff9db
-                );
-                border-radius: 10px;
-            }
-        """)
+        central_widget.setObjectName('central')
         
         # 创建主布局
         self.main_layout = QVBoxLayout(central_widget)
@@ -192,282 +3239,1091 @@ class StickyNote(QMainWindow):
        
         
         # 添加日期标签
-        from datetime import datetime
-        date_label = QLabel(datetime.now().strftime("%Y-%m-%d"))
-        date_label.setStyleSheet("""
-            QLabel {
-                color: #495057;
-                font-family: 'Segoe UI', 'Microsoft YaHei';
-                font-size: 14px;
-                font-weight: 500;
-                padding: 5px 10px;
-                background-color: rgba(255, 255, 255, 0.7);
-                border-radius: 8px;
-            }
-        """)
+        self.date_label = QLabel(QDate.currentDate().toString("yyyy-MM-dd"))
+        self.date_label.setObjectName('dateLabel')
+        self.date_label.setToolTip('查看历史')
+        self.date_label.setCursor(Qt.PointingHandCursor)
+        self.date_label.installEventFilter(self)
+        
+        # 搜索框
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('搜索')
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(60)
+        self.search_edit.setObjectName('searchEdit')
+        self.search_edit.textChanged.connect(self.apply_search)
         
-         # 导出Markdown按钮
+        # 视图下拉框：全部、保存的视图，以及各标签和任务数
+        self.view_combo = QComboBox()
+        self.view_combo.setObjectName('viewCombo')
+        self.view_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.view_combo.setMinimumContentsLength(4)
+        self.view_combo.addItem('全部', '')
+        for name, query in self.saved_views.items():
+            self.view_combo.addItem(str(name), str(query))
+        self.view_combo.insertSeparator(self.view_combo.count())
+        self.tag_offset = self.view_combo.count()  # 第一个标签项的位置
+        self.tag_names = []  # 下拉框中的标签，按名称排序
+        self.view_query = ''
+        self.view_combo.activated.connect(self.apply_view)
+        
+         # 导出按钮，格式由配置项export_format决定
         export_btn = QPushButton('📝')
         export_btn.setFixedSize(25, 25)
-        export_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4dabf7;
-                border: none;
-                color: white;
-                border-radius: 12px;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #339af0;
-            }
-        """)
-        export_btn.clicked.connect(self.export_markdown)  # 连接导出功能
+        export_btn.setObjectName('exportButton')
+        export_btn.clicked.connect(lambda: self.export_tasks())  # 连接导出功能
         
         # 置顶按钮
         self.pin_btn = QPushButton('📌')
         self.pin_btn.setFixedSize(25, 25)
         self.pin_btn.clicked.connect(self.toggle_always_on_top)
-        self.pin_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #4dabf7;
-                border: none;
-                color: white;
-                border-radius: 12px;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #339af0;
-            }
-        """)
+        self.pin_btn.setObjectName('pinButton')
+        self.pin_btn.setProperty('pinned', self.always_on_top)  # 显示之前设置属性，样式表只需应用一次
 
         # 添加新单元格按钮
         add_btn = QPushButton('+')
         add_btn.setFixedSize(25, 25)
-        add_btn.clicked.connect(self.add_cell)
-        add_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #ffd43b;
-                border: none;
-                color: white;
-                border-radius: 12px;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #fcc419;
-            }
-        """)
+        add_btn.clicked.connect(lambda: self.add_cell())
+        add_btn.setObjectName('addButton')
         
         
+        # 批量操作菜单
+        bulk_btn = QPushButton('☰')
+        bulk_btn.setFixedSize(25, 25)
+        bulk_btn.setObjectName('bulkButton')
+        bulk_menu = QMenu(bulk_btn)
+        bulk_menu.addAction('全选', self.select_all)
+        bulk_menu.addSeparator()
+        self.selection_actions = [
+            bulk_menu.addAction('完成所选', lambda: self.complete_selected(True)),
+            bulk_menu.addAction('取消完成所选', lambda: self.complete_selected(False)),
+            bulk_menu.addAction('删除所选', self.delete_selected),
+        ]
+        bulk_menu.addSeparator()
+        self.selection_actions += [
+            bulk_menu.addAction('设置提醒…', lambda: self.set_selected_time('remind_at', '设置提醒')),
+            bulk_menu.addAction('设置截止时间…', lambda: self.set_selected_time('due_at', '设置截止时间')),
+            bulk_menu.addAction('清除提醒和截止时间', self.clear_selected_times),
+        ]
+        bulk_menu.addSeparator()
+        bulk_menu.addAction('清除已完成', self.clear_completed)
+        bulk_menu.aboutToShow.connect(self.update_bulk_menu)
+        bulk_btn.setMenu(bulk_menu)
+        
         # 关闭按钮
         close_btn = QPushButton('×')
         close_btn.setFixedSize(25, 25)
         close_btn.clicked.connect(self.hide)
-        close_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #ff6b6b;
-                border: none;
-                color: white;
-                border-radius: 12px;
-                font-size: 16px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #ff5252;
-            }
-        """)
+        close_btn.setObjectName('closeButton')
         
         
-        top_bar.addWidget(date_label)  # 添加日期标签
+        # 加载进度标签，分批加载期间显示
+        self.loading_label = QLabel()
+        self.loading_label.setObjectName('loadingLabel')
+        self.loading_label.hide()
+        
+        top_bar.addWidget(self.date_label)  # 添加日期标签
+        top_bar.addWidget(self.loading_label)  # 加载进度
         top_bar.addWidget(self.pin_btn)  # 钉住按钮
         top_bar.addWidget(add_btn)      # 添加按钮
         top_bar.addWidget(export_btn)  # 将导出按钮添加到布局
-        top_bar.addStretch()
+        top_bar.addWidget(bulk_btn)  # 批量操作
+        top_bar.addWidget(self.view_combo)  # 视图和标签
+        top_bar.addWidget(self.search_edit, 1)  # 搜索框占据剩余空间
         top_bar.addWidget(close_btn)    # 关闭按钮
         
         self.main_layout.addLayout(top_bar)
         
+        if self.list_mode == 'virtual':
+            self.init_list_view()
+        else:
+            self.init_cells_view()
+        
+        self.show()
+    
+    def apply_theme(self, name):
+        """切换主题：整个应用只有一份样式表，状态由控件的动态属性表达"""
+        if name not in THEMES:
+            name = 'warm'
+        self.theme = name
+        QApplication.instance().setStyleSheet(build_stylesheet(name))
+        LiteCell.colors = THEMES[name]
+        if getattr(self, 'cells_widget', None) is not None:
+            self.cells_widget.update()
+        if getattr(self, 'list_view', None) is not None:
+            # 虚拟列表的行由委托绘制，不受样式表影响
+            self.list_view.itemDelegate().colors = THEMES[name]
+            self.list_view.viewport().update()
+    
+    def init_list_view(self):
+        """虚拟列表模式：基于模型/视图，只为可见或正在编辑的行创建控件"""
+        self.list_view = TaskListView()
+        self.filter_model = TaskFilterModel(self)
+        self.filter_model.setSourceModel(self.model)
+        self.list_view.setModel(self.filter_model)
+        self.list_view.itemDelegate().deleteRequested.connect(self.delete_row)
+        self.list_view.itemDelegate().closeEditor.connect(self.on_editing_finished)
+        self.list_view.deletePressed.connect(self.delete_selected)
+        self.list_view.setObjectName('taskList')
+        self.list_view.itemDelegate().colors = THEMES[self.theme]
+        self.main_layout.addWidget(self.list_view)
+    
+    def init_cells_view(self):
+        """单元格模式：每个任务对应一个CellWidget（lite模式为LiteCell），由模型信号驱动增删"""
         # 创建滚动区域
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: transparent;
-                border-radius: 10px;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: rgba(241, 243, 245, 0.6);
-                width: 10px;
-                margin: 0px;
-                border-radius: 5px;
-            }
-            QScrollBar::handle:vertical {
-                background: rgba(173, 181, 189, 0.8);
-                border-radius: 5px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background: rgba(134, 142, 150, 0.9);
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-        """)
+        self.scroll_area.setObjectName('cellsScroll')
         
         # 为滚动区域添加事件过滤器
         self.scroll_area.viewport().installEventFilter(self)
         
         # 创建单元格容器
         self.cells_widget = QWidget()
-        self.cells_widget.setStyleSheet("""
-            QWidget {
-                background: transparent;
-            }
-        """)
+        self.cells_widget.setObjectName('cellsContainer')
         self.cells_layout = QVBoxLayout(self.cells_widget)
-        self.cells_layout.setSpacing(10)
+        self.cells_layout.setSpacing(CELL_SPACING)
         self.cells_layout.addStretch()  # 添加弹性空间
         
         self.scroll_area.setWidget(self.cells_widget)
         self.main_layout.addWidget(self.scroll_area)
         
-        self.show()
+        # 拖动单元格调整顺序：容器显示插入位置，放下时移动模型中的行
+        self.cells_widget.setAcceptDrops(True)
+        self.cells_widget.installEventFilter(self)
+        self.drop_indicator = QWidget(self.cells_widget)
+        self.drop_indicator.setObjectName('dropIndicator')
+        self.drop_indicator.setFixedHeight(2)
+        self.drop_indicator.hide()
+        
+        # 批量导入后在事件循环中分批创建其余单元格
+        self.cells_timer = QTimer(self)
+        self.cells_timer.setSingleShot(True)
+        self.cells_timer.setInterval(0)
+        self.cells_timer.timeout.connect(self.create_next_cells)
+        
+        # 单元格与模型行一一对应：布局中第i项就是模型第i行
+        self.model.rowsInserted.connect(self.on_rows_inserted)
+        self.model.rowsAboutToBeRemoved.connect(self.on_rows_about_to_be_removed)
+        self.model.rowsAboutToBeMoved.connect(lambda *args: self.finish_cells())
+        self.model.rowsMoved.connect(self.on_rows_moved)
+        self.model.dataChanged.connect(self.on_data_changed)
+    
+    def on_rows_inserted(self, parent, first, last):
+        if self.ingesting and first >= self.cell_count():
+            # 批量导入的任务追加在末尾：先创建一屏的单元格，其余的在事件循环中分批创建，
+            # 尚未创建单元格的总是最后若干行
+            if self.cell_count() == first:
+                screen = self.height() // (CELL_HEIGHT + CELL_SPACING) + 1
+                self.create_cells(min(last + 1, first + screen))
+            if self.cell_count() < self.model.rowCount():
+                self.cells_timer.start()
+            return
+        # 插入位置之前还有尚未创建单元格的行时先创建它们；插入到已创建的单元格之间时，
+        # 尚未创建的仍是最后若干行
+        self.finish_cells(first)
+        cell_class = LiteCell if self.list_mode == 'lite' else CellWidget
+        for row in range(first, last + 1):
+            self.insert_cell(row, cell_class)
+
+    def insert_cell(self, row, cell_class):
+        cell = cell_class(self.model.tasks[row], self.model)
+        cell.deleteRequested.connect(self.create_delete_handler(cell))
+        cell.editingFinished.connect(self.on_editing_finished)
+        cell.selectRequested.connect(lambda modifiers, cell=cell: self.select_cell(cell, modifiers))
+        self.cells_layout.insertWidget(row, cell)
+        return cell
+
+    def cell_count(self):
+        """已经创建单元格的行数，布局中最后一项是stretch"""
+        return self.cells_layout.count() - 1
+
+    def create_cells(self, end):
+        """为批量导入的任务创建单元格直到第end行：轻量单元格的创建耗时约为完整单元格的几分之一，
+        单击时才创建编辑器；搜索隐藏和选中的状态在显示之前设置"""
+        for row in range(self.cell_count(), end):
+            cell = self.insert_cell(row, LiteCell)
+            task = self.model.tasks[row]
+            if task.id in self.selected_ids:
+                cell.set_selected(True)
+            if task.id in self.hidden_ids:
+                cell.setVisible(False)
+
+    def create_next_cells(self):
+        """每批创建后让出事件循环；和分批加载一样，批次大小随已创建数量增长，使总的布局次数为对数级"""
+        count = self.cell_count()
+        if count >= self.model.rowCount():
+            return
+        with self.batch_update():
+            self.create_cells(min(self.model.rowCount(), count + max(LOAD_BATCH_SIZE, count // 2)))
+        if self.cell_count() < self.model.rowCount():
+            self.cells_timer.start()
+
+    def finish_cells(self, end=None):
+        """同步创建剩余的单元格（直到第end行），在移动单元格或计算拖放位置之前调用，使布局第i项就是模型第i行"""
+        end = self.model.rowCount() if end is None else end
+        if self.cell_count() < end:
+            with self.batch_update():
+                self.create_cells(end)
+    
+    def on_rows_about_to_be_removed(self, parent, first, last):
+        for row in range(last, first - 1, -1):
+            self.selected_ids.discard(self.model.tasks[row].id)
+            if row >= self.cell_count():
+                continue  # 还没有创建单元格
+            cell = self.cells_layout.itemAt(row).widget()
+            self.cells_layout.removeWidget(cell)
+            cell.hide()
+            cell.deleteLater()
+    
+    def on_rows_moved(self, parent, start, end, destination, row):
+        # 模型每次只移动一行；row是移动前的行号
+        cell = self.cells_layout.itemAt(start).widget()
+        self.cells_layout.removeWidget(cell)
+        self.cells_layout.insertWidget(row - 1 if start < row else row, cell)
+
+    def on_data_changed(self, top_left, bottom_right, roles=()):
+        if roles == [TaskModel.OrderRole]:
+            return
+        # 还没有创建的单元格在创建时读取任务的最新状态
+        for row in range(top_left.row(), min(bottom_right.row() + 1, self.cell_count())):
+            self.cells_layout.itemAt(row).widget().sync_from_task()
+
+    def drop_row(self, y):
+        """拖动到容器中y处时的插入行号：在可见单元格中二分查找"""
+        self.finish_cells()
+        rows = range(self.model.rowCount())
+        if self.hidden_ids:
+            rows = [row for row in rows if self.model.tasks[row].id not in self.hidden_ids]
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            cell = self.cells_layout.itemAt(rows[middle]).widget()
+            if y < cell.y() + cell.height() // 2:
+                high = middle
+            else:
+                low = middle + 1
+        if low < len(rows):
+            return rows[low], self.cells_layout.itemAt(rows[low]).widget().y() - CELL_SPACING // 2 - 1
+        if rows:
+            cell = self.cells_layout.itemAt(rows[-1]).widget()
+            return self.model.rowCount(), cell.y() + cell.height() + CELL_SPACING // 2 - 1
+        return self.model.rowCount(), 0
+
+    def handle_cell_drop(self, event):
+        """单元格模式的拖放：拖动时显示插入位置，放下时移动任务（拖动选中的任务时移动全部选中任务）"""
+        if event.type() == QEvent.DragLeave:
+            self.drop_indicator.hide()
+            return True
+        if not event.mimeData().hasFormat(TASK_MIME):
+            return False
+        row, y = self.drop_row(event.pos().y())
+        event.setDropAction(Qt.MoveAction)
+        event.accept()
+        if event.type() != QEvent.Drop:
+            self.drop_indicator.setGeometry(0, max(0, y), self.cells_widget.width(), 2)
+            self.drop_indicator.show()
+            self.drop_indicator.raise_()
+            return True
+        self.drop_indicator.hide()
+        task_id = bytes(event.mimeData().data(TASK_MIME)).decode()
+        ids = self.selected_ids if task_id in self.selected_ids else {task_id}
+        self.move_tasks([r for r, task in enumerate(self.model.tasks) if task.id in ids], row)
+        return True
+
+    @profiler.timed('move')
+    def move_tasks(self, rows, target):
+        """把rows中的任务移动到target行之前，只写入被移动任务的记录"""
+        self.model.move_rows(rows, target)
+    
+    @contextmanager
+    def batch_update(self):
+        """批量修改任务期间暂停重绘，结束后只做一次布局"""
+        if self.list_mode == 'virtual':
+            self.list_view.setUpdatesEnabled(False)
+            try:
+                yield
+            finally:
+                self.list_view.setUpdatesEnabled(True)
+            return
+        # 容器可见时每显示一个新单元格都会同步重新激活整个布局；
+        # 先隐藏容器，再显示时所有单元格在同一次布局中完成
+        scroll_value = self.scroll_area.verticalScrollBar().value()
+        self.scroll_area.setUpdatesEnabled(False)
+        self.cells_widget.hide()
+        try:
+            yield
+        finally:
+            with profiler.span('layout'):
+                self.cells_widget.show()
+                self.cells_widget.layout().activate()
+            self.scroll_area.verticalScrollBar().setValue(scroll_value)
+            self.scroll_area.setUpdatesEnabled(True)
     
-    def add_cell(self):
-        cell = CellWidget()
-        cell.delete_btn.clicked.connect(self.create_delete_handler(cell))
-        # 在最后一个单元格之前插入新单元格（保持stretch在最后）
-        self.cells_layout.insertWidget(self.cells_layout.count() - 1, cell)
+    @profiler.timed('add_cell')
+    def add_cell(self, text='', completed=False):
+        # 新任务总是追加到末尾（单元格模式下保持stretch在最后）；
+        # 先加载完已保存的任务，新任务的顺序键才会排在最后
+        self.finish_loading()
+        task = TaskItem(text, completed)
+        self.unsaved_ids.add(task.id)
+        self.model.append_tasks([task])
     
+    @profiler.timed('ingest')
+    def ingest_tasks(self, values):
+        """批量添加任务：一次插入模型、一次布局、一次提交写入
+
+        values中的每一项是任务文本，或包含text（以及可选的completed、font_size、due_at、remind_at）的字典。
+        """
+        tasks = []
+        for value in values:
+            if isinstance(value, str):
+                value = {'text': value}
+            if not isinstance(value, dict) or not isinstance(value.get('text'), str):
+                continue
+            completed = bool(value.get('completed', False))
+            font_size = value.get('font_size', 12)
+            if not isinstance(font_size, int) or not MIN_FONT_SIZE <= font_size <= MAX_FONT_SIZE:
+                font_size = 12
+            times = {name: float(value[name]) for name in ('due_at', 'remind_at')
+                     if isinstance(value.get(name), (int, float)) and not isinstance(value[name], bool)}
+            tasks.append(TaskItem(value['text'], completed, font_size,
+                                  completed_at=time.time() if completed else None, **times))
+        # 先加载完已保存的任务，新任务才会排在最后
+        self.finish_loading()
+        self.ingesting = True
+        try:
+            with self.batch_update():
+                self.model.append_tasks(tasks)
+        finally:
+            self.ingesting = False
+        self.unsaved_ids.update(task.id for task in tasks)
+        self.save_notes()
+        return {'ok': True, 'added': len(tasks), 'skipped': len(values) - len(tasks)}
+
+    @profiler.timed('import')
+    def import_tasks(self, texts, files):
+        """合并从Markdown导出文件读取的任务：跳过与现有任务内容相同的，其余一次批量加入"""
+        self.finish_loading()
+        existing = {normalized_hash(task.text) for task in self.model.tasks}
+        tasks = []
+        for text in texts:
+            if isinstance(text, str):
+                content = normalized_hash(text)
+                if content in existing:
+                    continue
+                existing.add(content)
+            tasks.append(text)
+        reply = self.ingest_tasks(tasks)
+        update_import_manifest(files)
+        reply['duplicates'] = len(texts) - len(tasks)
+        return reply
+
     def create_delete_handler(self, cell):
         """创建删除处理器"""
         def delete_handler():
             index = self.cells_layout.indexOf(cell)
             if index != -1:  # 确保单元格存在
-                self.cells_layout.itemAt(index).widget().deleteLater()
-                self.save_notes()  # 删除后保存笔记
+                self.delete_row(index)
         return delete_handler
     
+    def delete_row(self, row):
+        """删除模型中的一行并保存"""
+        if self.model.tasks[row].id not in self.unsaved_ids:
+            self.stats.add(deleted=1)
+        self.model.removeRow(row)
+        self.save_notes()  # 删除后保存笔记
+    
     def delete_cell(self, cell):
         """已弃用的删除方法"""
         pass
 
-    def save_notes(self):
-        import xml.etree.ElementTree as ET
-        from xml.dom import minidom
-        
-        root = ET.Element("stickynotes")
-        
-        for i in range(self.cells_layout.count()):
-            cell = self.cells_layout.itemAt(i).widget()
-            if cell:
-                # 获取单元格文本内容并去除首尾空白
-                text_content = cell.text_edit.toPlainText().strip()
-                # 只保存非空单元格
-                if text_content:
-                    note = ET.SubElement(root, "note")
-                    text = ET.SubElement(note, "text")
-                    # 保存原始文本（包括中间的换行和空格），只去除首尾空白
-                    text.text = text_content
-                    completed = ET.SubElement(note, "completed")
-                    completed.text = str(cell.is_completed)
-        
-        # 创建格式化的XML字符串
-        xml_str = minidom.parseString(ET.tostring(root)).toprettyxml(indent="    ")
+    def select_cell(self, cell, modifiers):
+        """单元格模式的多选：Ctrl+单击切换选中，Shift+单击选中一段，普通单击清除选择"""
+        row = self.cells_layout.indexOf(cell)
+        if row == -1:
+            return
+        if modifiers & Qt.ShiftModifier and self.selection_anchor is not None:
+            first, last = sorted((min(self.selection_anchor, self.model.rowCount() - 1), row))
+            selected = {task.id for task in self.model.tasks[first:last + 1]
+                        if task.id not in self.hidden_ids}
+        elif modifiers & Qt.ControlModifier:
+            selected = self.selected_ids ^ {cell.task.id}
+            self.selection_anchor = row
+        else:
+            if not self.selected_ids:
+                self.selection_anchor = row
+                return
+            selected = set()
+            self.selection_anchor = row
+        self.set_selected_ids(selected)
+
+    def set_selected_ids(self, selected):
+        """只更新选中状态发生变化的单元格"""
+        changed = selected ^ self.selected_ids
+        self.selected_ids = selected
+        for row, task in enumerate(self.model.tasks[:self.cell_count()]):
+            if task.id in changed:
+                self.cells_layout.itemAt(row).widget().set_selected(task.id in selected)
+
+    def selected_rows(self):
+        """选中任务在模型中的行号，升序"""
+        if self.list_mode == 'virtual':
+            # 按选择区间展开，比逐个取selectedRows()快得多
+            selection = self.filter_model.mapSelectionToSource(
+                self.list_view.selectionModel().selection())
+            return sorted({row for selection_range in selection
+                           for row in range(selection_range.top(), selection_range.bottom() + 1)})
+        return [row for row, task in enumerate(self.model.tasks) if task.id in self.selected_ids]
+
+    def select_all(self):
+        """选中所有未被搜索过滤掉的任务"""
+        if self.list_mode == 'virtual':
+            self.list_view.selectAll()
+        else:
+            self.set_selected_ids({task.id for task in self.model.tasks
+                                   if task.id not in self.hidden_ids})
+
+    def update_bulk_menu(self):
+        has_selection = bool(self.selected_rows())
+        for action in self.selection_actions:
+            action.setEnabled(has_selection)
+
+    @profiler.timed('bulk_complete')
+    def complete_selected(self, completed):
+        """批量完成或取消完成：一次写入
+
+        不使用batch_update：完成状态不改变单元格数量，Qt会把各单元格的布局请求合并为一次，
+        而隐藏再显示容器反而要重新处理所有单元格。
+        """
+        changed = self.model.set_completed_rows(self.selected_rows(), completed)
+        if changed:
+            self.save_notes()
+
+    def delete_selected(self):
+        self.delete_rows(self.selected_rows())
+
+    def set_selected_time(self, name, title):
+        """为选中的任务设置提醒时间或截止时间"""
+        rows = self.selected_rows()
+        if not rows:
+            return
+        when = self.ask_datetime(title, getattr(self.model.tasks[rows[0]], name))
+        if when is None:
+            return
+        self.model.update_rows(rows, TaskModel.ReminderRole, **{name: when})
+        self.save_notes()
+
+    def clear_selected_times(self):
+        rows = [row for row in self.selected_rows()
+                if self.model.tasks[row].due_at is not None or self.model.tasks[row].remind_at is not None]
+        if rows:
+            self.model.update_rows(rows, TaskModel.ReminderRole, due_at=None, remind_at=None)
+            self.save_notes()
+
+    def ask_datetime(self, title, current=None):
+        """选择日期和时间，取消时返回None"""
+        dialog = QDialog(self)
+        dialog.setWindowTitle(title)
+        edit = QDateTimeEdit(dialog)
+        edit.setCalendarPopup(True)
+        edit.setDisplayFormat('yyyy-MM-dd HH:mm')
+        if current is not None:
+            edit.setDateTime(QDateTime.fromSecsSinceEpoch(int(current)))
+        else:
+            edit.setDateTime(QDateTime.currentDateTime().addSecs(3600))
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, parent=dialog)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(edit)
+        layout.addWidget(buttons)
+        if dialog.exec_() != QDialog.Accepted:
+            return None
+        return float(edit.dateTime().toSecsSinceEpoch())
+
+    def schedule_inserted(self, parent, first, last):
+        for task in self.model.tasks[first:last + 1]:
+            if task.remind_at is not None or task.due_at is not None:
+                self.reminders.schedule(task)
+
+    def unschedule_removed(self, parent, first, last):
+        for task in self.model.tasks[first:last + 1]:
+            self.reminders.cancel(task.id)
+
+    def schedule_changed(self, top_left, bottom_right, roles=()):
+        if roles and TaskModel.CompletedRole not in roles and TaskModel.ReminderRole not in roles:
+            return
+        for task in self.model.tasks[top_left.row():bottom_right.row() + 1]:
+            self.reminders.schedule(task)
+
+    def on_reminder_due(self, task, kind):
+        """提醒到期：通过托盘显示通知；提醒只触发一次，清除后保存"""
+        if kind == 'remind':
+            try:
+                row = self.model.tasks.index(task)
+            except ValueError:
+                return
+            self.model.update_rows([row], TaskModel.ReminderRole, remind_at=None)
+            self.save_notes()
+        self.fired_reminders = [t for t in self.fired_reminders if t is not task][-19:] + [task]
+        text = task.text.strip().split('\n', 1)[0][:100] or '（空白任务）'
+        self.reminderShown.emit('提醒' if kind == 'remind' else '已到截止时间', text)
+
+    def snooze_reminders(self, minutes=None):
+        """把最近提醒过、尚未完成的任务推迟若干分钟后再提醒"""
+        minutes = minutes or self.read_config().get('snooze_minutes', SNOOZE_MINUTES)
+        snoozed = {task.id for task in self.fired_reminders}
+        self.fired_reminders = []
+        rows = [row for row, task in enumerate(self.model.tasks)
+                if task.id in snoozed and not task.completed]
+        if rows:
+            self.model.update_rows(rows, TaskModel.ReminderRole, remind_at=time.time() + minutes * 60)
+            self.save_notes()
+
+    def clear_completed(self):
+        self.delete_rows([row for row, task in enumerate(self.model.tasks) if task.completed])
+
+    @profiler.timed('bulk_delete')
+    def delete_rows(self, rows):
+        """批量删除：确认后一次性删除所有行，布局请求由Qt合并为一次，只提交一次写入"""
+        if not rows:
+            return
+        if len(rows) > 1:
+            answer = QMessageBox.question(self, '删除任务', f'确定删除 {len(rows)} 个任务吗？')
+            if answer != QMessageBox.Yes:
+                return
+        if self.list_mode == 'virtual':
+            # 先清除选择，删除各段时视图不必逐段调整选择区间
+            self.list_view.clearSelection()
+        deleted = sum(1 for row in rows if self.model.tasks[row].id not in self.unsaved_ids)
+        self.model.remove_task_rows(rows)
+        self.stats.add(deleted=deleted)
+        self.save_notes()
+
+    def track_inserted(self, parent, first, last):
+        if self.restoring:
+            return
+        for task in self.model.tasks[first:last + 1]:
+            self.pending_changes[task.id] = task
+        self.schedule_save()
+
+    def track_removed(self, parent, first, last):
+        for task in self.model.tasks[first:last + 1]:
+            self.pending_changes[task.id] = None
+        self.schedule_save()
+
+    def track_changed(self, top_left, bottom_right, roles=()):
+        for task in self.model.tasks[top_left.row():bottom_right.row() + 1]:
+            self.pending_changes[task.id] = task
+        self.schedule_save()
+
+    def schedule_save(self):
+        """停止修改AUTOSAVE_DELAY_MS后保存；持续修改时最迟AUTOSAVE_MAX_DELAY_MS保存一次"""
+        if not self.autosave_timer.isActive():
+            self.first_change_time = time.monotonic()
+            self.autosave_timer.start(AUTOSAVE_DELAY_MS)
+            return
+        elapsed_ms = int((time.monotonic() - self.first_change_time) * 1000)
+        self.autosave_timer.start(max(0, min(AUTOSAVE_DELAY_MS, AUTOSAVE_MAX_DELAY_MS - elapsed_ms)))
+
+    def index_inserted(self, parent, first, last):
+        for task in self.model.tasks[first:last + 1]:
+            self.search_index.update(task.id, task.text)
+            self.tag_index.update(task)
+
+    def unindex_removed(self, parent, first, last):
+        for task in self.model.tasks[first:last + 1]:
+            self.search_index.remove(task.id)
+            self.tag_index.remove(task.id)
+            self.hidden_ids.discard(task.id)
+
+    def index_changed(self, top_left, bottom_right, roles=()):
+        text_changed = not roles or Qt.EditRole in roles
+        if not text_changed and TaskModel.CompletedRole not in roles:
+            return
+        for task in self.model.tasks[top_left.row():bottom_right.row() + 1]:
+            if text_changed:
+                self.search_index.update(task.id, task.text)
+            # 只统计本机的完成操作：同步来的修改不带CompletedRole，标签索引里还是修改前的状态
+            if TaskModel.CompletedRole in roles and task.completed != (task.id in self.tag_index.completed_ids):
+                if task.completed:
+                    self.stats.add(completed=1, latency=max(0.0, (task.completed_at or time.time()) - task.created_at))
+                else:
+                    self.stats.add(reopened=1)
+            self.tag_index.update(task)
+
+    def update_tag_count(self, tag, count):
+        """标签的任务数变化时只更新下拉框中的这一项；任务数为0的标签除非正在查看，否则移除"""
+        position = bisect.bisect_left(self.tag_names, tag)
+        index = self.tag_offset + position
+        if position < len(self.tag_names) and self.tag_names[position] == tag:
+            if count or self.view_combo.currentIndex() == index:
+                self.view_combo.setItemText(index, f'#{tag} {count}')
+            else:
+                del self.tag_names[position]
+                self.view_combo.removeItem(index)
+        elif count:
+            self.tag_names.insert(position, tag)
+            self.view_combo.insertItem(index, f'#{tag} {count}', '#' + tag)
+
+    def apply_view(self, index):
+        """切换到下拉框中选中的视图"""
+        self.view_query = self.view_combo.itemData(index) or ''
+        self.apply_search()
+        # 之前查看的标签已经没有任务了，这时再移除
+        for position in range(len(self.tag_names) - 1, -1, -1):
+            if self.tag_offset + position != self.view_combo.currentIndex() and \
+                    not self.tag_index.count(self.tag_names[position]):
+                del self.tag_names[position]
+                self.view_combo.removeItem(self.tag_offset + position)
+
+    @profiler.timed('search')
+    def apply_search(self, text=None):
+        """按搜索框内容和当前视图过滤任务；新增和正在编辑的任务在下次过滤前保持显示"""
+        matched, rest = self.tag_index.query(self.view_query)
+        for words in (self.search_edit.text(), rest):
+            ids = self.search_index.query(words)
+            if ids is not None:
+                matched = ids if matched is None else matched & ids
+        hidden = set() if matched is None else self.search_index.all_ids() - matched
+        self.set_hidden_ids(hidden)
+
+    def rows_of(self, ids):
+        """任务ID对应的行号，升序：模型按(顺序键, 任务ID)排序，每个任务二分查找一次
+
+        任务较多时逐行查找集合反而更快。
+        """
+        if len(ids) * 32 > len(self.model.tasks):
+            return [row for row, task in enumerate(self.model.tasks) if task.id in ids]
+        rows = []
+        for task_id in ids:
+            task = self.model.by_id.get(task_id)
+            if task is None:
+                continue
+            row = self.model.row_for_key(task.order_key or '', task.id) - 1
+            if row < 0 or self.model.tasks[row] is not task:
+                # 行不在顺序键对应的位置时退回逐行查找
+                return [row for row, task in enumerate(self.model.tasks) if task.id in ids]
+            rows.append(row)
+        return sorted(rows)
+
+    def set_hidden_ids(self, hidden):
+        """只切换显示状态发生变化的行，按顺序键二分查找这些行，不遍历所有单元格"""
+        changed = hidden ^ self.hidden_ids
+        self.hidden_ids = hidden
+        if not changed:
+            return
+        if self.list_mode == 'virtual':
+            self.filter_model.set_hidden_ids(hidden)
+            return
+        rows = self.rows_of(changed)
+        with self.batch_update():
+            for row in rows:
+                if row < self.cell_count():  # 还没有创建的单元格在创建时设置
+                    self.cells_layout.itemAt(row).widget().setVisible(self.model.tasks[row].id not in hidden)
+
+    def on_editing_finished(self):
+        if self.pending_changes:
+            self.save_notes()
+
+    @profiler.timed('save_notes')
+    def commit_editor(self):
+        """把虚拟列表中正在编辑的行的文字写入模型，用于退出前保存"""
+        if self.list_mode == 'virtual':
+            editor = self.list_view.indexWidget(self.list_view.currentIndex())
+            if editor is not None:
+                self.list_view.commitData(editor)
+
+    def save_notes(self, wait=False, archive=None):
+        """把修改交给写入线程：增量存储只写改动过的任务，XML存储重写整个文件
+
+        wait为True时等待写入完成，用于退出前保存。archive是要归档的任务记录，
+        和从存储删除它们的修改在同一次提交中交给写入线程，归档失败时这些任务仍保留在存储中
+        """
+        self.autosave_timer.stop()
+        self.finish_loading()
+        if self.store.incremental:
+            changes = [(task_id, task.to_record() if task is not None else None)
+                       for task_id, task in self.pending_changes.items()]
+            self.writer.submit(changes=changes, archive=archive)
+        elif self.pending_changes or wait or archive:
+            self.writer.submit(snapshot=[task.to_record() for task in self.model.tasks], archive=archive)
+        if self.sync is not None:
+            self.publish_sync_changes()
+        self.count_created()
+        self.save_stats()
+        if self.pending_changes:
+            self.snapshot_dirty = True
+        self.pending_changes.clear()
+        if wait:
+            self.writer.flush()
+
+    def count_created(self):
+        """新建的任务第一次以非空内容保存时才计入新建数；空任务不保存，自动创建的空白任务也就不计入"""
+        if not self.unsaved_ids:
+            return
+        created = 0
+        for task_id, task in self.pending_changes.items():
+            if task_id not in self.unsaved_ids:
+                continue
+            if task is None:
+                self.unsaved_ids.discard(task_id)
+            elif task.text.strip():
+                self.unsaved_ids.discard(task_id)
+                created += 1
+        if created:
+            self.stats.add(created=created)
+
+    def save_stats(self):
+        """记录当前的未完成任务数，把有变化的统计交给写入线程"""
+        self.stats.set_open(self.tag_index.open_count())
+        rows = self.stats.take_changes()
+        if rows:
+            self.writer.submit(stats=rows)
+
+    def stats_totals(self):
+        self.stats.ensure_loaded()
+        return self.stats.total[:-1] + [self.tag_index.open_count()]
+
+    @profiler.timed('load_notes')
+    def load_notes(self, blocking=False):
+        """加载便签：先同步插入一屏的任务，剩余部分在事件循环中分批插入"""
+        self.note_loader = self.store.load()
+        first_screen = self.height() // (CELL_HEIGHT + CELL_SPACING) + 1
+        self.insert_loaded_batch(first_screen)
         
+        if blocking:
+            self.finish_loading()
+        elif self.note_loader is not None:
+            self.loading_label.setText(f'加载中 {self.model.rowCount()}')
+            self.loading_label.show()
+            # 剩余任务在窗口首次绘制之后再开始加载，见paintEvent
+            self.loading_pending = True
+        else:
+            self.on_loading_finished()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.hotkey_pressed is not None:
+            profiler.record('hotkey_visible', (time.perf_counter() - self.hotkey_pressed) * 1000)
+            self.hotkey_pressed = None
+        # 零延时定时器会先于首次绘制执行，等窗口画出来后再插入后续批次
+        if self.loading_pending:
+            self.loading_pending = False
+            QTimer.singleShot(0, self.load_next_batch)
+
+    @profiler.timed('load_batch')
+    def insert_loaded_batch(self, batch_size):
+        """从加载器中取出一批任务插入模型"""
+        batch = []
         try:
-            with open(self.notes_file, 'w', encoding='utf-8') as f:
-                f.write(xml_str)
+            for task in self.note_loader:
+                batch.append(task)
+                if len(batch) >= batch_size:
+                    break
         except Exception as e:
-            print(f"保存笔记时出错: {e}")
-
-    def load_notes(self):
-        import xml.etree.ElementTree as ET
+            print(f"加载笔记时出错: {e}")
+            self.note_loader = None
+        if len(batch) < batch_size:
+            self.note_loader = None
         
+        # 从存储中读出的任务不需要再写回；旧版数据没有顺序键，
+        # 按原来的顺序分配后写回一次
+        keyless = [task for task in batch if not task.order_key]
+        self.restoring = True
+        with self.batch_update():
+            self.model.append_tasks(batch)
+        self.restoring = False
+        for task in keyless:
+            self.pending_changes[task.id] = task
+        if keyless:
+            self.schedule_save()
+
+    def load_next_batch(self):
+        """每批插入后让出事件循环，窗口在加载期间保持响应"""
+        if self.note_loader is None:
+            return
+        # 单元格模式下每次布局都要遍历全部单元格，批次大小随已加载数量增长，
+        # 使总的布局次数为对数级
+        self.insert_loaded_batch(max(LOAD_BATCH_SIZE, self.model.rowCount() // 2))
+        if self.note_loader is not None:
+            self.loading_label.setText(f'加载中 {self.model.rowCount()}')
+            QTimer.singleShot(0, self.load_next_batch)
+        else:
+            self.on_loading_finished()
+
+    def finish_loading(self):
+        """同步加载完剩余的任务，保存或导出前调用，避免丢失尚未加载的便签"""
+        if self.note_loader is None:
+            return
+        while self.note_loader is not None:
+            self.insert_loaded_batch(LOAD_BATCH_SIZE * 10)
+        self.on_loading_finished()
+
+    def on_loading_finished(self):
+        self.loading_label.hide()
+        # 如果没有任何单元格，才创建第一个单元格
+        if self.model.rowCount() == 0:
+            self.add_cell()
+        # 不在save_notes等调用内部归档，留到事件循环中执行
+        QTimer.singleShot(0, self.archive_completed)
+        QTimer.singleShot(0, self.take_snapshot)
+        QTimer.singleShot(0, self.save_stats)  # 没有修改的日子也记录未完成任务数
+        if self.sync is not None:
+            if os.path.exists(self.sync.path):
+                self.sync.request_pull()
+            else:
+                self.sync.bootstrap([task.to_record() for task in self.model.tasks if task.text.strip()])
+
+    @profiler.timed('snapshot')
+    def take_snapshot(self, wait=False):
+        """在后台线程中保存当天的快照；当天已有快照且之后没有修改时跳过
+
+        wait为True时等待写入完成，用于打开历史窗口和退出前
+        """
+        day = QDate.currentDate().toString("yyyy-MM-dd")
+        self.date_label.setText(day)
+        if self.note_loader is None and (self.snapshot_dirty or self.snapshot_day != day):
+            if self.snapshot_thread is not None:
+                self.snapshot_thread.join()
+            records = [task.to_record() for task in self.model.tasks if task.text.strip()]
+            self.snapshot_thread = threading.Thread(target=self.write_snapshot, args=(day, records), daemon=True)
+            self.snapshot_thread.start()
+            self.snapshot_day = day
+            self.snapshot_dirty = False
+        if wait and self.snapshot_thread is not None:
+            self.snapshot_thread.join()
+
+    def write_snapshot(self, day, records):
         try:
-            if os.path.exists(self.notes_file):
-                tree = ET.parse(self.notes_file)
-                root = tree.getroot()
-                
-                for note in root.findall('note'):
-                    text = note.find('text').text or ""
-                    completed = note.find('completed').text.lower() == 'true'
-                    
-                    cell = CellWidget()
-                    cell.delete_btn.clicked.connect(self.create_delete_handler(cell))
-                    cell.text_edit.setText(text)
-                    if completed:
-                        cell.toggle_complete()
-                    self.cells_layout.insertWidget(self.cells_layout.count() - 1, cell)
+            self.history.record_day(day, records)
         except Exception as e:
-            print(f"加载笔记时出错: {e}")
+            print(f"保存每日快照时出错: {e}")
 
-    def load_config(self):
+    def device_id(self, config):
+        """同步时本机的设备ID：配置中的sync_device，没有时生成一个并保存在设置中"""
+        device = config.get('sync_device') or self.settings.value('device_id')
+        if not device:
+            device = uuid.uuid4().hex[:12]
+            self.settings.setValue('device_id', device)
+        return re.sub(r'[^\w-]', '_', str(device))
+
+    def sync_record(self, task_id):
+        """任务当前要发布的记录，空任务按删除处理"""
+        task = self.pending_changes.get(task_id)
+        return task.to_record() if task is not None and task.text.strip() else None
+
+    def has_local_change(self, task_id):
+        """任务在本机有尚未保存的修改（不是从其他设备收到的）"""
+        if task_id not in self.pending_changes:
+            return False
+        return task_id not in self.sync_applied or self.sync_applied[task_id] != self.sync_record(task_id)
+
+    def publish_sync_changes(self):
+        """把本机的修改交给同步线程；刚从其他设备收到的记录不再发布"""
+        changes = [(task_id, self.sync_record(task_id)) for task_id in self.pending_changes
+                   if self.has_local_change(task_id)]
+        for task_id in self.pending_changes:
+            self.sync_applied.pop(task_id, None)
+        self.sync.submit(changes)
+
+    @profiler.timed('sync_apply')
+    def apply_sync_changes(self, changes):
+        """应用其他设备的修改：按ID插入、更新或删除"""
+        self.finish_loading()
+        with self.batch_update():
+            for task_id, record, version in changes:
+                # 本机尚未保存的修改随后会以更大的时钟发布，以本机为准
+                if self.has_local_change(task_id) or not self.sync.is_current(task_id, version):
+                    continue
+                if record is None:
+                    if task_id in self.model.by_id:
+                        self.sync_applied[task_id] = None
+                        self.model.remove_task(task_id)
+                else:
+                    self.sync_applied[task_id] = record
+                    self.model.put_record(record)
+
+    @profiler.timed('archive')
+    def archive_completed(self):
+        """把完成时间早于archive_after_days天的任务移入归档，archive_after_days不大于0时不归档"""
+        if self.note_loader is not None:
+            return
+        days = self.read_config().get('archive_after_days', ARCHIVE_AFTER_DAYS)
+        if not days or days <= 0:
+            return
+        now = time.time()
+        cutoff = now - days * 86400
+        rows = []
+        for row, task in enumerate(self.model.tasks):
+            if not task.completed:
+                continue
+            if task.completed_at is None:
+                # 旧版本保存的任务没有完成时间，从现在开始计算
+                task.completed_at = now
+                index = self.model.index(row)
+                self.model.dataChanged.emit(index, index, [TaskModel.CompletedRole])
+            elif task.completed_at < cutoff:
+                rows.append(row)
+        if rows:
+            records = [self.model.tasks[row].to_record() for row in rows]
+            if self.list_mode == 'virtual':
+                self.list_view.clearSelection()
+            self.model.remove_task_rows(rows)
+            if self.model.rowCount() == 0:
+                self.add_cell()
+            # 归档记录和删除在同一次提交中交给写入线程，写入线程先写归档，同一批次中再从存储删除
+            self.save_notes(archive=records)
+        elif self.pending_changes:
+            self.save_notes()
+
+    def restore_archived(self, tasks):
+        """把归档中的任务恢复为未完成，追加到任务列表末尾"""
+        for task in tasks:
+            task.set_completed(False)
+            task.order_key = None  # 重新分配顺序键，排在最后
+        with self.batch_update():
+            self.model.append_tasks(tasks)
+        self.save_notes()
+
+    def read_config(self):
+        """读取config.yaml，文件不存在时返回空字典；文件修改时间不变时直接返回缓存"""
         config_path = os.path.expanduser('./config.yaml')
-        if os.path.exists(config_path):
-            with open(config_path, 'r') as file:
-                config = yaml.safe_load(file)
-                export_path = config.get('export_path', '~/')
-                # 检查路径是否有效
-                if not os.path.isdir(os.path.normpath(export_path)):
-                    return '~/'
-                return os.path.normpath(export_path)
-        return '~/'
-
-    def export_markdown(self):
-        # 合并所有单元格内容并导出为Markdown文件
-        date_str = QDate.currentDate().toString("yyyy-MM-dd")
-        content = "# {}任务\n\n".format(date_str)
-        for i in range(self.cells_layout.count()):
-            cell = self.cells_layout.itemAt(i).widget()
-            if cell:
-                text_content = cell.text_edit.toPlainText().strip()
-                if text_content:
-                    content += f"## 任务 {i+1}\n\n{text_content}\n\n"
-        export_path = self.load_config()  # 从配置文件加载导出路径
-        print(export_path)
-        export_path = os.path.expanduser(export_path)  # 处理~符号
-        file_path = os.path.join(export_path, f'{date_str}.md')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        QMessageBox.information(self, '导出成功', f'已导出为 {file_path}')
+        try:
+            mtime = os.stat(config_path).st_mtime_ns
+        except OSError:
+            return {}
+        if self.config_cache is None or self.config_cache[0] != mtime:
+            import yaml
+            with open(config_path, 'r', encoding='utf-8') as file:
+                self.config_cache = (mtime, yaml.safe_load(file) or {})
+        return self.config_cache[1]
+
+    def load_config(self):
+        config = self.read_config()
+        export_path = config.get('export_path', '~/')
+        # 检查路径是否有效
+        if not os.path.isdir(os.path.normpath(export_path)):
+            return '~/'
+        return os.path.normpath(export_path)
+
+    @profiler.timed('export')
+    def export_tasks(self, tasks=None, name=None):
+        """在后台线程中把任务流式写入导出文件，完成后显示非模态提示
+
+        默认导出全部任务；归档窗口传入某个月的任务和文件名
+        """
+        if self.export_thread is not None and self.export_thread.is_alive():
+            self.show_notice('导出', '上一次导出尚未完成')
+            return
+        config = self.read_config()
+        exporter_class = EXPORTERS.get(config.get('export_format', 'md'), MarkdownExporter)
+        name = name or QDate.currentDate().toString("yyyy-MM-dd")
+        export_path = os.path.expanduser(self.load_config())  # 处理~符号
+        file_path = os.path.join(export_path, f'{name}.{exporter_class.extension}')
+        # 界面线程只复制任务列表本身，生成记录、格式化和写文件都在后台线程中进行。
+        # 导出期间被编辑的任务会按写出时的内容导出
+        if tasks is None:
+            self.finish_loading()
+            tasks = list(self.model.tasks)
+        self.export_thread = threading.Thread(
+            target=self.run_export, args=(tasks, file_path, exporter_class, f'{name}任务'),
+            daemon=True)
+        self.export_thread.start()
+
+    def run_export(self, tasks, file_path, exporter_class, title):
+        """后台线程：写入导出文件，通过信号把结果交回界面线程"""
+        try:
+            with profiler.span('export_write'):
+                export_records((task.to_record() for task in tasks), file_path, exporter_class, title)
+        except Exception as e:
+            print(f"导出时出错: {e}")
+            self.exportFinished.emit(file_path, str(e))
+        else:
+            self.exportFinished.emit(file_path, '')
+
+    def export_stats(self):
+        """在后台线程中把每天的统计导出为CSV，完成后显示非模态提示"""
+        if self.export_thread is not None and self.export_thread.is_alive():
+            self.show_notice('导出', '上一次导出尚未完成')
+            return
+        self.save_stats()
+        name = QDate.currentDate().toString("yyyy-MM-dd")
+        file_path = os.path.join(os.path.expanduser(self.load_config()), f'统计-{name}.csv')
+        self.export_thread = threading.Thread(target=self.run_stats_export, args=(file_path,), daemon=True)
+        self.export_thread.start()
+
+    def run_stats_export(self, file_path):
+        """后台线程：等刚提交的计数写入后导出"""
+        try:
+            self.writer.flush()
+            self.stats.export_csv(file_path)
+        except Exception as e:
+            print(f"导出统计时出错: {e}")
+            self.exportFinished.emit(file_path, str(e))
+        else:
+            self.exportFinished.emit(file_path, '')
+
+    def on_export_finished(self, file_path, error):
+        if error:
+            self.show_notice('导出失败', f'无法导出到 {file_path}：{error}', QMessageBox.Warning)
+        else:
+            self.show_notice('导出成功', f'已导出为 {file_path}')
+
+    def show_notice(self, title, text, icon=QMessageBox.Information):
+        """非模态提示框，不阻塞事件循环"""
+        box = QMessageBox(icon, title, text, QMessageBox.Ok, self)
+        box.setAttribute(Qt.WA_DeleteOnClose)
+        box.setModal(False)
+        box.show()
+
+    def run_command(self, command):
+        """执行命令行参数或其他进程转发来的命令，返回回复"""
+        action = command.get('action', 'show')
+        if action == 'show':
+            self.show()
+            self.raise_()
+            self.activateWindow()
+        elif action == 'hide':
+            self.hide()
+        elif action == 'toggle':
+            self.run_command({'action': 'hide' if self.isVisible() else 'show'})
+        elif action == 'pin':
+            self.toggle_always_on_top()
+        elif action == 'add':
+            self.add_cell(command.get('text', ''))
+        elif action == 'ingest':
+            return self.ingest_tasks(command.get('tasks', []))
+        elif action == 'import':
+            return self.import_tasks(command.get('tasks', []), command.get('files', {}))
+        else:
+            return {'ok': False, 'error': f'未知命令: {action}'}
+        return {'ok': True}
 
     def toggle_always_on_top(self):
-        self.always_on_top = not self.always_on_top
+        self.set_always_on_top(not self.always_on_top)
+        self.show()
+
+    def set_always_on_top(self, always_on_top):
+        """修改置顶状态并保存；窗口显示时修改窗口标志会隐藏窗口，调用者需要重新显示"""
+        self.always_on_top = always_on_top
         if self.always_on_top:
             self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
-            self.pin_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #ff922b;
-                    border: none;
-                    color: white;
-                    border-radius: 12px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #fd7e14;
-                }
-            """)
         else:
             self.setWindowFlags(self.windowFlags() & ~Qt.WindowStaysOnTopHint)
-            self.pin_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #4dabf7;
-                    border: none;
-                    color: white;
-                    border-radius: 12px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #339af0;
-                }
-            """)
-        self.show()
+        set_state_property(self.pin_btn, 'pinned', self.always_on_top)
+        self.settings.setValue('pinned', self.always_on_top)
     
     def eventFilter(self, obj, event):
-        if obj == self.scroll_area.viewport() and event.type() == event.Wheel:
+        if obj is getattr(self, 'date_label', None) and event.type() == QEvent.MouseButtonRelease:
+            self.historyRequested.emit()
+            return True
+        if obj is getattr(self, 'cells_widget', None) and event.type() in (
+                QEvent.DragEnter, QEvent.DragMove, QEvent.DragLeave, QEvent.Drop):
+            return self.handle_cell_drop(event)
+        scroll_area = getattr(self, 'scroll_area', None)
+        if scroll_area is not None and obj == scroll_area.viewport() and event.type() == event.Wheel:
             # 仅处理Shift+滚轮事件，用于滚动整个区域
             if event.modifiers() == Qt.ShiftModifier:
                 # 创建一个新的滚轮事件，不带修饰键
@@ -488,97 +4344,303 @@ class StickyNote(QMainWindow):
                 return True
         return super().eventFilter(obj, event)
 
+    def edge_at(self, pos):
+        """鼠标所在的调整大小区域：右边、下边、右下角，不在边缘时为None"""
+        rect = self.rect()
+        right = pos.x() >= rect.width() - self.resize_margin
+        bottom = pos.y() >= rect.height() - self.resize_margin
+        if right and bottom:
+            return 'bottom-right'
+        if right:
+            return 'right'
+        if bottom:
+            return 'bottom'
+        return None
+
+    def update_cursor(self, edge):
+        """只在所在区域变化时设置光标"""
+        if edge == self.cursor_edge:
+            return
+        self.cursor_edge = edge
+        cursors = {'right': Qt.SizeHorCursor, 'bottom': Qt.SizeVerCursor, 'bottom-right': Qt.SizeFDiagCursor}
+        self.setCursor(cursors.get(edge, Qt.ArrowCursor))
+
     def mousePressEvent(self, event):
-        # self.rect() 窗口大小
-        # self.pos() 窗口位置
         if event.button() == Qt.LeftButton:
-            # 获取窗口边缘
-            rect = self.rect()
-            pos = event.pos()
-            # 主要检查右边和下边的调整区域
-            if pos.x() >= rect.width() - self.resize_margin:  # 右边缘
-                if pos.y() >= rect.height() - self.resize_margin:  # 右下角
-                    self.resize_edge = 'bottom-right'
-                    self.resizing = True
-                else:  # 右边
-                    self.resize_edge = 'right'
-                    self.resizing = True
-            elif pos.y() >= rect.height() - self.resize_margin:  # 下边缘
-                self.resize_edge = 'bottom'
-                self.resizing = True
-            else:
-                self.resizing = False
-                self.dragPos = event.globalPos()  # 初始化拖动位置
-            
-            # 记录初始大小和位置
-            if self.resizing:
-                self.resize_start_pos = event.globalPos() # 确保拖动位置被初始化
-                self.resize_start_geometry = self.geometry() 
-            else:
-                self.dragPos = event.globalPos()  # 确保拖动位置被初始化
+            self.resize_edge = self.edge_at(event.pos())
+            self.resizing = self.resize_edge is not None
+            self.press_pos = event.globalPos()
+            self.press_geometry = self.geometry()
+            self.pointer_pos = None
+            screen = self.windowHandle().screen() if self.windowHandle() else QApplication.primaryScreen()
+            refresh_rate = screen.refreshRate() if screen is not None else 60
+            self.frame_timer.setInterval(max(1, int(1000 / (refresh_rate or 60))))
 
     def mouseMoveEvent(self, event):
-        # 获取鼠标位置和窗口大小
-        pos = event.pos()
-        rect = self.rect()
-        
-        # 更新鼠标光标
-        if pos.x() >= rect.width() - self.resize_margin:  # 右边缘
-            if pos.y() >= rect.height() - self.resize_margin:  # 右下角
-                self.setCursor(Qt.SizeFDiagCursor)  # 对角调整光标
-            else:
-                self.setCursor(Qt.SizeHorCursor)  # 水平调整光标
-        elif pos.y() >= rect.height() - self.resize_margin:  # 下边缘
-            self.setCursor(Qt.SizeVerCursor)  # 垂直调整光标
-        else:
-            self.setCursor(Qt.ArrowCursor)  # 默认光标
-        
-        if self.resizing and event.buttons() == Qt.LeftButton:
-            # 计算鼠标移动的距离
-            diff = event.globalPos() - self.resize_start_pos
-            new_geo = self.resize_start_geometry
-            
-            # 根据拖动边缘调整窗口大小
-            if self.resize_edge == 'right':
-                new_width = new_geo.width() + diff.x()
-                if new_width >= self.minimumWidth():
-                    new_geo.setWidth(new_width)
-            elif self.resize_edge == 'bottom':
-                new_height = new_geo.height() + diff.y()
-                if new_height >= self.minimumHeight():
-                    new_geo.setHeight(new_height)
-            elif self.resize_edge == 'bottom-right':
-                new_width = new_geo.width() + diff.x()
-                new_height = new_geo.height() + diff.y()
-                if new_width >= self.minimumWidth() and new_height >= self.minimumHeight():
-                    new_geo.setWidth(new_width)
-                    new_geo.setHeight(new_height)
-            
-            # 应用新的几何信息
-            self.setGeometry(new_geo)
-        elif event.buttons() == Qt.LeftButton and not self.resizing and self.dragPos is not None:
-            # 移动窗口
-            self.move(self.pos() + event.globalPos() - self.dragPos)
-            self.dragPos = event.globalPos()
+        if self.press_pos is None or not event.buttons() & Qt.LeftButton:
+            self.update_cursor(self.edge_at(event.pos()))
+            return
+        # 只记下最新位置：上一帧之后的第一个事件立即应用，其余的合并到下一帧
+        self.pointer_pos = event.globalPos()
+        if not self.frame_timer.isActive():
+            self.on_pointer_frame()
+
+    def on_pointer_frame(self):
+        if self.pointer_pos is None:
+            return
+        self.apply_pointer()
+        self.frame_timer.start()
+
+    @profiler.timed('window_frame')
+    def apply_pointer(self):
+        """按最新的鼠标位置移动窗口或调整大小，位置都相对于按下时计算"""
+        diff = self.pointer_pos - self.press_pos
+        self.pointer_pos = None
+        geometry = QRect(self.press_geometry)
+        if not self.resizing:
+            self.move(geometry.topLeft() + diff)
+            return
+        if self.resize_edge in ('right', 'bottom-right'):
+            geometry.setWidth(max(self.minimumWidth(), geometry.width() + diff.x()))
+        if self.resize_edge in ('bottom', 'bottom-right'):
+            geometry.setHeight(max(self.minimumHeight(), geometry.height() + diff.y()))
+        self.pause_cell_layout()
+        self.setGeometry(geometry)
+        self.settle_timer.start()
+
+    def pause_cell_layout(self):
+        """调整大小期间固定单元格容器的大小，避免每一帧都重新排列所有单元格"""
+        if self.list_mode != 'virtual' and self.scroll_area.widgetResizable():
+            self.scroll_area.setWidgetResizable(False)
+
+    def resume_cell_layout(self):
+        self.settle_timer.stop()
+        if self.list_mode != 'virtual' and not self.scroll_area.widgetResizable():
+            with profiler.span('layout'):
+                self.scroll_area.setWidgetResizable(True)
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.press_pos is not None:
+            self.frame_timer.stop()
+            if self.pointer_pos is not None:
+                self.apply_pointer()
+            self.resume_cell_layout()
+            if self.geometry() != self.press_geometry:
+                self.settings.setValue('geometry', self.saveGeometry())
             self.resizing = False
             self.resize_edge = None
-            self.dragPos = None  # 重置拖动位置
-            # 重置光标
-            self.setCursor(Qt.ArrowCursor)
-
-    def enterEvent(self, event):
-        self.setCursor(Qt.ArrowCursor)
+            self.press_pos = None
+            self.update_cursor(self.edge_at(event.pos()))
 
     def leaveEvent(self, event):
-        self.setCursor(Qt.ArrowCursor)
+        if self.press_pos is None:
+            self.update_cursor(None)
+
+class ReminderScheduler(QObject):
+    """提醒调度：所有任务的提醒和截止时间放在一个最小堆中，只用一个QTimer等待最早的一项
+
+    安排和推迟提醒是O(log n)的堆插入；取消只从字典中删除，堆中失效的条目在到达堆顶时丢弃。
+    没有到期的提醒时不会唤醒界面线程。
+    """
+    reminderDue = pyqtSignal(object, str)  # 任务, 'remind'（提醒时间到）或'due'（截止时间到）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.heap = []  # (时间, 序号, 类型, 任务)
+        self.scheduled = {}  # (任务ID, 类型) -> 时间；与之不一致的堆条目已失效
+        self.counter = 0
+        self.armed_at = None  # 定时器到期的时间
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.fire_due)
+
+    def schedule(self, task):
+        """按任务当前的提醒和截止时间安排；已完成的任务取消全部提醒
+
+        截止时间只在尚未到达时安排，启动时不会重复通知已经过期的任务。
+        """
+        if task.completed:
+            self.cancel(task.id)
+            return
+        self.push(task, 'remind', task.remind_at)
+        due_at = task.due_at
+        if due_at is not None and due_at <= time.time() and self.scheduled.get((task.id, 'due')) != due_at:
+            due_at = None
+        self.push(task, 'due', due_at)
+
+    def push(self, task, kind, when):
+        key = (task.id, kind)
+        if when is None:
+            self.scheduled.pop(key, None)
+            return
+        if self.scheduled.get(key) == when:
+            return
+        self.scheduled[key] = when
+        self.counter += 1
+        heapq.heappush(self.heap, (when, self.counter, kind, task))
+        if len(self.heap) > 2 * len(self.scheduled) + 64:
+            self.rebuild()
+        self.arm()
 
-def main():
+    def cancel(self, task_id):
+        self.scheduled.pop((task_id, 'remind'), None)
+        self.scheduled.pop((task_id, 'due'), None)
+
+    def rebuild(self):
+        """失效条目太多时重建堆"""
+        self.heap = [entry for entry in self.heap
+                     if self.scheduled.get((entry[3].id, entry[2])) == entry[0]]
+        heapq.heapify(self.heap)
+
+    def arm(self):
+        """让定时器在最早的有效条目到期；已经更早到期时不重新设置"""
+        while self.heap and self.scheduled.get((self.heap[0][3].id, self.heap[0][2])) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            self.timer.stop()
+            self.armed_at = None
+            return
+        when = self.heap[0][0]
+        if self.timer.isActive() and self.armed_at <= when:
+            return
+        delay_ms = min(int(max(0, when - time.time()) * 1000), REMINDER_MAX_WAIT_MS)
+        self.timer.start(delay_ms)
+        self.armed_at = time.time() + delay_ms / 1000
+
+    def fire_due(self):
+        self.armed_at = None
+        now = time.time()
+        while self.heap and self.heap[0][0] <= now + 0.5:
+            when, _, kind, task = heapq.heappop(self.heap)
+            if self.scheduled.get((task.id, kind)) != when:
+                continue
+            del self.scheduled[(task.id, kind)]
+            self.reminderDue.emit(task, kind)
+        self.arm()
+
+
+class HotkeyDispatcher(QObject):
+    """全局快捷键：keyboard库在自己的钩子线程中回调，回调只发出信号，
+    由Qt排队交给界面线程执行，钩子线程不接触任何控件
+
+    同一动作尚未执行时再次触发（例如按住不放）会被忽略，界面线程忙时不会积压。
+    """
+    triggered = pyqtSignal(str, float)  # 动作, 按下的时间 (perf_counter)
+
+    def __init__(self, note):
+        super().__init__()
+        self.note = note
+        self.hooks = []
+        self.pending = set()  # 已发出、尚未执行的动作
+        self.lock = threading.Lock()
+        self.triggered.connect(self.dispatch, Qt.QueuedConnection)
+
+    def register(self, bindings):
+        """注册快捷键，返回成功注册的数量；之前注册的会先移除"""
+        try:
+            import keyboard
+        except Exception as e:
+            print(f"注册全局快捷键失败: {e!r}")
+            return 0
+        self.unregister()
+        for action, combo in bindings.items():
+            if action not in HOTKEY_ACTIONS:
+                print(f"未知的快捷键动作: {action}")
+                continue
+            try:
+                self.hooks.append(keyboard.add_hotkey(
+                    str(combo), lambda action=action: self.post(action), suppress=True))
+            except Exception as e:
+                # 例如组合键写错，或Linux下没有权限访问输入设备，便签本身仍可使用
+                print(f"注册全局快捷键 {combo} 失败: {e!r}")
+        return len(self.hooks)
+
+    def unregister(self):
+        if not self.hooks:
+            return
+        import keyboard
+        for hook in self.hooks:
+            try:
+                keyboard.remove_hotkey(hook)
+            except (KeyError, ValueError):
+                pass
+        self.hooks = []
+
+    def post(self, action):
+        """在keyboard的钩子线程中调用，只做记录和发信号，尽快返回"""
+        pressed = time.perf_counter()
+        with self.lock:
+            if action in self.pending:
+                return
+            self.pending.add(action)
+        self.triggered.emit(action, pressed)
+
+    def dispatch(self, action, pressed):
+        """在界面线程中执行动作；窗口显示出来后由paintEvent记录按键到可见的延迟"""
+        with self.lock:
+            self.pending.discard(action)
+        profiler.record('hotkey_queue', (time.perf_counter() - pressed) * 1000)
+        with profiler.span('hotkey'):
+            self.note.run_command({'action': action})
+        if self.note.isVisible():
+            self.note.hotkey_pressed = pressed
+            self.note.update()
+
+
+class InstanceServer(QLocalServer):
+    """单实例服务：后续启动的进程或其他程序连接进来，每发送一行JSON命令收到一行JSON回复
+
+    例如 {"action": "ingest", "tasks": [{"text": "..."}, ...]} 把一批任务一次性加入列表。
+    """
+
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.setSocketOptions(QLocalServer.UserAccessOption)  # 只允许当前用户连接
+        self.newConnection.connect(self.accept_connections)
+
+    def start(self, address, command):
+        """开始监听；如果另一个实例刚刚启动，把命令转发给它并返回False"""
+        if self.listen(address):
+            return True
+        if send_command(command) is not None:
+            return False
+        # 上次异常退出留下的套接字文件
+        QLocalServer.removeServer(address)
+        if not self.listen(address):
+            print(f"无法启动单实例服务: {self.errorString()}")
+        return True
+
+    def accept_connections(self):
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read_command(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read_command(self, socket):
+        # 一条命令可能分多次到达，收到完整的一行才处理；连接由客户端关闭
+        while socket.canReadLine():
+            try:
+                reply = self.handler(json.loads(bytes(socket.readLine()).decode('utf-8')))
+            except Exception as e:
+                reply = {'ok': False, 'error': str(e)}
+            socket.write((json.dumps(reply, ensure_ascii=False) + '\n').encode('utf-8'))
+            socket.flush()
+
+
+def main(command=None):
+    if command is None:
+        command = parse_args(sys.argv[1:])
     app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)  
     
+    # 单实例：已有实例在运行时，命令在导入Qt之前就已转发（见文件开头），
+    # 这里处理两个进程几乎同时启动的情况
+    server = InstanceServer(lambda command: note.run_command(command))
+    if not server.start(instance_address(), command):
+        return
+    
     # 设置应用程序图标
     icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'icon.ico')
     
@@ -603,11 +4665,60 @@ def main():
     hide_action.triggered.connect(note.hide)
     tray_menu.addAction(hide_action)
     
+    # 主题切换菜单
+    theme_menu = tray_menu.addMenu("主题")
+    for theme_name, theme_title in (('warm', '暖色'), ('dark', '深色')):
+        theme_action = QAction(theme_title, theme_menu)
+        theme_action.triggered.connect(lambda checked, name=theme_name: note.apply_theme(name))
+        theme_menu.addAction(theme_action)
+    
+    # 推迟最近的提醒
+    snooze_action = QAction("稍后提醒", tray_menu)
+    snooze_action.triggered.connect(lambda: note.snooze_reminders())
+    tray_menu.addAction(snooze_action)
+    tray_menu.aboutToShow.connect(lambda: snooze_action.setEnabled(bool(note.fired_reminders)))
+    
+    # 归档窗口
+    archive_window = ArchiveWindow(note)
+    archive_action = QAction("归档", tray_menu)
+    archive_action.triggered.connect(archive_window.show)
+    tray_menu.addAction(archive_action)
+    
+    # 历史窗口：托盘菜单或单击日期标签打开
+    history_window = HistoryWindow(note)
+    history_action = QAction("历史", tray_menu)
+    history_action.triggered.connect(history_window.show)
+    tray_menu.addAction(history_action)
+    note.historyRequested.connect(history_window.show)
+    note.historyRequested.connect(history_window.raise_)
+    
+    # 统计窗口
+    stats_window = StatsWindow(note)
+    task_stats_action = QAction("统计", tray_menu)
+    task_stats_action.triggered.connect(stats_window.show)
+    tray_menu.addAction(task_stats_action)
+    
+    # 性能统计窗口
+    performance_window = PerformanceWindow()
+    stats_action = QAction("性能统计", tray_menu)
+    stats_action.triggered.connect(performance_window.show)
+    tray_menu.addAction(stats_action)
+    
     # 退出程序动作
     exit_action = QAction("退出", tray_menu)
     def exit_app():
-        # 在退出前保存笔记
-        note.save_notes()
+        # 先停止接收其他进程的命令，再在退出前保存笔记
+        server.close()
+        note.commit_editor()
+        note.save_notes(wait=True)
+        note.take_snapshot(wait=True)
+        note.history.close()
+        note.writer.close()
+        note.stats.close()
+        if note.sync is not None:
+            note.sync.close()
+        note.settings.sync()
+        profiler.flush_trace()
         app.quit()
     exit_action.triggered.connect(exit_app)
     tray_menu.addAction(exit_action)
@@ -616,23 +4727,30 @@ def main():
     tray_icon.setContextMenu(tray_menu)
     tray_icon.show()
     
-    def toggle_visibility():
-        if note.isVisible():
-            note.hide()
+    # 提醒通过托盘图标通知，单击通知显示便签
+    def show_reminder(title, text):
+        if tray_icon.isVisible() and QSystemTrayIcon.supportsMessages():
+            tray_icon.showMessage(title, text, QSystemTrayIcon.Information, 10000)
         else:
-            note.show()
-            note.activateWindow()  
-    
-    def toggle_pin_state():
-        # 直接调用现有的置顶方法
-        note.toggle_always_on_top()
+            note.show_notice(title, text)
+    note.reminderShown.connect(show_reminder)
+    tray_icon.messageClicked.connect(lambda: note.run_command({'action': 'show'}))
     
-    # 创建应用实例后再注册快捷键
-    keyboard.add_hotkey('ctrl+alt+q', toggle_visibility, suppress=True)
-    keyboard.add_hotkey('ctrl+alt+w', toggle_pin_state, suppress=True)
+    # 全局快捷键：在config.yaml的hotkeys中配置，未配置时使用默认绑定
+    hotkeys = HotkeyDispatcher(note)
+    def register_hotkeys():
+        # 导入keyboard并安装全局钩子较慢，推迟到窗口首次绘制之后
+        bindings = note.read_config().get('hotkeys') or HOTKEYS
+        if not isinstance(bindings, dict):
+            print("hotkeys配置应为 动作: 组合键 的映射，使用默认快捷键")
+            bindings = HOTKEYS
+        hotkeys.register(bindings)
     
     note.show()  
+    if command['action'] != 'show':
+        note.run_command(command)
+    QTimer.singleShot(0, register_hotkeys)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
-    main()
+    main(COMMAND)
@@ -0,0 +1,1166 @@
+"""便签性能测试
+
+在无界面的offscreen平台上运行，例如：
+
+    python benchmark.py style --cells 500
+    python benchmark.py cells --cells 2000
+    python benchmark.py startup --tasks 1000
+    python benchmark.py export --tasks 10000
+    python benchmark.py suite --output results.json --compare baseline.json
+    python benchmark.py ingest --tasks 5000
+    python benchmark.py bulk --tasks 1000 --selected 200
+    python benchmark.py hotkey --presses 200
+    python benchmark.py drag --tasks 300
+    python benchmark.py reminders --tasks 10000
+    python benchmark.py reorder --tasks 5000
+    python benchmark.py sync --tasks 10000 --edits 50
+    python benchmark.py history --tasks 10000 --days 60
+    python benchmark.py import --files 1000 --tasks-per-file 50
+    python benchmark.py views --tasks 10000
+    python benchmark.py stats --tasks 10000 --days 3650
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import (QT_VERSION_STR, QEvent, QItemSelection, QItemSelectionModel, QObject, QPoint,
+                          QRect, QSize, Qt)
+from PyQt5.QtGui import QMouseEvent
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
+
+import StickyTasks
+
+
+# 改用应用级样式表之前，中心部件和单元格容器上的样式，会作用到所有子控件
+LEGACY_CENTRAL_STYLE = """
+    QWidget {
+        background: qlineargradient(
+            x1: 0, y1: 0,
+            x2: 1, y2: 1,
+            stop: 0 #ffd8a8,
+            stop: 0.3 #ffe8cc,
+            stop: 0.6 #fff3e0,
+            stop: 1 #fff9db
+        );
+        border-radius: 10px;
+    }
+"""
+LEGACY_CONTAINER_STYLE = """
+    QWidget {
+        background: transparent;
+    }
+"""
+# 每个单元格在自己的控件上设置的样式
+LEGACY_DELETE_STYLE = """
+    QPushButton {
+        background-color: #ff6b6b;
+        border: none;
+        border-radius: 12px;
+        color: white;
+        font-size: 16px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #ff5252;
+    }
+"""
+LEGACY_COMPLETE_STYLE = """
+    QPushButton {
+        background-color: #51cf66;
+        border: none;
+        border-radius: 12px;
+        color: white;
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #40c057;
+    }
+"""
+LEGACY_EDITOR_STYLE = """
+    QTextEdit {{
+        background-color: {};
+        border: 1px solid #ddd;
+        border-radius: 8px;
+        padding: 5px;
+    }}
+"""
+
+
+def legacy_toggle(cell):
+    """旧版toggle_complete：每次切换都生成并解析新的样式表"""
+    cell.is_completed = not cell.is_completed
+    color = '#aaaaaa' if cell.is_completed else 'white'
+    cell.text_edit.setStyleSheet(LEGACY_EDITOR_STYLE.format(color))
+    cell.text_edit.setReadOnly(cell.is_completed)
+
+
+def measure_cells(app, count, legacy):
+    """创建count个单元格并显示，然后全部切换为已完成，返回两步各自的耗时"""
+    # 与主窗口相同的层级：中心部件 -> 单元格容器 -> 单元格
+    central = QWidget()
+    central.setObjectName('central')
+    container = QWidget(central)
+    container.setObjectName('cellsContainer')
+    QVBoxLayout(central).addWidget(container)
+    if legacy:
+        central.setStyleSheet(LEGACY_CENTRAL_STYLE)
+        container.setStyleSheet(LEGACY_CONTAINER_STYLE)
+    layout = QVBoxLayout(container)
+    start = time.perf_counter()
+    for i in range(count):
+        cell = StickyTasks.CellWidget(StickyTasks.TaskItem(f'任务 {i}'))
+        if legacy:
+            cell.delete_btn.setStyleSheet(LEGACY_DELETE_STYLE)
+            cell.complete_btn.setStyleSheet(LEGACY_COMPLETE_STYLE)
+            cell.text_edit.setStyleSheet(LEGACY_EDITOR_STYLE.format('white'))
+        layout.addWidget(cell)
+    central.show()
+    app.processEvents()
+    create_time = time.perf_counter() - start
+
+    cells = [layout.itemAt(i).widget() for i in range(layout.count())]
+    start = time.perf_counter()
+    for cell in cells:
+        if legacy:
+            legacy_toggle(cell)
+        else:
+            cell.toggle_complete()
+    app.processEvents()
+    toggle_time = time.perf_counter() - start
+    central.deleteLater()
+    app.processEvents()
+    return create_time, toggle_time
+
+
+def run_style(app, args):
+    results = {}
+    app.setStyleSheet('')
+    measure_cells(app, 20, legacy=True)  # 预热
+    results['per-widget'] = measure_cells(app, args.cells, legacy=True)
+    app.setStyleSheet(StickyTasks.build_stylesheet('warm'))
+    measure_cells(app, 20, legacy=False)
+    results['app-level'] = measure_cells(app, args.cells, legacy=False)
+
+    print(f'{args.cells} 个单元格，每个单元格的平均耗时 (ms)')
+    print(f'{"样式方式":<12}{"创建+显示":>12}{"切换完成":>12}')
+    for name, (create_time, toggle_time) in results.items():
+        print(f'{name:<12}{create_time / args.cells * 1000:>12.3f}'
+              f'{toggle_time / args.cells * 1000:>12.3f}')
+
+
+def current_rss_kb():
+    """进程当前的常驻内存 (KB)，无法获取时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / 1024
+
+
+def measure_cell_class(app, cell_class, count):
+    """创建count个单元格并显示，返回每个单元格的创建耗时 (ms)、内存 (KB) 和QObject数量"""
+    import gc
+    central = QWidget()
+    central.setObjectName('central')
+    container = QWidget(central)
+    container.setObjectName('cellsContainer')
+    QVBoxLayout(central).addWidget(container)
+    layout = QVBoxLayout(container)
+    central.resize(400, 500)
+    gc.collect()
+    rss = current_rss_kb()
+    start = time.perf_counter()
+    for i in range(count):
+        layout.addWidget(cell_class(StickyTasks.TaskItem(f'任务 {i} ' * 5)))
+    central.show()
+    app.processEvents()
+    create_time = time.perf_counter() - start
+    memory = current_rss_kb() - rss if rss is not None else None
+    cell = layout.itemAt(0).widget()
+    objects = len(cell.findChildren(QObject)) + 1
+    central.deleteLater()
+    app.processEvents()
+    return create_time / count * 1000, memory / count if memory is not None else None, objects
+
+
+def run_cells(app, args):
+    """比较完整控件单元格与自绘的轻量单元格"""
+    app.setStyleSheet(StickyTasks.build_stylesheet('warm'))
+    print(f'{args.cells} 个单元格，每个单元格的平均值')
+    print(f'{"单元格":<12}{"创建+显示 (ms)":>16}{"内存 (KB)":>12}{"QObject":>10}')
+    for cell_class in (StickyTasks.CellWidget, StickyTasks.LiteCell):
+        measure_cell_class(app, cell_class, 20)  # 预热
+        create_ms, memory_kb, objects = measure_cell_class(app, cell_class, args.cells)
+        memory = f'{memory_kb:>12.2f}' if memory_kb is not None else f'{"-":>12}'
+        print(f'{cell_class.__name__:<12}{create_ms:>16.3f}{memory}{objects:>10}')
+
+
+# 在子进程中启动便签窗口，输出各阶段耗时。计时起点是父进程启动子进程的时刻
+STARTUP_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+import StickyTasks
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication
+imported = time.perf_counter()
+app = QApplication(sys.argv)
+note = StickyTasks.StickyNote()
+constructed = time.perf_counter()
+result = {
+    'python': time.time() - float(os.environ['BENCHMARK_SPAWN_TIME']) - (constructed - start),
+    'import': imported - start,
+    'construct': constructed - imported,
+}
+
+def finish():
+    if note.note_loader is not None:
+        QTimer.singleShot(10, finish)
+        return
+    result['loaded'] = time.perf_counter() - start
+    result['rows'] = note.model.rowCount()
+    note.take_snapshot(wait=True)
+    note.history.close()
+    note.writer.close()
+    print(json.dumps(result))
+    app.quit()
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and 'first_paint' not in result:
+            result['first_paint'] = time.perf_counter() - start
+            QTimer.singleShot(0, finish)
+        return False
+
+paint_filter = FirstPaint()
+note.installEventFilter(paint_filter)
+sys.exit(app.exec_())
+"""
+
+
+@contextmanager
+def temporary_home(path):
+    """把用户目录临时指向path，存储后端会在其中创建数据文件"""
+    saved = {key: os.environ.get(key) for key in ('HOME', 'USERPROFILE')}
+    os.environ['HOME'] = os.environ['USERPROFILE'] = path
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def shutdown_note(note):
+    """像退出程序时一样关闭便签：等待当天的快照和剩余的修改写完，关闭各数据库，之后才能删除临时用户目录"""
+    note.snapshot_timer.stop()
+    note.take_snapshot(wait=True)
+    note.history.close()
+    note.writer.close()
+    note.stats.close()
+    if note.sync is not None:
+        note.sync.close()
+
+
+@contextmanager
+def benchmark_home(config=None, path=None):
+    """在临时用户目录中运行：写入config.yaml并进入该目录，结束时恢复用户目录和工作目录并删除临时目录；
+    给出path时使用该目录（不存在时创建），由调用方负责删除"""
+    home = path or tempfile.mkdtemp()
+    os.makedirs(home, exist_ok=True)
+    if config is not None:
+        with open(os.path.join(home, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.write(config)
+    cwd = os.getcwd()
+    try:
+        with temporary_home(home):
+            os.chdir(home)
+            yield home
+    finally:
+        os.chdir(cwd)
+        if path is None:
+            shutil.rmtree(home, ignore_errors=True)
+
+
+@contextmanager
+def open_note():
+    """在当前用户目录中创建并加载便签，结束时关闭并删除窗口"""
+    note = StickyTasks.StickyNote()
+    note.finish_loading()
+    try:
+        yield note
+    finally:
+        shutdown_note(note)
+        note.close()
+        note.deleteLater()
+        QApplication.processEvents()
+
+
+@contextmanager
+def benchmark_note(config):
+    """用config在临时用户目录中创建便签，见benchmark_home和open_note"""
+    with benchmark_home(config), open_note() as note:
+        yield note
+
+
+def seed_store(home, storage, count):
+    """在home中写入count个任务，约三分之一已完成"""
+    with temporary_home(home):
+        store = StickyTasks.open_store(storage)
+    tasks = [StickyTasks.TaskItem(f'任务 {i}：' + '测试内容 ' * (i % 7 + 1), completed=i % 3 == 0)
+             for i in range(count)]
+    if store.incremental:
+        store.append([(task.id, task.to_record()) for task in tasks])
+    else:
+        store.save([task.to_record() for task in tasks])
+    store.close()
+
+
+def import_breakdown(repo_dir, env):
+    """用-X importtime统计导入StickyTasks时各顶层模块的累计耗时（秒）"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import StickyTasks'],
+                            cwd=repo_dir, env=env, capture_output=True, text=True).stderr
+    # 子模块先于父模块输出，每层缩进两格；只保留StickyTasks本身和它直接导入的模块
+    children = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name.strip() == 'StickyTasks':
+                return dict(children, StickyTasks=int(cumulative) / 1e6)
+            children = {}
+    return {}
+
+
+def launch_app(repo_dir, home, env, timeout=60):
+    """以普通方式运行StickyTasks.py（经过main()，创建托盘菜单和各窗口），返回到实例开始回复命令的秒数
+
+    实例只在事件循环开始后才回复转发的命令，所以收到回复说明main()中的初始化都已完成；
+    进程提前退出时打印它的错误输出并以非零状态退出。
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(repo_dir, 'StickyTasks.py'), 'hide'], cwd=home,
+                               env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        with temporary_home(home):
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    print(f'StickyTasks.py 启动失败（退出码 {process.returncode}）:\n{process.stderr.read()}')
+                    sys.exit(1)
+                if StickyTasks.send_command({'action': 'hide'}) is not None:
+                    return time.perf_counter() - start
+                time.sleep(0.05)
+        print(f'StickyTasks.py 在 {timeout} 秒内没有开始回复命令')
+        sys.exit(1)
+    finally:
+        process.kill()
+        process.communicate()
+
+
+def run_startup(app, args):
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as home:
+        seed_store(home, args.storage, args.tasks)
+        with open(os.path.join(home, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.write(f'list_mode: {args.list_mode}\nstorage: {args.storage}\n')
+        env = dict(os.environ, HOME=home, USERPROFILE=home,
+                   PYTHONPATH=repo_dir + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+        imports = [import_breakdown(repo_dir, env) for _ in range(args.runs)]
+        runs = []
+        for _ in range(args.runs):
+            env['BENCHMARK_SPAWN_TIME'] = repr(time.time())
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=home, env=env,
+                                    capture_output=True, text=True, timeout=300)
+            if output.returncode != 0:
+                print(output.stderr)
+                sys.exit(1)
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        # 上面只创建StickyNote；再完整运行一次程序，检查main()中的托盘菜单和窗口能正常创建
+        launch_time = launch_app(repo_dir, home, env)
+
+    print(f'导入StickyTasks的耗时 (ms，{args.runs} 次的中位数)')
+    names = sorted(imports[0], key=lambda name: -imports[0][name])
+    for name in names:
+        values = [modules.get(name, 0) for modules in imports]
+        print(f'{name:<24}{statistics.median(values) * 1000:>10.1f}')
+
+    print(f'\n启动到首次绘制 ({args.tasks} 个任务，{args.storage}，{args.list_mode}；'
+          f'ms，{args.runs} 次的中位数)')
+    labels = (('python', '解释器启动'), ('import', '导入模块'), ('construct', '创建窗口'),
+              ('first_paint', '首次绘制'), ('loaded', '全部加载'))
+    for key, label in labels:
+        value = statistics.median(run[key] for run in runs)
+        if key in ('first_paint', 'loaded'):
+            # 从导入开始计时，加上解释器启动时间得到进程启动后的总耗时
+            value += statistics.median(run['python'] for run in runs)
+        print(f'{label:<12}{value * 1000:>10.1f}')
+    print(f'加载行数    {runs[0]["rows"]:>10}')
+    print(f'完整启动    {launch_time * 1000:>10.1f}  (运行StickyTasks.py到开始回复命令)')
+
+
+def legacy_export(tasks, path, date_str):
+    """旧版export_markdown：用+=拼接整个文件内容，再在界面线程中写入"""
+    content = "# {}任务\n\n".format(date_str)
+    for i, task in enumerate(tasks):
+        text_content = task.text.strip()
+        if text_content:
+            content += f"## 任务 {i+1}\n\n{text_content}\n\n"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def run_export(app, args):
+    tasks = [StickyTasks.TaskItem(f'任务 {i}：' + '导出内容 ' * (i % 20 + 1), completed=i % 3 == 0)
+             for i in range(args.tasks)]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        legacy_export(tasks, os.path.join(directory, 'legacy.md'), '2024-01-01')
+        rows.append(('legacy md', time.perf_counter() - start, 0.0))
+        for extension, exporter_class in StickyTasks.EXPORTERS.items():
+            # 与StickyNote.export_tasks相同：界面线程只复制任务列表
+            start = time.perf_counter()
+            snapshot = list(tasks)
+            blocking = time.perf_counter() - start
+            start = time.perf_counter()
+            StickyTasks.export_records((task.to_record() for task in snapshot),
+                                       os.path.join(directory, f'export.{extension}'),
+                                       exporter_class, '2024-01-01任务')
+            rows.append((extension, blocking, time.perf_counter() - start))
+
+    print(f'导出 {args.tasks} 个任务的耗时 (ms)')
+    print(f'{"格式":<12}{"界面线程":>12}{"后台线程":>12}')
+    for name, blocking, background in rows:
+        print(f'{name:<12}{blocking * 1000:>12.1f}{background * 1000:>12.1f}')
+
+
+SUITE_DATASETS = (100, 1000, 10000)
+SUITE_REPEAT = 50  # 单项操作重复的次数，结果取平均值
+
+
+def peak_rss_kb():
+    """进程的峰值常驻内存 (KB)，无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == 'darwin' else peak
+
+
+def mean_ms(func, repeat, app):
+    """调用func repeat次并处理事件，返回每次的平均耗时 (ms)"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+        app.processEvents()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run_suite_dataset(app, args):
+    """在一个独立进程中测量一个数据集，峰值内存不受其他数据集影响"""
+    results = {}
+    with benchmark_home() as home:
+        seed_store(home, args.storage, args.tasks)
+        with open(os.path.join(home, 'config.yaml'), 'w', encoding='utf-8') as f:
+            f.write(f'list_mode: {args.list_mode}\nstorage: {args.storage}\nexport_path: {home}\n')
+        app.processEvents()
+        rss_before = peak_rss_kb()
+
+        start = time.perf_counter()
+        with open_note() as note:
+            app.processEvents()
+            results['load_notes_ms'] = (time.perf_counter() - start) * 1000
+            if rss_before is not None:
+                results['rss_per_task_kb'] = (peak_rss_kb() - rss_before) / args.tasks
+
+            repeat = min(SUITE_REPEAT, args.tasks)
+            if args.list_mode == 'virtual':
+                def toggle(i):
+                    index = note.model.index(i)
+                    note.model.setData(index, not index.data(StickyTasks.TaskModel.CompletedRole),
+                                       StickyTasks.TaskModel.CompletedRole)
+
+                def delete(i):
+                    note.delete_row(0)
+            else:
+                def toggle(i):
+                    note.cells_layout.itemAt(i).widget().toggle_complete()
+
+                def delete(i):
+                    note.create_delete_handler(note.cells_layout.itemAt(0).widget())()
+
+            def save(i):
+                task = note.model.tasks[i]
+                task.text += '.'
+                note.model.task_updated(task, [StickyTasks.Qt.EditRole])
+                note.save_notes(wait=True)
+
+            def export(i):
+                note.export_tasks()
+                note.export_thread.join()
+
+            results['add_cell_ms'] = mean_ms(lambda i: note.add_cell(f'新任务 {i}'), repeat, app)
+            results['toggle_complete_ms'] = mean_ms(toggle, repeat, app)
+            results['save_notes_ms'] = mean_ms(save, repeat, app)
+            results['delete_ms'] = mean_ms(delete, repeat, app)
+            results['export_ms'] = mean_ms(export, 3, app)
+            note.save_notes(wait=True)
+    print(json.dumps(results))
+
+
+def compare_results(results, baseline, threshold, min_delta):
+    """与基准结果比较，返回超出阈值的退化项；差值小于min_delta的视为测量噪声"""
+    regressions = []
+    for dataset, metrics in results.items():
+        for name, value in metrics.items():
+            old = baseline.get(dataset, {}).get(name)
+            if old and value > old * (1 + threshold) and value - old >= min_delta:
+                regressions.append((dataset, name, old, value))
+    return regressions
+
+
+def run_suite(app, args):
+    results = {}
+    for count in args.datasets:
+        command = [sys.executable, os.path.abspath(__file__), 'suite-dataset', '--tasks', str(count),
+                   '--storage', args.storage, '--list-mode', args.list_mode]
+        output = subprocess.run(command, capture_output=True, text=True, timeout=1800)
+        if output.returncode != 0:
+            print(output.stderr)
+            sys.exit(1)
+        results[str(count)] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    names = list(results[str(args.datasets[0])])
+    print(f'{args.storage}，{args.list_mode}；耗时为每次操作的平均值')
+    print(f'{"指标":<22}' + ''.join(f'{count:>12}' for count in args.datasets))
+    for name in names:
+        print(f'{name:<22}' + ''.join(f'{results[str(count)].get(name, 0):>12.3f}'
+                                      for count in args.datasets))
+
+    if args.output:
+        report = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'platform': platform.platform(),
+            'storage': args.storage,
+            'list_mode': args.list_mode,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare_results(results, baseline, args.threshold, args.min_delta)
+        for dataset, name, old, value in regressions:
+            print(f'退化: {dataset} 个任务 {name} {old:.3f} -> {value:.3f}')
+        if regressions:
+            sys.exit(1)
+        print(f'与 {args.compare} 相比没有超过 {args.threshold:.0%} 的退化')
+
+
+def run_ingest(app, args):
+    values = [{'text': f'导入任务 {i}', 'completed': i % 5 == 0} for i in range(args.tasks)]
+    print(f'批量导入 {args.tasks} 个任务的耗时 (ms)')
+    for list_mode in ('virtual', 'widgets'):
+        with benchmark_note(f'list_mode: {list_mode}\n') as note:
+            app.processEvents()
+            start = time.perf_counter()
+            note.ingest_tasks(values)
+            app.processEvents()
+            ingest_time = time.perf_counter() - start
+            start = time.perf_counter()
+            note.writer.flush()
+            write_time = time.perf_counter() - start
+            # 单元格模式先创建一屏单元格，其余的在事件循环中分批创建
+            start = time.perf_counter()
+            while list_mode != 'virtual' and note.cell_count() < note.model.rowCount():
+                app.processEvents()
+            cells_time = time.perf_counter() - start
+            print(f'{list_mode:<10}界面线程 {ingest_time * 1000:>10.1f}    写入线程再等待 {write_time * 1000:>8.1f}'
+                  f'    其余单元格 {cells_time * 1000:>8.1f}')
+
+
+def run_bulk(app, args):
+    """比较逐个操作与批量操作：完成并删除selected个任务"""
+    from PyQt5.QtWidgets import QMessageBox
+    QMessageBox.question = lambda *a, **k: QMessageBox.Yes  # 跳过删除确认
+    print(f'{args.tasks} 个任务中完成并删除 {args.selected} 个的耗时 (ms)')
+    print(f'{"模式":<10}{"方式":<8}{"完成":>10}{"删除":>10}{"写入次数":>10}')
+    for list_mode in ('widgets', 'virtual'):
+        for bulk in (False, True):
+            with benchmark_note(f'list_mode: {list_mode}\n') as note:
+                note.ingest_tasks([f'任务 {i}' for i in range(args.tasks)])
+                if note.list_mode != 'virtual':
+                    note.finish_cells()  # 导入后其余单元格在事件循环中创建，测量前全部创建
+                note.save_notes(wait=True)
+                app.processEvents()
+                writes = len(StickyTasks.profiler.samples.get('store_write', ()))
+                count = note.model.rowCount()
+                rows = list(range(0, args.selected * 2, 2))  # 隔行选择，最坏情况
+                if bulk:
+                    if list_mode == 'virtual':
+                        selection = QItemSelection()
+                        for row in rows:
+                            index = note.filter_model.index(row, 0)
+                            selection.select(index, index)
+                        note.list_view.selectionModel().select(selection, QItemSelectionModel.Select)
+                    else:
+                        note.set_selected_ids({note.model.tasks[row].id for row in rows})
+                    app.processEvents()
+                start = time.perf_counter()
+                if bulk:
+                    note.complete_selected(True)
+                elif list_mode == 'virtual':
+                    for row in rows:
+                        note.model.setData(note.model.index(row), True, StickyTasks.TaskModel.CompletedRole)
+                        note.save_notes()
+                else:
+                    for row in rows:
+                        note.cells_layout.itemAt(row).widget().toggle_complete()
+                        note.save_notes()
+                app.processEvents()
+                complete_time = time.perf_counter() - start
+                start = time.perf_counter()
+                if bulk:
+                    note.delete_selected()
+                else:
+                    for row in reversed(rows):
+                        if list_mode == 'virtual':
+                            note.delete_row(row)
+                        else:
+                            note.create_delete_handler(note.cells_layout.itemAt(row).widget())()
+                app.processEvents()
+                delete_time = time.perf_counter() - start
+                note.writer.flush()
+                writes = len(StickyTasks.profiler.samples.get('store_write', ())) - writes
+                print(f'{list_mode:<10}{"批量" if bulk else "逐个":<8}{complete_time * 1000:>10.1f}'
+                      f'{delete_time * 1000:>10.1f}{writes:>10}')
+                assert note.model.rowCount() == count - args.selected
+
+
+def run_hotkey(app, args):
+    """从另一个线程模拟keyboard钩子触发切换显示，测量按键到窗口绘制完成的延迟"""
+    with benchmark_note(f'list_mode: {args.list_mode}\n') as note:
+        note.ingest_tasks([f'任务 {i}' for i in range(args.tasks)])
+        if note.list_mode != 'virtual':
+            note.finish_cells()  # 导入后其余单元格在事件循环中创建，测量前全部创建
+        note.show()
+        app.processEvents()
+        dispatcher = StickyTasks.HotkeyDispatcher(note)
+        StickyTasks.profiler.samples.pop('hotkey_visible', None)
+        StickyTasks.profiler.samples.pop('hotkey_queue', None)
+
+        def press():
+            for _ in range(args.presses):
+                time.sleep(args.interval / 1000)
+                dispatcher.post('toggle')
+
+        thread = threading.Thread(target=press, daemon=True)
+        thread.start()
+        while thread.is_alive() or dispatcher.pending:
+            app.processEvents()
+            time.sleep(0.001)
+        app.processEvents()
+        print(f'{args.list_mode} 模式，{args.tasks} 个任务，切换显示 {args.presses} 次的延迟 (ms)')
+        print(f'{"阶段":<12}{"次数":>8}{"p50":>10}{"p99":>10}{"最大":>10}')
+        for name, title in (('hotkey_queue', '排队'), ('hotkey', '执行'), ('hotkey_visible', '到绘制完成')):
+            values = sorted(StickyTasks.profiler.samples.get(name, ()))
+            if not values:
+                print(f'{title:<12}{0:>8}')
+                continue
+            p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+            print(f'{title:<12}{len(values):>8}{statistics.median(values):>10.2f}{p99:>10.2f}{values[-1]:>10.2f}')
+
+
+def run_drag(app, args):
+    """模拟高回报率鼠标拖动窗口右下角调整大小，比较逐个事件调整与按帧合并"""
+    with benchmark_note(f'list_mode: {args.list_mode}\n') as note:
+        note.ingest_tasks([f'任务 {i} ' * 8 for i in range(args.tasks)])
+        if note.list_mode != 'virtual':
+            note.finish_cells()  # 导入后其余单元格在事件循环中创建，测量前全部创建
+        note.show()
+        app.processEvents()
+        print(f'{args.list_mode} 模式，{args.tasks} 个任务，{args.events} 个鼠标事件（间隔 {args.interval} ms）')
+        print(f'{"方式":<10}{"总耗时":>10}{"CPU":>10}{"调整次数":>10}')
+        for coalesced in (False, True):
+            note.setGeometry(100, 100, 400, 500)
+            app.processEvents()
+            geometry = note.geometry()
+            corner = QPoint(note.width() - 2, note.height() - 2)
+            start_pos = note.mapToGlobal(corner)
+            resizes = 0
+            if coalesced:
+                note.mousePressEvent(QMouseEvent(QEvent.MouseButtonPress, corner, start_pos,
+                                                 Qt.LeftButton, Qt.LeftButton, Qt.NoModifier))
+                frames = len(StickyTasks.profiler.samples.get('window_frame', ()))
+            start, cpu_start = time.perf_counter(), time.process_time()
+            for i in range(1, args.events + 1):
+                pos = start_pos + QPoint(i % 200, i % 150)
+                if coalesced:
+                    note.mouseMoveEvent(QMouseEvent(QEvent.MouseMove, note.mapFromGlobal(pos), pos,
+                                                    Qt.NoButton, Qt.LeftButton, Qt.NoModifier))
+                else:
+                    # 改动之前：每个事件都设置一次光标并调整一次窗口
+                    note.setCursor(Qt.SizeFDiagCursor)
+                    note.setGeometry(QRect(geometry.topLeft(), geometry.size() + QSize(i % 200, i % 150)))
+                    resizes += 1
+                deadline = time.perf_counter() + args.interval / 1000
+                app.processEvents()
+                time.sleep(max(0, deadline - time.perf_counter()))
+            if coalesced:
+                note.mouseReleaseEvent(QMouseEvent(QEvent.MouseButtonRelease, note.mapFromGlobal(pos), pos,
+                                                   Qt.LeftButton, Qt.NoButton, Qt.NoModifier))
+                resizes = len(StickyTasks.profiler.samples.get('window_frame', ())) - frames
+            app.processEvents()
+            wall, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+            print(f'{"按帧合并" if coalesced else "逐个事件":<10}{wall * 1000:>10.1f}{cpu * 1000:>10.1f}{resizes:>10}')
+
+
+def idle_cpu_ms(app, seconds):
+    """运行事件循环seconds秒，返回期间消耗的CPU时间 (ms)"""
+    from PyQt5.QtCore import QTimer
+    start = time.process_time()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    return (time.process_time() - start) * 1000
+
+
+def run_reminders(app, args):
+    """比较一个堆调度器与每个任务一个QTimer：安排、推迟、完成的耗时和空闲时的CPU占用"""
+    import random
+    from PyQt5.QtCore import QTimer
+    random.seed(1)
+    now = time.time()
+    tasks = [StickyTasks.TaskItem(f'任务 {i}', remind_at=now + random.uniform(3600, 30 * 86400))
+             for i in range(args.tasks)]
+    sample = random.sample(tasks, min(1000, args.tasks))
+    print(f'{args.tasks} 个待提醒任务')
+    print(f'{"方式":<14}{"安排 (us)":>12}{"推迟 (us)":>12}{"完成 (us)":>12}{"空闲CPU (ms/s)":>16}')
+
+    scheduler = StickyTasks.ReminderScheduler()
+    start = time.perf_counter()
+    for task in tasks:
+        scheduler.schedule(task)
+    schedule_us = (time.perf_counter() - start) / len(tasks) * 1e6
+    start = time.perf_counter()
+    for task in sample:
+        task.remind_at += 600
+        scheduler.schedule(task)
+    snooze_us = (time.perf_counter() - start) / len(sample) * 1e6
+    start = time.perf_counter()
+    for task in sample:
+        task.completed = True
+        scheduler.schedule(task)
+    complete_us = (time.perf_counter() - start) / len(sample) * 1e6
+    idle = idle_cpu_ms(app, args.idle) / args.idle
+    print(f'{"堆调度器":<14}{schedule_us:>12.2f}{snooze_us:>12.2f}{complete_us:>12.2f}{idle:>16.2f}')
+    scheduler.deleteLater()
+    app.processEvents()
+
+    # 对照：每个任务一个单次QTimer，推迟时重新启动，完成时停止
+    timers = {}
+    start = time.perf_counter()
+    for task in tasks:
+        timer = QTimer()
+        timer.setSingleShot(True)
+        timer.start(int(min(task.remind_at - now, 86400) * 1000))
+        timers[task.id] = timer
+    schedule_us = (time.perf_counter() - start) / len(tasks) * 1e6
+    start = time.perf_counter()
+    for task in sample:
+        timers[task.id].start(int(min(task.remind_at + 600 - now, 86400) * 1000))
+    snooze_us = (time.perf_counter() - start) / len(sample) * 1e6
+    start = time.perf_counter()
+    for task in sample:
+        timers[task.id].stop()
+    complete_us = (time.perf_counter() - start) / len(sample) * 1e6
+    idle = idle_cpu_ms(app, args.idle) / args.idle
+    print(f'{"每任务一个定时器":<14}{schedule_us:>12.2f}{snooze_us:>12.2f}{complete_us:>12.2f}{idle:>16.2f}')
+
+
+def run_reorder(app, args):
+    """移动任务的耗时和每次移动写入的记录数：增量存储只写被移动的任务，XML重写整个文件；
+    再把最后一个任务反复移到开头，检查顺序键的长度不会随移动次数增长"""
+    import random
+    random.seed(1)
+    print(f'{args.tasks} 个任务中移动 {args.moves} 次，每次移动后保存')
+    print(f'{"存储":<10}{"移动 (ms)":>12}{"保存 (ms)":>12}{"写入记录/次":>14}{"最长顺序键":>12}{"重新加载顺序":>14}')
+    for storage in ('journal', 'sqlite', 'xml'):
+        with benchmark_home(f'storage: {storage}\nlist_mode: virtual\n'):
+            with open_note() as note:
+                note.ingest_tasks([f'任务 {i}' for i in range(args.tasks)])
+                note.save_notes(wait=True)
+                move_time = save_time = records = 0
+                for _ in range(args.moves):
+                    count = note.model.rowCount()
+                    start = time.perf_counter()
+                    note.move_tasks([random.randrange(count)], random.randrange(count + 1))
+                    move_time += time.perf_counter() - start
+                    records += len(note.pending_changes) if note.store.incremental else count
+                    start = time.perf_counter()
+                    note.save_notes(wait=True)
+                    save_time += time.perf_counter() - start
+                for _ in range(args.moves):
+                    note.move_tasks([note.model.rowCount() - 1], 0)
+                note.save_notes(wait=True)
+                key_length = max(len(task.order_key) for task in note.model.tasks)
+                order = [task.id for task in note.model.tasks if task.text]  # 空任务不保存
+            with open_note() as reloaded:
+                same = [task.id for task in reloaded.model.tasks] == order
+        print(f'{storage:<10}{move_time / args.moves * 1000:>12.3f}{save_time / args.moves * 1000:>12.2f}'
+              f'{records / args.moves:>14.1f}{key_length:>12}{"一致" if same else "不一致":>14}')
+
+
+def run_sync(app, args):
+    """两台设备（两个用户目录）通过本地共享目录同步：一次同步的耗时与修改数量成正比，与任务总数无关"""
+    import random
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as root, ExitStack() as stack:
+        shared = os.path.join(root, 'shared')
+
+        def open_device(name):
+            """打开一台设备，退出时按相反顺序关闭，恢复用户目录和工作目录"""
+            config = f'sync_dir: {shared}\nsync_device: {name}\nlist_mode: virtual\n'
+            stack.enter_context(benchmark_home(config, os.path.join(root, name)))
+            return stack.enter_context(open_note())
+
+        def sync_pass(source, target):
+            """source保存并发布修改，target读取并应用，返回target读取和应用的耗时 (ms)"""
+            source.save_notes()
+            source.sync.flush()
+            start = time.perf_counter()
+            target.sync.request_pull()
+            target.sync.flush()
+            app.processEvents()
+            return (time.perf_counter() - start) * 1000
+
+        def state(note):
+            return [(task.id, task.text, task.completed) for task in note.model.tasks if task.text]
+
+        first = open_device('A')
+        second = open_device('B')
+        first.ingest_tasks([f'任务 {i}' for i in range(args.tasks)])
+        initial = sync_pass(first, second)
+        print(f'{args.tasks} 个任务，首次同步 {initial:.1f} ms')
+        print(f'{"修改数":>8}{"同步 (ms)":>12}{"每条 (ms)":>12}')
+        for edits in (1, args.edits // 5 or 1, args.edits):
+            for task in random.sample(first.model.tasks, edits):
+                task.text += ' *'
+                first.model.task_updated(task, [Qt.EditRole])
+            elapsed = sync_pass(first, second)
+            print(f'{edits:>8}{elapsed:>12.2f}{elapsed / edits:>12.3f}')
+
+        # 两台设备同时修改同一任务，结果以(时钟, 设备ID)较大的为准
+        task_id = first.model.tasks[-1].id
+        for note, text in ((first, '来自A的修改'), (second, '来自B的修改')):
+            task = note.model.by_id[task_id]
+            task.text = text
+            note.model.task_updated(task, [Qt.EditRole])
+        for note in (first, second):
+            note.save_notes()
+            note.sync.flush()
+        sync_pass(first, second)
+        sync_pass(second, first)
+        print(f'同时修改同一任务后: A={first.model.by_id[task_id].text} B={second.model.by_id[task_id].text} '
+              f'{"一致" if state(first) == state(second) else "不一致"}')
+
+
+def run_history(app, args):
+    """每日快照：每天修改changes个任务，比较按内容寻址的存储与每天保存完整列表的大小，以及按日期读取的耗时"""
+    import random
+    random.seed(1)
+    tasks = [StickyTasks.TaskItem(f'任务 {i}：' + '测试内容 ' * (i % 7 + 1)) for i in range(args.tasks)]
+    with tempfile.TemporaryDirectory() as home:
+        history = StickyTasks.TaskHistory(os.path.join(home, 'history.db'))
+        full_bytes = 0
+        record_times = []
+        days = []
+        for day in range(args.days):
+            name = time.strftime('%Y-%m-%d', time.localtime(time.time() - (args.days - day) * 86400))
+            days.append(name)
+            for task in random.sample(tasks, args.changes):
+                task.set_completed(not task.completed)
+            for _ in range(args.changes // 2):
+                tasks.append(StickyTasks.TaskItem(f'新任务 {day}'))
+            records = [task.to_record() for task in tasks]
+            full_bytes += sum(len(json.dumps(record, ensure_ascii=False).encode('utf-8')) + 1
+                              for record in records)
+            start = time.perf_counter()
+            history.record_day(name, records)
+            record_times.append(time.perf_counter() - start)
+        history.close()
+        size = os.path.getsize(os.path.join(home, 'history.db'))
+        history = StickyTasks.TaskHistory(os.path.join(home, 'history.db'))
+        start = time.perf_counter()
+        history.days()
+        index_ms = (time.perf_counter() - start) * 1000
+        load_times = []
+        for name in random.sample(days, min(10, len(days))):
+            start = time.perf_counter()
+            loaded = history.load_day(name)
+            load_times.append(time.perf_counter() - start)
+        history.close()
+    print(f'{args.tasks} 个任务，{args.days} 天，每天修改 {args.changes} 个、新增 {args.changes // 2} 个')
+    print(f'每天完整保存: {full_bytes / 1024 / 1024:.1f} MB')
+    print(f'按内容寻址:   {size / 1024 / 1024:.1f} MB（每天 {size / args.days / 1024:.0f} KB）')
+    print(f'保存一天: {statistics.median(record_times) * 1000:.1f} ms（首次 {record_times[0] * 1000:.1f} ms）')
+    print(f'日期列表: {index_ms:.2f} ms  读取一天（{len(loaded)} 个任务）: '
+          f'{statistics.median(load_times) * 1000:.1f} ms')
+
+
+def run_import(app, args):
+    """导入Markdown导出目录：比较单进程与多进程解析的吞吐量、再次导入时的跳过开销，以及合并到列表的耗时"""
+    import random
+    random.seed(1)
+    pool = [f'任务 {i}：' + '测试内容 ' * (i % 7 + 1) for i in range(args.files * args.tasks_per_file // 4)]
+    jobs = args.jobs or max(2, os.cpu_count() or 1)
+    with benchmark_home('list_mode: virtual\n') as home:
+        folder = os.path.join(home, 'exports')
+        os.makedirs(folder)
+        for i in range(args.files):
+            name = time.strftime('%Y-%m-%d', time.localtime(time.time() - i * 86400))
+            records = [StickyTasks.TaskItem(text).to_record() for text in random.sample(pool, args.tasks_per_file)]
+            StickyTasks.export_records(records, os.path.join(folder, f'{name}.md'),
+                                       StickyTasks.MarkdownExporter, f'{name}任务')
+        print(f'{args.files} 个导出文件，每个 {args.tasks_per_file} 个任务（不同内容 {len(pool)} 个），CPU {os.cpu_count()} 核')
+        for label, count in (('单进程', 1), (f'{jobs} 个进程', jobs)):
+            tasks, files, stats = StickyTasks.read_markdown_exports(folder, count)
+            print(f'{label:<8}{stats["seconds"] * 1000:>8.1f} ms  {stats["files"] / stats["seconds"]:>8.0f} 个文件/秒  '
+                  f'{stats["bytes"] / 1024 / 1024 / stats["seconds"]:>6.1f} MB/秒  '
+                  f'{len(tasks)} 个任务，重复 {stats["duplicates"]} 个')
+        with open_note() as note:
+            start = time.perf_counter()
+            reply = note.import_tasks(tasks, files)
+            app.processEvents()
+            merge_time = time.perf_counter() - start
+            note.writer.flush()
+            print(f'合并到列表: {merge_time * 1000:.1f} ms（添加 {reply["added"]} 个，与现有任务重复 {reply["duplicates"]} 个）')
+            _, _, stats = StickyTasks.read_markdown_exports(folder, jobs)
+            print(f'再次导入: {stats["seconds"] * 1000:.1f} ms（未修改跳过 {stats["unchanged"]} 个文件）')
+
+
+def run_views(app, args):
+    """标签和保存视图：每次编辑更新标签数量的耗时（与逐个扫描任务统计比较），以及切换视图的耗时"""
+    import random
+    random.seed(1)
+    tags = [f'tag{i}' for i in range(args.tags)]
+    values = [{'text': f'任务 {i} ' + ' '.join('#' + tag for tag in random.sample(tags, 2)),
+               'completed': i % 3 == 0} for i in range(args.tasks)]
+    print(f'{args.tasks} 个任务，{args.tags} 个标签')
+    for list_mode in ('lite', 'virtual'):
+        with benchmark_note(f'list_mode: {list_mode}\n') as note:
+            note.ingest_tasks(values)
+            if note.list_mode != 'virtual':
+                note.finish_cells()  # 导入后其余单元格在事件循环中创建，测量前全部创建
+            app.processEvents()
+            model = note.model
+            edit_times = []
+            scan_times = []
+            for i in range(args.edits):
+                row = random.randrange(model.rowCount())
+                text = f'任务 {row} #{random.choice(tags)}'
+                start = time.perf_counter()
+                model.setData(model.index(row), text, Qt.EditRole)
+                edit_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                counts = {}
+                for task in model.tasks:
+                    for tag in StickyTasks.parse_tags(task.text):
+                        counts[tag] = counts.get(tag, 0) + 1
+                scan_times.append(time.perf_counter() - start)
+            switch_times = {}
+            for index in range(note.view_combo.count()):
+                if note.view_combo.itemData(index) is None:
+                    continue  # 分隔线
+                note.view_combo.setCurrentIndex(index)
+                start = time.perf_counter()
+                note.apply_view(index)
+                app.processEvents()
+                switch_times[note.view_combo.itemText(index)] = time.perf_counter() - start
+            print(f'{list_mode:<8}编辑一个任务 {statistics.median(edit_times) * 1000:.2f} ms，'
+                  f'扫描全部任务统计标签 {statistics.median(scan_times) * 1000:.1f} ms')
+            print('        切换视图 (ms): ' + '  '.join(f'{name} {seconds * 1000:.1f}'
+                                                     for name, seconds in list(switch_times.items())[:6]))
+
+
+def run_stats(app, args):
+    """统计窗口：累计计数的开销、打开窗口的耗时（与已记录的天数无关），以及按任务时间重新计算的对比"""
+    values = [{'text': f'任务 {i}', 'completed': i % 3 == 0} for i in range(args.tasks)]
+    print(f'{args.tasks} 个任务')
+    for days in (10, args.days):
+        with benchmark_home('list_mode: virtual\n') as home:
+            stats = StickyTasks.TaskStats(os.path.join(home, '.stickynotes.stats.db'))
+            now = time.time()
+            stats.write([(time.strftime('%Y-%m-%d', time.localtime(now - (i + 1) * 86400)), 5, 4, 0, 1, 4 * 3600.0, 100)
+                         for i in range(days)] + [(stats.TOTAL, 5 * days, 4 * days, 0, days, 4 * 3600.0 * days, 100)])
+            stats.close()
+            with open_note() as note:
+                note.ingest_tasks(values)
+                app.processEvents()
+                start = time.perf_counter()
+                for _ in range(1000):
+                    note.stats.add(completed=1, latency=60.0)
+                add_time = (time.perf_counter() - start) / 1000
+                window = StickyTasks.StatsWindow(note)
+                open_times = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    window.refresh()
+                    open_times.append(time.perf_counter() - start)
+                # 不保存计数时只能按每个任务的创建和完成时间重新统计
+                start = time.perf_counter()
+                per_day = {}
+                for task in note.model.tasks:
+                    day = time.strftime('%Y-%m-%d', time.localtime(task.created_at))
+                    per_day.setdefault(day, [0, 0])[0] += 1
+                    if task.completed_at is not None:
+                        day = time.strftime('%Y-%m-%d', time.localtime(task.completed_at))
+                        per_day.setdefault(day, [0, 0])[1] += 1
+                scan_time = time.perf_counter() - start
+                print(f'已记录 {days:>5} 天: 累加一次 {add_time * 1e6:.1f} us  打开统计窗口 '
+                      f'{statistics.median(open_times) * 1000:.2f} ms  按任务时间重新统计 {scan_time * 1000:.1f} ms')
+                window.deleteLater()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='便签性能测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    style_parser = subparsers.add_parser('style', help='比较单元格样式的开销')
+    style_parser.add_argument('--cells', type=int, default=500, help='单元格数量')
+    style_parser.set_defaults(func=run_style)
+
+    cells_parser = subparsers.add_parser('cells', help='比较完整控件单元格与轻量单元格的创建耗时和内存')
+    cells_parser.add_argument('--cells', type=int, default=2000, help='单元格数量')
+    cells_parser.set_defaults(func=run_cells)
+
+    startup_parser = subparsers.add_parser('startup', help='测量冷启动到首次绘制的时间')
+    startup_parser.add_argument('--tasks', type=int, default=1000, help='已保存的任务数量')
+    startup_parser.add_argument('--storage', choices=('journal', 'sqlite', 'xml'), default='journal')
+    startup_parser.add_argument('--list-mode', choices=('widgets', 'lite', 'virtual'), default='widgets')
+    startup_parser.add_argument('--runs', type=int, default=5, help='重复次数，取中位数')
+    startup_parser.set_defaults(func=run_startup)
+
+    export_parser = subparsers.add_parser('export', help='比较导出时界面线程被阻塞的时间')
+    export_parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    export_parser.set_defaults(func=run_export)
+
+    suite_parser = subparsers.add_parser('suite', help='在不同数据量下测量主要操作，结果可保存并与基准比较')
+    suite_parser.add_argument('--datasets', type=int, nargs='+', default=SUITE_DATASETS,
+                              help='任务数量')
+    suite_parser.add_argument('--storage', choices=('journal', 'sqlite', 'xml'), default='journal')
+    suite_parser.add_argument('--list-mode', choices=('widgets', 'lite', 'virtual'), default='widgets')
+    suite_parser.add_argument('--output', help='把结果写入JSON文件')
+    suite_parser.add_argument('--compare', help='作为基准的结果文件')
+    suite_parser.add_argument('--threshold', type=float, default=0.25,
+                              help='比基准慢多少（比例）视为退化')
+    suite_parser.add_argument('--min-delta', type=float, default=0.5,
+                              help='与基准的差值小于此值（ms或KB）时不算退化')
+    suite_parser.set_defaults(func=run_suite)
+
+    # suite为每个数据集启动一个子进程运行这个命令
+    dataset_parser = subparsers.add_parser('suite-dataset')
+    dataset_parser.add_argument('--tasks', type=int, required=True)
+    dataset_parser.add_argument('--storage', default='journal')
+    dataset_parser.add_argument('--list-mode', default='widgets')
+    dataset_parser.set_defaults(func=run_suite_dataset)
+
+    ingest_parser = subparsers.add_parser('ingest', help='测量批量导入任务的耗时')
+    ingest_parser.add_argument('--tasks', type=int, default=5000, help='导入的任务数量')
+    ingest_parser.set_defaults(func=run_ingest)
+
+    bulk_parser = subparsers.add_parser('bulk', help='比较逐个操作与多选批量操作')
+    bulk_parser.add_argument('--tasks', type=int, default=1000, help='任务数量')
+    bulk_parser.add_argument('--selected', type=int, default=200, help='选中的任务数量')
+    bulk_parser.set_defaults(func=run_bulk)
+
+    hotkey_parser = subparsers.add_parser('hotkey', help='测量全局快捷键到窗口显示的延迟')
+    hotkey_parser.add_argument('--presses', type=int, default=200, help='触发次数')
+    hotkey_parser.add_argument('--interval', type=float, default=20, help='两次触发的间隔 (ms)')
+    hotkey_parser.add_argument('--tasks', type=int, default=100, help='任务数量')
+    hotkey_parser.add_argument('--list-mode', choices=('widgets', 'lite', 'virtual'), default='widgets')
+    hotkey_parser.set_defaults(func=run_hotkey)
+
+    drag_parser = subparsers.add_parser('drag', help='比较逐个鼠标事件调整窗口与按帧合并的开销')
+    drag_parser.add_argument('--tasks', type=int, default=300, help='任务数量')
+    drag_parser.add_argument('--events', type=int, default=500, help='鼠标事件数量')
+    drag_parser.add_argument('--interval', type=float, default=1, help='两个鼠标事件的间隔 (ms)')
+    drag_parser.add_argument('--list-mode', choices=('widgets', 'lite', 'virtual'), default='widgets')
+    drag_parser.set_defaults(func=run_drag)
+
+    reminders_parser = subparsers.add_parser('reminders', help='比较提醒调度器与每任务一个定时器的开销')
+    reminders_parser.add_argument('--tasks', type=int, default=10000, help='待提醒的任务数量')
+    reminders_parser.add_argument('--idle', type=float, default=3, help='测量空闲CPU的秒数')
+    reminders_parser.set_defaults(func=run_reminders)
+
+    reorder_parser = subparsers.add_parser('reorder', help='测量移动任务的耗时和写入的记录数')
+    reorder_parser.add_argument('--tasks', type=int, default=5000, help='任务数量')
+    reorder_parser.add_argument('--moves', type=int, default=200, help='移动次数')
+    reorder_parser.set_defaults(func=run_reorder)
+
+    sync_parser = subparsers.add_parser('sync', help='两台设备通过本地目录同步的耗时和冲突处理')
+    sync_parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    sync_parser.add_argument('--edits', type=int, default=50, help='一次同步的最大修改数')
+    sync_parser.set_defaults(func=run_sync)
+
+    history_parser = subparsers.add_parser('history', help='每日快照的存储大小和按日期读取的耗时')
+    history_parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    history_parser.add_argument('--days', type=int, default=60, help='天数')
+    history_parser.add_argument('--changes', type=int, default=50, help='每天修改的任务数')
+    history_parser.set_defaults(func=run_history)
+
+    import_parser = subparsers.add_parser('import', help='导入Markdown导出目录的吞吐量和跳过已导入文件的开销')
+    import_parser.add_argument('--files', type=int, default=1000, help='导出文件数量')
+    import_parser.add_argument('--tasks-per-file', type=int, default=50, help='每个文件的任务数')
+    import_parser.add_argument('--jobs', type=int, default=None, help='并行解析的进程数，默认为CPU核数（至少2）')
+    import_parser.set_defaults(func=run_import)
+
+    views_parser = subparsers.add_parser('views', help='标签数量的增量更新和保存视图的切换耗时')
+    views_parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    views_parser.add_argument('--tags', type=int, default=20, help='标签数量')
+    views_parser.add_argument('--edits', type=int, default=200, help='编辑次数')
+    views_parser.set_defaults(func=run_views)
+
+    stats_parser = subparsers.add_parser('stats', help='统计计数的累加开销和打开统计窗口的耗时')
+    stats_parser.add_argument('--tasks', type=int, default=10000, help='任务数量')
+    stats_parser.add_argument('--days', type=int, default=3650, help='已记录统计的天数')
+    stats_parser.set_defaults(func=run_stats)
+
+    args = parser.parse_args()
+    app = QApplication(sys.argv)
+    args.func(app, args)
+
+
+if __name__ == '__main__':
+    main()
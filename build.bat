@@ -1,3 +1,4 @@
 @echo off
-pyinstaller --onefile --windowed --icon=mypad.ico --add-data "mypad.ico;." sticky_note.py
+rem --onedir 打包为目录：单文件(--onefile)版每次启动都要先把运行库解压到临时目录，冷启动明显变慢
+pyinstaller --onedir --windowed --noconfirm --icon=icon.ico --add-data "icon.ico;." StickyTasks.py
 pause